@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for the hot paths of threeML (likelihood evaluation, folding, binning and fitting), in the
+format of airspeed velocity (asv, https://asv.readthedocs.io). See asv.conf.json in the root of the repository.
+
+Every benchmark uses the responses distributed with threeML and synthetic data generated with a fixed seed, so that
+the results of different versions can be compared.
+"""
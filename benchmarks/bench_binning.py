@@ -0,0 +1,64 @@
+import numpy as np
+
+from threeML.utils.binner import Rebinner
+from threeML.utils.bayesian_blocks import bayesian_blocks
+
+from benchmarks.common import get_synthetic_event_list
+
+
+class Rebinning(object):
+
+    params = [10, 100]
+    param_names = ['min_counts']
+
+    def setup(self, min_counts):
+
+        self.counts = np.random.RandomState(1234).poisson(5.0, 10000)
+
+    def time_rebinner(self, min_counts):
+
+        rebinner = Rebinner(self.counts, min_counts)
+
+        rebinner.rebin(self.counts)
+
+
+class EventListOperations(object):
+
+    timeout = 300
+
+    def setup(self):
+
+        self.event_list = get_synthetic_event_list()
+
+        self.fitted_event_list = get_synthetic_event_list()
+
+        self.fitted_event_list.set_polynomial_fit_interval("-20--5", "40-80", unbinned=False)
+
+        # Bayesian blocks and the significance binning scale badly with the number of events, so they use a
+        # sparser light curve
+
+        self.sparse_event_list = get_synthetic_event_list(background_rate=50.0, source_counts=2000)
+
+        self.sparse_event_list.set_polynomial_fit_interval("-20--5", "40-80", unbinned=False)
+
+    def time_active_time_interval_selection(self):
+
+        self.fitted_event_list.set_active_time_intervals("0-20")
+
+    def time_binned_background_fit(self):
+
+        self.event_list.set_polynomial_fit_interval("-20--5", "40-80", unbinned=False)
+
+    def time_unbinned_background_fit(self):
+
+        self.event_list.set_polynomial_fit_interval("-20--5", "40-80", unbinned=True)
+
+    def time_bayesian_blocks(self):
+
+        arrival_times = self.sparse_event_list.arrival_times
+
+        bayesian_blocks(arrival_times, arrival_times[0], arrival_times[-1], 1e-3)
+
+    def time_bin_by_significance(self):
+
+        self.sparse_event_list.bin_by_significance(0.0, 30.0, 5)
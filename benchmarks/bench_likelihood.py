@@ -0,0 +1,58 @@
+from astromodels import Log_uniform_prior, Uniform_prior
+
+from threeML.data_list import DataList
+from threeML.classicMLE.joint_likelihood import JointLikelihood
+from threeML.bayesian.bayesian_analysis import BayesianAnalysis
+
+from benchmarks.common import get_model, get_simulated_plugin
+
+
+class SpectrumLikeLogLike(object):
+
+    params = ['poisson-poisson', 'poisson-gaussian', 'poisson-ideal', 'poisson-none', 'gaussian-none']
+    param_names = ['noise_model']
+
+    def setup(self, noise_model):
+
+        self.plugin = get_simulated_plugin("sim", noise_model)
+
+        self.plugin.set_model(get_model())
+
+    def time_get_log_like(self, noise_model):
+
+        self.plugin.get_log_like()
+
+
+class JointLikelihoodFit(object):
+
+    timeout = 300
+
+    def setup(self):
+
+        self.data_list = DataList(get_simulated_plugin("sim"))
+
+    def time_fit(self):
+
+        jl = JointLikelihood(get_model(K=0.5, index=-2.0), self.data_list, verbose=False)
+
+        jl.fit(quiet=True)
+
+
+class BayesianAnalysisSample(object):
+
+    timeout = 600
+
+    def setup(self):
+
+        self.data_list = DataList(get_simulated_plugin("sim"))
+
+        self.model = get_model()
+
+        self.model.source.spectrum.main.Powerlaw.K.prior = Log_uniform_prior(lower_bound=1e-2, upper_bound=1e2)
+        self.model.source.spectrum.main.Powerlaw.index.prior = Uniform_prior(lower_bound=-4.0, upper_bound=0.0)
+
+    def time_sample(self):
+
+        bayes = BayesianAnalysis(self.model, self.data_list)
+
+        bayes.sample(n_walkers=20, burn_in=100, n_samples=200, quiet=True, seed=1234)
@@ -0,0 +1,54 @@
+from astromodels import Powerlaw
+
+from threeML.io.package_data import get_path_of_data_file
+from threeML.utils.OGIP.response import OGIPResponse, InstrumentResponseSet
+
+from benchmarks.common import get_gbm_response
+
+
+class ResponseLoading(object):
+
+    def setup(self):
+
+        self.rsp_file = get_path_of_data_file("ogip_test_gbm_n6.rsp")
+        self.rsp2_file = get_path_of_data_file("ogip_test_gbm_b0.rsp2")
+        self.rmf_file = get_path_of_data_file("ogip_test_xmm_pn.rmf")
+        self.arf_file = get_path_of_data_file("ogip_test_xmm_pn.arf")
+
+    def time_load_gbm_rsp(self):
+
+        OGIPResponse(self.rsp_file)
+
+    def time_load_gbm_rsp2(self):
+
+        InstrumentResponseSet.from_rsp2_file(self.rsp2_file, lambda t1, t2: t2 - t1, lambda t1, t2: t2 - t1)
+
+    def time_load_xmm_rmf_arf(self):
+
+        OGIPResponse(self.rmf_file, arf_file=self.arf_file)
+
+
+class ResponseConvolution(object):
+
+    params = ['gbm', 'xmm']
+    param_names = ['response']
+
+    def setup(self, response):
+
+        if response == 'gbm':
+
+            self.response = get_gbm_response()
+
+        else:
+
+            self.response = OGIPResponse(get_path_of_data_file("ogip_test_xmm_pn.rmf"),
+                                         arf_file=get_path_of_data_file("ogip_test_xmm_pn.arf"))
+
+        powerlaw = Powerlaw(K=1.0, index=-1.5, piv=100.0)
+
+        self.response.set_function(lambda e1, e2: (e2 - e1) / 6.0 * (powerlaw(e1) + 4 * powerlaw((e1 + e2) / 2.0) +
+                                                                     powerlaw(e2)))
+
+    def time_convolve(self, response):
+
+        self.response.convolve()
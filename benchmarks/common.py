@@ -0,0 +1,99 @@
+import warnings
+
+import numpy as np
+from astromodels import Model, PointSource, Powerlaw
+
+from threeML.io.package_data import get_path_of_data_file
+from threeML.plugins.DispersionSpectrumLike import DispersionSpectrumLike
+from threeML.utils.OGIP.response import OGIPResponse
+from threeML.utils.time_series.event_list import EventListWithDeadTime
+
+
+def get_gbm_response():
+
+    return OGIPResponse(get_path_of_data_file("ogip_test_gbm_n6.rsp"))
+
+
+def get_model(K=1.0, index=-1.5):
+
+    spectrum = Powerlaw(K=K, index=index, piv=100.0)
+
+    return Model(PointSource("source", 0.0, 0.0, spectral_shape=spectrum))
+
+
+def get_simulated_plugin(name, noise_model="poisson-poisson", seed=1234):
+    """
+    Simulate a GBM NaI spectrum (power law source on a power law background) with the provided combination of
+    noise models for the observation and the background
+
+    :param name: name of the plugin
+    :param noise_model: one of 'poisson-poisson', 'poisson-gaussian', 'poisson-ideal', 'poisson-none',
+    'gaussian-none'
+    :param seed: seed for the random generator
+    :return: a DispersionSpectrumLike instance
+    """
+
+    observation_noise, background_noise = noise_model.split("-")
+
+    response = get_gbm_response()
+
+    n_channels = len(response.ebounds) - 1
+
+    kwargs = {}
+
+    if observation_noise == "gaussian":
+
+        kwargs['source_errors'] = np.ones(n_channels)
+
+    if background_noise != "none":
+
+        kwargs['background_function'] = Powerlaw(K=10.0, index=-1.8, piv=100.0)
+
+        if background_noise == "gaussian":
+
+            kwargs['background_errors'] = np.ones(n_channels)
+
+    np.random.seed(seed)
+
+    with warnings.catch_warnings():
+
+        warnings.simplefilter("ignore")
+
+        plugin = DispersionSpectrumLike.from_function(name, source_function=Powerlaw(K=1.0, index=-1.5, piv=100.0),
+                                                      response=response, **kwargs)
+
+    if background_noise == "ideal":
+
+        plugin.background_noise_model = "ideal"
+
+    return plugin
+
+
+def get_synthetic_event_list(n_channels=128, start=-20.0, stop=80.0, background_rate=500.0, source_counts=20000,
+                             seed=1234):
+    """
+    Generate a synthetic TTE event list: a constant background plus a gaussian pulse centered at 10 s
+
+    :return: an EventListWithDeadTime instance
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    n_background = random_state.poisson(background_rate * (stop - start))
+
+    background_times = random_state.uniform(start, stop, n_background)
+
+    source_times = random_state.normal(10.0, 3.0, source_counts)
+
+    arrival_times = np.sort(np.concatenate([background_times, source_times[(source_times > start) &
+                                                                           (source_times < stop)]]))
+
+    channels = random_state.randint(0, n_channels, arrival_times.shape[0])
+
+    return EventListWithDeadTime(arrival_times=arrival_times,
+                                 measurement=channels,
+                                 n_channels=n_channels,
+                                 start_time=start,
+                                 stop_time=stop,
+                                 dead_time=np.zeros_like(arrival_times),
+                                 verbose=False)
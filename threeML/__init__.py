@@ -14,23 +14,18 @@ if os.environ.get('DISPLAY') is None:
     import matplotlib as mpl
     mpl.use('Agg')
 
-# Finally import the serialization machinery
-from .io.serialization import *
-
 from .exceptions.custom_exceptions import custom_warnings
 
-import glob
-import imp
+import ast
 import traceback
+import glob
+import sys
 
 from version import __version__
 
 # Import everything from astromodels
 from astromodels import *
 
-# Now import the optimizers first (to avoid conflicting libraries problems)
-from .minimizer.minimization import _minimizers, LocalMinimization, GlobalMinimization
-
 # This must be here before the automatic import of subpackages,
 # otherwise we will incur in weird issues with other packages
 # using similar names (for example, the io package)
@@ -49,212 +44,234 @@ except ImportError:
                          "the C/C++ interface (currently HAWC)",
                          custom_exceptions.CppInterfaceNotAvailable)
 
-# Now look for plugins
+# Now read the configuration and make it available as threeML_config
+from .config.config import threeML_config
 
-# This verifies if a module is importable
+import astropy.units as u
 
-def is_module_importable(module_full_path):
+from threeML.utils.lazy_module import LazyModule
 
-    try:
+# Everything else is imported only when used for the first time (see the end of this file), so that "import threeML"
+# is fast. This dictionary contains the name of the module defining each one of these attributes
 
-        _ = imp.load_source('__', module_full_path)
+_lazy_attributes = {}
 
-    except:
 
-        return False, traceback.format_exc()
+def _add_lazy_attributes(module_name, *names):
 
-    else:
+    for name in names:
 
-        return True, '%s imported ok' % module_full_path
+        _lazy_attributes[name] = module_name
 
-plugins_dir = os.path.join(os.path.dirname(__file__), "plugins")
 
-found_plugins = glob.glob(os.path.join(plugins_dir, "*.py"))
+_add_lazy_attributes('threeML.minimizer.minimization', 'LocalMinimization', 'GlobalMinimization')
 
-# Filter out __init__
+# The classic Maximum Likelihood Estimation package, the Bayesian analysis and the DataList class
 
-found_plugins = filter(lambda x: x.find("__init__") < 0, found_plugins)
+_add_lazy_attributes('threeML.classicMLE.joint_likelihood', 'JointLikelihood')
+_add_lazy_attributes('threeML.bayesian.bayesian_analysis', 'BayesianAnalysis')
+_add_lazy_attributes('threeML.data_list', 'DataList')
 
-_working_plugins = {}
-_not_working_plugins = {}
+# Plotting
 
-# Loop over each candidates plugins and check if it is importable
+_add_lazy_attributes('threeML.io.plotting.model_plot', 'plot_spectra', 'plot_point_source_spectra')
+_add_lazy_attributes('threeML.io.plotting.light_curve_plots', 'plot_tte_lightcurve')
+_add_lazy_attributes('threeML.io.plotting.post_process_data_plots', 'display_spectrum_model_counts',
+                     'display_photometry_model_magnitudes')
 
-for i, module_full_path in enumerate(found_plugins):
+# The joint likelihood set and related tools
 
-    plugin_name = os.path.splitext(os.path.basename(module_full_path))[0]
+_add_lazy_attributes('threeML.classicMLE.joint_likelihood_set', 'JointLikelihoodSet', 'JointLikelihoodSetAnalyzer')
+_add_lazy_attributes('threeML.classicMLE.likelihood_ratio_test', 'LikelihoodRatioTest')
+_add_lazy_attributes('threeML.classicMLE.goodness_of_fit', 'GoodnessOfFit')
 
-    is_importable, failure_traceback = is_module_importable(module_full_path)
+_add_lazy_attributes('threeML.io.calculate_flux', 'calculate_point_source_flux')
+_add_lazy_attributes('threeML.utils.fitted_objects.fitted_spectrum_cache', 'export_spectral_bands',
+                     'clear_spectral_cache')
 
-    if not is_importable:
+# Added by JM. step generator for time-resolved fits
+_add_lazy_attributes('threeML.utils.step_parameter_generator', 'step_generator')
 
-        custom_warnings.warn("Could not import plugin %s. Do you have the relative instrument software installed "
-                             "and configured?" % os.path.basename(module_full_path),
-                             custom_exceptions.CannotImportPlugin)
+_add_lazy_attributes('threeML.parallel.parallel_client', 'parallel_computation')
 
-        _not_working_plugins[plugin_name] = failure_traceback
+_add_lazy_attributes('threeML.utils.likelihood_profiler', 'LikelihoodProfiler')
 
-        continue
+_add_lazy_attributes('threeML.io.uncertainty_formatter', 'interval_to_errors')
 
-    else:
+# The time series builder, soon to replace the Fermi plugins
+_add_lazy_attributes('threeML.utils.data_builders', 'TimeSeriesBuilder')
 
-        # First get the instrument name
-        try:
+# Catalogs
+_add_lazy_attributes('threeML.catalogs', 'FermiGBMBurstCatalog', 'FermiLATSourceCatalog', 'FermiLLEBurstCatalog',
+                     'SwiftGRBCatalog')
 
-            exec("from threeML.plugins.%s import __instrument_name" % plugin_name)
+# Data downloaders
+_add_lazy_attributes('threeML.utils.data_download.Fermi_GBM.download_GBM_data', 'download_GBM_trigger_data')
+_add_lazy_attributes('threeML.utils.data_download.Fermi_LAT.download_LLE_data', 'download_LLE_trigger_data')
+_add_lazy_attributes('threeML.utils.data_download.Fermi_LAT.download_LAT_data', 'download_LAT_data')
 
-        except ImportError:
+# The results loader
+_add_lazy_attributes('threeML.analysis_results', 'load_analysis_results')
 
-            # This module does not contain a plugin, continue
-            continue
+# The plot_style context manager and the function to create new styles
+_add_lazy_attributes('threeML.io.plotting.plot_style', 'plot_style', 'create_new_plotting_style',
+                     'get_available_plotting_styles')
 
-        # Now import the plugin itself
 
-        import_command = "from threeML.plugins.%s import %s" % (plugin_name, plugin_name)
+# Now look for plugins. A plugin is a module in the plugins directory defining the __instrument_name variable and a
+# class with the same name as the module. We find them by parsing the source, without executing the modules, and
+# we import them only when used for the first time
 
-        try:
 
-            exec(import_command)
+def _get_plugin_instrument_name(module_full_path):
+    """
+    Parse the source of a module (without executing it) and return the name of the instrument if the module contains
+    a plugin, or None otherwise
 
-        except ImportError:
+    :param module_full_path: path to the module
+    :return: the name of the instrument, or None
+    """
 
-            pass
+    plugin_name = os.path.splitext(os.path.basename(module_full_path))[0]
 
-        else:
+    with open(module_full_path) as f:
 
-            _working_plugins[__instrument_name] = plugin_name
+        tree = ast.parse(f.read(), module_full_path)
 
+    instrument_name = None
+    has_plugin_class = False
 
-# Now some convenience functions
+    for node in tree.body:
 
-def get_available_plugins():
-    """
-    Print a list of available plugins
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Str):
 
-    :return:
-    """
-    print("Available plugins:\n")
+            if any(isinstance(target, ast.Name) and target.id == '__instrument_name' for target in node.targets):
 
-    for instrument, class_name in _working_plugins.items():
+                instrument_name = node.value.s
 
-        print("%s for %s" % (class_name, instrument))
+        elif isinstance(node, ast.ClassDef) and node.name == plugin_name:
 
+            has_plugin_class = True
 
-def _display_plugin_traceback(plugin):
+    return instrument_name if has_plugin_class else None
 
-    print("#############################################################")
-    print("\nCouldn't import plugin %s" % plugin)
-    print("\nTraceback:\n")
-    print(_not_working_plugins[plugin])
-    print("#############################################################")
 
+plugins_dir = os.path.join(os.path.dirname(__file__), "plugins")
 
-def is_plugin_available(plugin):
-    """
-    Test whether the plugin for the provided instrument is available
+found_plugins = glob.glob(os.path.join(plugins_dir, "*.py"))
 
-    :param plugin: the name of the plugin class
-    :return: True or False
-    """
+# Filter out __init__
 
-    if plugin in _working_plugins.values():
+found_plugins = filter(lambda x: x.find("__init__") < 0, found_plugins)
 
-        # FIXME
-        if plugin == "FermipyLike":
+# Dictionary plugin name -> instrument name
 
-            try:
+_plugins = {}
 
-                _ = FermipyLike.__new__(FermipyLike, test=True)
+_not_working_plugins = {}
 
-            except:
+for module_full_path in found_plugins:
 
-                # Do not register it
+    plugin_name = os.path.splitext(os.path.basename(module_full_path))[0]
 
-                _not_working_plugins[plugin] = traceback.format_exc()
+    instrument_name = _get_plugin_instrument_name(module_full_path)
 
-                _display_plugin_traceback(plugin)
+    if instrument_name is not None:
 
-                return False
+        _plugins[plugin_name] = instrument_name
 
-        return True
+        _add_lazy_attributes('threeML.plugins.%s' % plugin_name, plugin_name)
 
-    else:
 
-        if plugin in _not_working_plugins:
+def _on_import_error(name, failure_traceback):
 
-            _display_plugin_traceback(plugin)
+    if name in _plugins:
 
-            return False
+        custom_warnings.warn("Could not import plugin %s. Do you have the relative instrument software installed "
+                             "and configured?" % name,
+                             custom_exceptions.CannotImportPlugin)
 
-        else:
+        _not_working_plugins[name] = failure_traceback
 
-            raise RuntimeError("Plugin %s is not known" % plugin)
 
-# Import the classic Maximum Likelihood Estimation package
+# Now some convenience functions
 
-from .classicMLE.joint_likelihood import JointLikelihood
+def _import_plugin(plugin):
 
-# Import the Bayesian analysis
-from .bayesian.bayesian_analysis import BayesianAnalysis
+    # This goes through the lazy module, which imports the plugin if needed
 
-# Import the DataList class
+    try:
 
-from data_list import DataList
+        return getattr(sys.modules[__name__], plugin)
 
+    except ImportError:
 
+        return None
 
-from threeML.io.plotting.model_plot import plot_spectra, plot_point_source_spectra
-from threeML.io.plotting.light_curve_plots import plot_tte_lightcurve
-from threeML.io.plotting.post_process_data_plots import display_spectrum_model_counts, \
-    display_photometry_model_magnitudes
 
-# Import the joint likelihood set
-from .classicMLE.joint_likelihood_set import JointLikelihoodSet, JointLikelihoodSetAnalyzer
-from .classicMLE.likelihood_ratio_test import LikelihoodRatioTest
-from .classicMLE.goodness_of_fit import GoodnessOfFit
+def get_available_plugins():
+    """
+    Print a list of available plugins (note that this imports all of them)
 
-from .io.calculate_flux import calculate_point_source_flux
+    :return:
+    """
+    print("Available plugins:\n")
 
-# Added by JM. step generator for time-resolved fits
-from .utils.step_parameter_generator import step_generator
+    for class_name, instrument in sorted(_plugins.items()):
 
-from .parallel.parallel_client import parallel_computation
+        if _import_plugin(class_name) is not None:
 
-#
-from threeML.io.uncertainty_formatter import interval_to_errors
+            print("%s for %s" % (class_name, instrument))
 
 
-# Import optical filters
-#from threeML.plugins.photometry.filter_factory import threeML_filter_library
+def _display_plugin_traceback(plugin):
 
-# import time series builder, soon to replace the Fermi plugins
-from threeML.utils.data_builders import *
+    print("#############################################################")
+    print("\nCouldn't import plugin %s" % plugin)
+    print("\nTraceback:\n")
+    print(_not_working_plugins[plugin])
+    print("#############################################################")
 
-# Import catalogs
-from threeML.catalogs import *
 
-# Import GBM  downloader
+def is_plugin_available(plugin):
+    """
+    Test whether the plugin for the provided instrument is available
 
-from threeML.utils.data_download.Fermi_GBM.download_GBM_data import download_GBM_trigger_data
+    :param plugin: the name of the plugin class
+    :return: True or False
+    """
 
-# Import LLE downloader
-from threeML.utils.data_download.Fermi_LAT.download_LLE_data import download_LLE_trigger_data
+    if plugin not in _plugins:
 
-# Now read the configuration and make it available as threeML_config
-from .config.config import threeML_config
+        raise RuntimeError("Plugin %s is not known" % plugin)
 
-import astropy.units as u
+    plugin_class = _import_plugin(plugin)
 
-import os
+    if plugin_class is None:
+
+        _display_plugin_traceback(plugin)
+
+        return False
+
+    # FIXME
+    if plugin == "FermipyLike":
 
-# Import the LAT data downloader
-from threeML.utils.data_download.Fermi_LAT.download_LAT_data import download_LAT_data
+        try:
+
+            _ = plugin_class.__new__(plugin_class, test=True)
+
+        except:
 
-# Import the results loader
-from threeML.analysis_results import load_analysis_results
+            # Do not register it
+
+            _not_working_plugins[plugin] = traceback.format_exc()
+
+            _display_plugin_traceback(plugin)
+
+            return False
+
+    return True
 
-# Import the plot_style context manager and the function to create new styles
-from .io.plotting.plot_style import plot_style, create_new_plotting_style, get_available_plotting_styles
 
 # Check that the number of threads is set to 1 for all multi-thread libraries
 # otherwise numpy operations will be way slower than what they could be, since
@@ -283,3 +300,7 @@ for var in var_to_check:
 
         custom_warnings.warn("Env. variable %s is not set. Please set it to 1 for optimal performances in 3ML" % var,
                              RuntimeWarning)
+
+# Finally replace this module with its lazy version
+
+sys.modules[__name__] = LazyModule(sys.modules[__name__], _lazy_attributes, _on_import_error)
@@ -122,7 +122,8 @@ def _load_one_results(fits_extension):
 
         # Instance and return
 
-        return MLEResults(optimized_model, covariance_matrix, statistic_values, statistical_measures=measure_values)
+        return MLEResults(optimized_model, covariance_matrix, statistic_values, statistical_measures=measure_values,
+                          lazy=True)
 
     elif analysis_type == "Bayesian":
 
@@ -243,8 +244,8 @@ class ANALYSIS_RESULTS(FITSExtension):
 
             covariance_matrix = np.zeros(n_parameters)
 
-            # Gather the samples
-            samples = analysis_results._samples_transposed
+            # Gather the samples (they might be stored on disk, see threeML.bayesian.chain_storage)
+            samples = np.array(analysis_results._samples_transposed)
 
         # Serialize the model so it can be placed in the header
 
@@ -358,9 +359,13 @@ class _AnalysisResults(object):
 
         self._n_free_parameters = len(optimized_model.free_parameters)
 
-        assert samples.shape[1] == self._n_free_parameters, "Number of free parameters (%s) and set of samples (%s) " \
-                                                            "do not agree." % (samples.shape[1],
-                                                                               self._n_free_parameters)
+        # NOTE: samples can be None if a subclass generates them on demand (see the _samples_transposed property)
+
+        if samples is not None:
+
+            assert samples.shape[1] == self._n_free_parameters, "Number of free parameters (%s) and set of samples " \
+                                                                "(%s) do not agree." % (samples.shape[1],
+                                                                                        self._n_free_parameters)
 
         # NOTE: we clone the model so that whatever happens outside or after, this copy of the model will not be
         # changed
@@ -369,7 +374,7 @@ class _AnalysisResults(object):
 
         # Save a transposed version of the samples for easier access
 
-        self._samples_transposed = samples.T
+        self._stored_samples_transposed = samples.T if samples is not None else None
 
         # Store likelihood values in a pandas Series
 
@@ -389,6 +394,14 @@ class _AnalysisResults(object):
         # Set the analysis type
         self._analysis_type = analysis_type
 
+        # This is filled only if the analysis has been profiled (see LikelihoodProfiler)
+        self._profiling_summary = None
+
+    @property
+    def _samples_transposed(self):
+
+        return self._stored_samples_transposed
+
     @property
     def samples(self):
         """
@@ -404,6 +417,30 @@ class _AnalysisResults(object):
 
         return self._analysis_type
 
+    @property
+    def profiling_summary(self):
+        """
+        Returns the time spent in each plugin and in each stage of the computation of the likelihood, if the analysis
+        has been run with profile=True, or None otherwise (see LikelihoodProfiler.summary)
+
+        :return: a pandas DataFrame or None
+        """
+
+        return self._profiling_summary
+
+    @profiling_summary.setter
+    def profiling_summary(self, summary):
+
+        self._profiling_summary = summary
+
+    def _display_profiling_summary(self):
+
+        if self._profiling_summary is not None:
+
+            print("\nProfiling of the likelihood computation:\n")
+
+            display(self._profiling_summary)
+
     def write_to(self, filename, overwrite=False):
         """
         Write results to a FITS file
@@ -616,14 +653,14 @@ class _AnalysisResults(object):
 
             parameter_paths.append(this_par.path)
 
-            this_phys_q = self.get_variates(parameter_paths[-1])
-
-            values.append(this_phys_q.value)
-
             units_dict.append(this_par.unit)
 
             if error_type != "covariance":
 
+                this_phys_q = self.get_variates(parameter_paths[-1])
+
+                values.append(this_phys_q.value)
+
                 low_bound, hi_bound = errors_gatherer(this_phys_q, cl)
 
                 negative_errors.append(low_bound - values[-1])
@@ -632,6 +669,10 @@ class _AnalysisResults(object):
 
             else:
 
+                # The errors come from the covariance matrix, so there is no need to access the samples here
+
+                values.append(self._values[i])
+
                 std_dev = np.sqrt(covariance[i, i])
 
                 if this_par.has_transformation():
@@ -788,6 +829,23 @@ class BayesianResults(_AnalysisResults):
 
         super(BayesianResults, self).__init__(optimized_model, samples, posterior_values, 'Bayesian', statistical_measures)
 
+        self._convergence_diagnostics = None
+
+    @property
+    def convergence_diagnostics(self):
+        """
+        Returns the integrated autocorrelation time, the effective sample size and the Gelman-Rubin statistic for each
+        parameter, if they have been computed by the sampler, or None otherwise
+
+        :return: a pandas DataFrame or None
+        """
+
+        return self._convergence_diagnostics
+
+    @convergence_diagnostics.setter
+    def convergence_diagnostics(self, diagnostics):
+
+        self._convergence_diagnostics = diagnostics
 
     def get_correlation_matrix(self):
         """
@@ -833,6 +891,14 @@ class BayesianResults(_AnalysisResults):
 
         display(self.get_statistic_measure_frame())
 
+        if self._convergence_diagnostics is not None:
+
+            print("\nConvergence diagnostics:\n")
+
+            display(self._convergence_diagnostics)
+
+        self._display_profiling_summary()
+
     def corner_plot(self, renamed_parameters=None, **kwargs):
         """
         Produce the corner plot showing the marginal distributions in one and two directions.
@@ -1300,12 +1366,18 @@ class MLEResults(_AnalysisResults):
     :type likelihood_values: dict
     :param n_samples: Number of samples to use
     :type n_samples: int
+    :param lazy: if True, the samples are not generated until they are needed (for example for error propagation
+    or plotting). This saves time when many fits are performed and the samples are never used.
+    :type lazy: bool
     :return: an _AnalysisResults instance
     """
 
-    def __init__(self, optimized_model, covariance_matrix, likelihood_values, n_samples=5000, statistical_measures=None):
+    # Maximum number of times we draw new samples to replace the ones falling outside of the boundaries
 
-        # Generate samples for each parameter accounting for their covariance
+    _max_resampling_rounds = 10
+
+    def __init__(self, optimized_model, covariance_matrix, likelihood_values, n_samples=5000, statistical_measures=None,
+                 lazy=False):
 
         # Force covariance into proper type
         covariance_matrix = np.array(covariance_matrix, float, copy=True)
@@ -1325,20 +1397,15 @@ class MLEResults(_AnalysisResults):
 
             assert np.all(np.isfinite(covariance_matrix)), "Covariance matrix contains Nan or inf. Cannot continue."
 
-            # Generate samples from the multivariate normal distribution, i.e., accounting for the covariance of the
-            # parameters
-
-            samples = np.random.multivariate_normal(np.array(values).T, covariance_matrix, n_samples)
+            has_covariance = True
 
         else:
 
-            # No error information, just make duplicates of the values
-            samples = np.ones((n_samples, len(values))) * np.array(values)
+            # No error information. Make a fake covariance matrix
 
-            # Make a fake covariance matrix
             covariance_matrix = np.zeros(expected_shape)
 
-        # Now reject the samples outside of the boundaries. If we reject more than 1% we warn the user
+            has_covariance = False
 
         # Gather boundaries
         # NOTE: every None boundary will become nan thanks to the casting to float
@@ -1349,42 +1416,112 @@ class MLEResults(_AnalysisResults):
         low_bounds[np.isnan(low_bounds)] = -np.inf
         hi_bounds[np.isnan(hi_bounds)] = np.inf
 
-        to_be_kept_mask = np.ones(samples.shape[0], bool)
+        # Store what we need to generate the samples, now or later
 
-        for i, sample in enumerate(samples):
+        self._internal_values = np.array(values, float)
+        self._has_covariance = has_covariance
+        self._low_bounds = low_bounds
+        self._hi_bounds = hi_bounds
+        self._n_samples = int(n_samples)
 
-            if np.any(sample > hi_bounds) or np.any(sample < low_bounds):
-                # Remove this sample
-                to_be_kept_mask[i] = False
+        # Store the covariance matrix
 
-        # Compute how many samples we have removed
-        n_removed_samples = samples.shape[0] - np.sum(to_be_kept_mask)
+        self._covariance_matrix = covariance_matrix
 
-        # Warn the user if more than 1% of the samples have been lost
+        # Finally build the class. The samples are generated below (or on demand if lazy=True)
+
+        super(MLEResults, self).__init__(optimized_model, None, likelihood_values, "MLE", statistical_measures)
+
+        if not lazy:
+
+            self._stored_samples_transposed = self._generate_samples().T
+
+    @property
+    def _samples_transposed(self):
 
-        if n_removed_samples > samples.shape[0] / 100.0:
-            custom_warnings.warn("%s percent of samples have been thrown away because they failed the constraints "
+        # Generate the samples the first time they are needed
+
+        if self._stored_samples_transposed is None:
+
+            self._stored_samples_transposed = self._generate_samples().T
+
+        return self._stored_samples_transposed
+
+    def _draw_samples_within_bounds(self, n_samples):
+
+        # Generate samples for each parameter accounting for their covariance
+
+        if self._has_covariance:
+
+            samples = np.random.multivariate_normal(self._internal_values, self._covariance_matrix, n_samples)
+
+        else:
+
+            # No error information, just make duplicates of the values
+            samples = np.tile(self._internal_values, (n_samples, 1))
+
+        # Keep only the samples within the boundaries
+
+        to_be_kept_mask = np.all((samples >= self._low_bounds) & (samples <= self._hi_bounds), axis=1)
+
+        return samples[to_be_kept_mask, :]
+
+    def _generate_samples(self):
+        """
+        Generate the samples from the multivariate normal distribution defined by the best fit values and the
+        covariance matrix. Samples outside of the boundaries of the parameters are rejected and replaced with new
+        ones, so that (unless the boundaries reject nearly everything) exactly n_samples samples are returned.
+
+        :return: a (n_samples, n_free_parameters) array in the external (i.e., not transformed) space
+        """
+
+        n_samples = self._n_samples
+
+        samples = self._draw_samples_within_bounds(n_samples)
+
+        # Compute how many samples we have removed. If we reject more than 1% we warn the user
+
+        n_removed_samples = n_samples - samples.shape[0]
+
+        if n_removed_samples > n_samples / 100.0:
+            custom_warnings.warn("%s percent of samples have been replaced because they failed the constraints "
                                  "on the parameters. This results might not be suitable for error propagation. "
                                  "Enlarge the boundaries until you loose less than 1 percent of the samples." %
-                                 (float(n_removed_samples) / samples.shape[0] * 100.0))
+                                 (float(n_removed_samples) / n_samples * 100.0))
 
-        # Now remove them
-        samples = samples[to_be_kept_mask, :]
+        # Replace the rejected samples with new ones, drawing enough to (most likely) fill the gap in one go
 
-        # Now transform in the external space
-        for i, parameter in enumerate(optimized_model.free_parameters.values()):
+        n_drawn = n_samples
+        n_rounds = 0
 
-            if parameter.has_transformation():
+        # (without a covariance matrix all samples are identical, so drawing again would not help)
 
-                samples[:, i] = parameter.transformation.backward(samples[:, i])
+        while self._has_covariance and samples.shape[0] < n_samples and n_rounds < self._max_resampling_rounds:
 
-        # Finally build the class
+            acceptance = max(samples.shape[0] / float(n_drawn), 0.01)
 
-        super(MLEResults, self).__init__(optimized_model, samples, likelihood_values, "MLE", statistical_measures)
+            n_to_draw = int(np.ceil((n_samples - samples.shape[0]) / acceptance * 1.1))
 
-        # Store the covariance matrix
+            samples = np.vstack((samples, self._draw_samples_within_bounds(n_to_draw)))
 
-        self._covariance_matrix = covariance_matrix
+            n_drawn += n_to_draw
+            n_rounds += 1
+
+        if samples.shape[0] < n_samples:
+
+            custom_warnings.warn("Could only generate %i samples within the boundaries of the parameters (out of %i "
+                                 "requested)" % (samples.shape[0], n_samples))
+
+        samples = samples[:n_samples, :]
+
+        # Now transform in the external space
+        for i, parameter in enumerate(self._free_parameters.values()):
+
+            if parameter.has_transformation():
+
+                samples[:, i] = parameter.transformation.backward(samples[:, i])
+
+        return samples
 
     @property
     def covariance_matrix(self):
@@ -1410,6 +1547,17 @@ class MLEResults(_AnalysisResults):
 
         return self._get_statistic_frame(name='-log(likelihood)')
 
+    def get_covariance_data_frame(self, cl=0.68):
+        """
+        Returns a pandas DataFrame with the parameters and their errors computed from the covariance matrix, with the
+        confidence level specified in cl. Contrary to get_data_frame, this does not need the samples.
+
+        :param cl: confidence level (0 < cl < 1)
+        :return: a pandas DataFrame instance
+        """
+
+        return self._get_results_table(error_type="covariance", cl=cl, covariance=self.covariance_matrix).frame
+
     def display(self, display_correlation=True, cl=0.68):
 
         best_fit_table = self._get_results_table(error_type="covariance", cl=cl, covariance=self.covariance_matrix)
@@ -1437,6 +1585,8 @@ class MLEResults(_AnalysisResults):
 
         display(self.get_statistic_measure_frame())
 
+        self._display_profiling_summary()
+
 
 class AnalysisResultsSet(collections.Sequence):
     """
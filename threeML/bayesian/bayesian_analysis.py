@@ -58,15 +58,26 @@ import time
 
 import matplotlib.pyplot as plt
 
-from threeML.parallel.parallel_client import ParallelClient
+from threeML.parallel.parallel_client import ParallelClient, is_parallel_computation_active
+from threeML.parallel.fork_pool import ForkPool
 from threeML.config.config import threeML_config
 from threeML.io.progress_bar import progress_bar
 from threeML.exceptions.custom_exceptions import LikelihoodIsInfinite, custom_warnings
 from threeML.analysis_results import BayesianResults
-from threeML.utils.statistics.stats_tools import aic, bic, dic
+from threeML.utils.statistics.stats_tools import aic, bic, dic, get_convergence_diagnostics
+from threeML.utils.likelihood_profiler import LikelihoodProfiler
 
 from astromodels import ModelAssertionViolation, use_astromodels_memoization
 
+# copyreg is called copy_reg in python2
+try:
+
+    import copyreg #py3
+
+except ImportError:
+
+    import copy_reg as copyreg #py2
+
 
 def sample_with_progress(title, p0, sampler, n_samples, **kwargs):
     # Loop collecting n_samples samples
@@ -81,15 +92,52 @@ def sample_with_progress(title, p0, sampler, n_samples, **kwargs):
 
             progress.animate((i + 1))
 
-            # Get the vectors with the results
+            # Get the vectors with the results (the blobs, if any, are stored in the sampler anyway)
 
-            pos, prob, state = result
+            pos, prob, state = result[:3]
 
     return pos, prob, state
 
 
 def sample_without_progress(p0, sampler, n_samples, title=None, **kwargs):
-    return sampler.run_mcmc(p0, n_samples, **kwargs)
+    return sampler.run_mcmc(p0, n_samples, **kwargs)[:3]
+
+
+class _PosteriorMap(object):
+
+    def __init__(self, analysis, map_function):
+        """
+        Used as the "pool" of the emcee sampler, so that the posterior for all the walkers is computed at once: the
+        priors are evaluated in a vectorized way, then the likelihood is computed (using map_function) only for the
+        points with a non-zero prior. The log-likelihood is returned together with the log-posterior, so that emcee
+        stores it as a blob and we do not need to compute it again after sampling.
+
+        :param analysis: the BayesianAnalysis instance
+        :param map_function: a function which takes a list of points and returns the list of the corresponding
+        log-likelihood values (it can be serial or parallel)
+        """
+
+        self._analysis = analysis
+        self._map_function = map_function
+
+    def map(self, function, points):
+
+        # NOTE: emcee passes here a wrapper around the posterior function, which is not needed since we already know
+        # how to compute the posterior
+
+        points = np.array(points)
+
+        log_priors = self._analysis._log_prior_vectorized(points)
+
+        log_likes = np.zeros_like(log_priors) - np.inf
+
+        allowed = np.isfinite(log_priors)
+
+        if np.any(allowed):
+
+            log_likes[allowed] = list(self._map_function(list(points[allowed])))
+
+        return zip(log_priors + log_likes, log_likes)
 
 
 class BayesianAnalysis(object):
@@ -203,7 +251,31 @@ class BayesianAnalysis(object):
 
         return self._marginal_likelihood
 
-    def sample(self, n_walkers, burn_in, n_samples, quiet=False, seed=None):
+    def _sample_with_profiling(self, sampling_method, quiet, **kwargs):
+        """
+        Run one of the sampling methods while measuring the time spent in each plugin (see LikelihoodProfiler), and
+        store the summary in the results
+
+        :param sampling_method: the sampling method (for example self.sample)
+        :param quiet: if False, print the results (including the profiling summary)
+        :param kwargs: the other parameters for the sampling method
+        :return: MCMC samples
+        """
+
+        with LikelihoodProfiler(self._data_list, 'get_log_like') as profiler:
+
+            samples = sampling_method(quiet=True, **kwargs)
+
+        self._results.profiling_summary = profiler.summary
+
+        if not quiet:
+
+            self._results.display()
+
+        return samples
+
+    def sample(self, n_walkers, burn_in, n_samples, quiet=False, seed=None, profile=False, processes=1,
+               chain_file=None, resume=False, checkpoint_every=100, thin=1, target_ess=None):
         """
         Sample the posterior with the Goodman & Weare's Affine Invariant Markov chain Monte Carlo
         :param n_walkers:
@@ -211,11 +283,55 @@ class BayesianAnalysis(object):
         :param n_samples:
         :param quiet: if False, do not print results
         :param seed: if provided, it is used to seed the random numbers generator before the MCMC
+        :param profile: if True, measure the time spent in each plugin and in each stage of the computation of the
+        likelihood. The summary is available as results.profiling_summary (default: False)
+        :param processes: number of local processes to use to compute the likelihood for the walkers (default: 1).
+        This is ignored if parallel computation (with the ipyparallel cluster) is active
+        :param chain_file: if provided, the chain is written incrementally to this HDF5 file instead of being kept
+        in memory, and the state of the walkers is saved every checkpoint_every steps (default: None)
+        :param resume: if True and chain_file exists, continue the sampling from the last checkpoint stored there
+        (default: False)
+        :param checkpoint_every: number of steps between two checkpoints, when using chain_file (default: 100)
+        :param thin: keep only one step every thin steps of the chain (default: 1)
+        :param target_ess: if provided, stop the burn-in as soon as the walkers have converged and the sampling as
+        soon as the effective sample size (number of walkers times number of steps divided by the integrated
+        autocorrelation time) is at least target_ess for all parameters. In this case burn_in and n_samples are
+        the maximum number of steps for the two phases. See the "bayesian" section of the configuration for the
+        convergence criteria (default: None, i.e., use exactly burn_in and n_samples steps)
 
         :return: MCMC samples
 
         """
 
+        processes = int(processes)
+
+        assert processes > 0, "The number of processes must be > 0"
+
+        thin = int(thin)
+
+        assert thin > 0, "thin must be > 0"
+
+        checkpoint_every = int(checkpoint_every)
+
+        assert checkpoint_every > 0, "checkpoint_every must be > 0"
+
+        assert target_ess is None or chain_file is None, "Adaptive stopping (target_ess) is not supported when " \
+                                                         "storing the chain in a file"
+
+        if profile:
+
+            if is_parallel_computation_active() or processes > 1:
+
+                custom_warnings.warn("Profiling is not supported with parallel computation. Sampling without "
+                                     "profiling.")
+
+            else:
+
+                return self._sample_with_profiling(self.sample, quiet, n_walkers=n_walkers, burn_in=burn_in,
+                                                   n_samples=n_samples, seed=seed, chain_file=chain_file,
+                                                   resume=resume, checkpoint_every=checkpoint_every, thin=thin,
+                                                   target_ess=target_ess)
+
         self._update_free_parameters()
 
         n_dim = len(self._free_parameters.keys())
@@ -226,6 +342,8 @@ class BayesianAnalysis(object):
 
         sampling_procedure = sample_with_progress
 
+        pool = None
+
         # Deactivate memoization in astromodels, which is useless in this case since we will never use twice the
         # same set of parameters
         with use_astromodels_memoization(False):
@@ -235,54 +353,121 @@ class BayesianAnalysis(object):
                 c = ParallelClient()
                 view = c[:]
 
-                sampler = emcee.EnsembleSampler(n_walkers, n_dim,
-                                                self.get_posterior,
-                                                pool=view)
+                posterior_map = _PosteriorMap(self, lambda points: view.map_sync(self._get_log_like_at, points))
 
                 # Sampling with progress in parallel is super-slow, so let's
                 # use the non-interactive one
                 sampling_procedure = sample_without_progress
 
+            elif processes > 1:
+
+                # The processes get their own copy of the model and of the data once, instead of receiving them at
+                # each evaluation of the likelihood
+                # NOTE: this needs to happen within the context manager, so that the processes inherit the
+                # deactivation of the memoization
+
+                pool = ForkPool(self._get_log_like_at, processes)
+
+                posterior_map = _PosteriorMap(self, pool.map)
+
             else:
 
-                sampler = emcee.EnsembleSampler(n_walkers, n_dim,
-                                                self.get_posterior)
+                posterior_map = _PosteriorMap(self, lambda points: map(self._get_log_like_at, points))
+
+            sampler = emcee.EnsembleSampler(n_walkers, n_dim,
+                                            self._get_log_posterior_and_log_like,
+                                            pool=posterior_map)
+
+            try:
 
-            # If a seed is provided, set the random number seed
-            if seed is not None:
+                if chain_file is not None:
 
-                sampler._random.seed(seed)
+                    self._sample_with_chain_storage(sampler, p0, burn_in, n_samples, seed, chain_file, resume,
+                                                    checkpoint_every, thin)
 
-            # Sample the burn-in
-            pos, prob, state = sampling_procedure(title="Burn-in", p0=p0, sampler=sampler, n_samples=burn_in)
+                elif target_ess is not None:
 
-            # Reset sampler
+                    self._sample_adaptively(sampler, p0, burn_in, n_samples, target_ess, seed, thin, quiet)
 
-            sampler.reset()
+                else:
 
-            # Run the true sampling
+                    # If a seed is provided, set the random number seed
+                    if seed is not None:
 
-            _ = sampling_procedure(title="Sampling", p0=pos, sampler=sampler, n_samples=n_samples, rstate0=state)
+                        sampler._random.seed(seed)
+
+                    # Sample the burn-in
+                    pos, prob, state = sampling_procedure(title="Burn-in", p0=p0, sampler=sampler,
+                                                          n_samples=burn_in)
+
+                    # Reset sampler
+
+                    sampler.reset()
+
+                    # Run the true sampling
+
+                    _ = sampling_procedure(title="Sampling", p0=pos, sampler=sampler, n_samples=n_samples,
+                                           rstate0=state, thin=thin)
+
+            finally:
+
+                if pool is not None:
+
+                    pool.close()
+
+                # Do not keep a reference to the pool in the sampler, if it is used again it will be serial
+
+                sampler.pool = None
 
         acc = np.mean(sampler.acceptance_fraction)
 
         print("\nMean acceptance fraction: %s\n" % acc)
 
         self._sampler = sampler
-        self._raw_samples = sampler.flatchain
 
-        # Compute the corresponding values of the likelihood
+        if chain_file is not None:
+
+            # The samples are read from disk only when needed. The chain storage needs PyTables, so it is imported
+            # only when a chain file is used
+
+            from threeML.bayesian.chain_storage import StoredChain
+
+            stored_chain = StoredChain(chain_file)
+
+            self._raw_samples = stored_chain.samples
+
+            self._log_like_values = stored_chain.log_like
+
+            self._log_probability_values = stored_chain.log_probability
+
+            # The samples are stored by (step, walker). Read one parameter at the time
+
+            samples_by_parameter = self._raw_samples.T
+
+            chains = (samples_by_parameter[i].reshape((-1, n_walkers)).T for i in range(n_dim))
+
+        else:
+
+            self._raw_samples = sampler.flatchain
+
+            # The values of the log-likelihood have been stored as blobs, which are ordered by (step, walker) while
+            # the flat chain is ordered by (walker, step)
+
+            self._log_like_values = np.array(sampler.blobs, dtype=float).T.flatten()
+
+            # we also want to store the log probability
+
+            self._log_probability_values = sampler.flatlnprobability
 
-        # First we need the prior
-        log_prior = map(lambda x: self._log_prior(x), self._raw_samples)
+            chains = (sampler.chain[:, :, i] for i in range(n_dim))
 
-        # Now we get the log posterior and we remove the log prior
+        if self._raw_samples.shape[0] > n_walkers:
 
-        self._log_like_values = sampler.flatlnprobability - log_prior
+            convergence_diagnostics = get_convergence_diagnostics(chains, self._free_parameters.keys())
 
-        # we also want to store the log probability
+        else:
 
-        self._log_probability_values = sampler.flatlnprobability
+            convergence_diagnostics = None
 
         self._marginal_likelihood = None
 
@@ -290,13 +475,193 @@ class BayesianAnalysis(object):
 
         self._build_results()
 
+        self._results.convergence_diagnostics = convergence_diagnostics
+
         # Display results
         if not quiet:
             self._results.display()
 
         return self.samples
 
-    def sample_parallel_tempering(self, n_temps, n_walkers, burn_in, n_samples, quiet=False):
+    def _sample_with_chain_storage(self, sampler, p0, burn_in, n_samples, seed, chain_file, resume,
+                                   checkpoint_every, thin):
+        """
+        Run the burn-in and the sampling writing the chain to disk and saving checkpoints (see ChainStorage), possibly
+        resuming from the last checkpoint stored in the chain file
+        """
+
+        from threeML.bayesian.chain_storage import ChainStorage, BURN_IN, SAMPLING
+
+        storage = ChainStorage(chain_file, self._free_parameters.keys(), sampler.k, thin=thin, resume=resume)
+
+        try:
+
+            phase, step, position, log_probability, log_like, random_state = storage.checkpoint
+
+            if phase == BURN_IN and step == 0:
+
+                # Start from scratch
+
+                position, log_probability, log_like = p0, None, None
+
+                if seed is not None:
+
+                    sampler._random.seed(seed)
+
+            else:
+
+                print("\nResuming from the checkpoint stored in %s (%s, step %i)\n" % (storage.filename, phase, step))
+
+                sampler.random_state = random_state
+
+            if phase == BURN_IN:
+
+                position, log_probability, log_like = self._run_chain_storage_phase(sampler, storage, BURN_IN, step,
+                                                                                    burn_in, position,
+                                                                                    log_probability, log_like,
+                                                                                    checkpoint_every)
+
+                step = 0
+
+            _ = self._run_chain_storage_phase(sampler, storage, SAMPLING, step, n_samples, position,
+                                              log_probability, log_like, checkpoint_every)
+
+        finally:
+
+            storage.close()
+
+    @staticmethod
+    def _run_chain_storage_phase(sampler, storage, phase, first_step, n_steps, position, log_probability, log_like,
+                                 checkpoint_every):
+
+        from threeML.bayesian.chain_storage import BURN_IN, SAMPLING
+
+        n_remaining = n_steps - first_step
+
+        if n_remaining <= 0:
+
+            return position, log_probability, log_like
+
+        title = "Burn-in" if phase == BURN_IN else "Sampling"
+
+        with progress_bar(n_remaining, title=title) as progress:
+
+            # NOTE: with storechain=False the sampler does not keep the chain in memory
+
+            for i, (position, log_probability, random_state, log_like) in enumerate(
+                    sampler.sample(position, lnprob0=log_probability, blobs0=log_like, iterations=n_remaining,
+                                   storechain=False)):
+
+                step = first_step + i + 1
+
+                if phase == SAMPLING:
+
+                    storage.store(step, position, log_probability, log_like)
+
+                if step % checkpoint_every == 0 or step == n_steps:
+
+                    storage.save_checkpoint(phase, step, position, log_probability, log_like, random_state)
+
+                progress.animate(i + 1)
+
+        return position, log_probability, log_like
+
+    def _sample_adaptively(self, sampler, p0, max_burn_in, max_n_samples, target_ess, seed, thin, quiet=False):
+        """
+        Run the burn-in and the sampling, stopping each one of them as soon as the convergence criteria defined in
+        the "bayesian" section of the configuration are satisfied, or when the maximum number of steps is reached
+        """
+
+        check_interval = int(threeML_config['bayesian']['convergence check interval'])
+
+        assert check_interval > 0, "The convergence check interval must be > 0"
+
+        threshold = float(threeML_config['bayesian']['gelman-rubin threshold'])
+
+        n_times = float(threeML_config['bayesian']['minimum autocorrelation times'])
+
+        parameter_names = self._free_parameters.keys()
+
+        def is_converged(first_step, minimum_ess):
+
+            # Use the steps stored by the sampler from first_step on
+
+            chains = [sampler.chain[:, first_step:, i] for i in range(sampler.dim)]
+
+            diagnostics = get_convergence_diagnostics(chains, parameter_names)
+
+            n_steps = chains[0].shape[1]
+
+            return (np.all(diagnostics['gelman-rubin'] < threshold) and
+                    np.all(n_steps >= n_times * diagnostics['autocorrelation time']) and
+                    np.all(diagnostics['effective sample size'] >= minimum_ess))
+
+        if seed is not None:
+
+            sampler._random.seed(seed)
+
+        # Burn-in: the first half of the burn-in is always discarded when checking the convergence, since it
+        # depends on the starting points
+
+        state = self._run_adaptive_phase(sampler, "Burn-in", max_burn_in, (p0, None, None, None), check_interval,
+                                         1, lambda: is_converged(sampler.chain.shape[1] // 2, 0), quiet)
+
+        sampler.reset()
+
+        _ = self._run_adaptive_phase(sampler, "Sampling", max_n_samples, state, check_interval, thin,
+                                     lambda: is_converged(0, target_ess), quiet)
+
+    @staticmethod
+    def _run_adaptive_phase(sampler, title, max_n_steps, state, check_interval, thin, is_converged, quiet=False):
+        """
+        Run the sampler in blocks of check_interval steps until is_converged() returns True, or until max_n_steps
+        steps have been made. The number of steps needed to converge is printed unless quiet is True
+
+        :return: the state of the sampler at the end (position, log probability, random state, blobs)
+        """
+
+        n_steps = 0
+
+        converged = False
+
+        position, log_probability, random_state, log_like = state
+
+        with progress_bar(max_n_steps, title=title) as progress:
+
+            while n_steps < max_n_steps:
+
+                this_n_steps = min(check_interval, max_n_steps - n_steps)
+
+                for i, (position, log_probability, random_state, log_like) in enumerate(
+                        sampler.sample(position, lnprob0=log_probability, rstate0=random_state, blobs0=log_like,
+                                       iterations=this_n_steps, thin=thin)):
+
+                    progress.animate(n_steps + i + 1)
+
+                n_steps += this_n_steps
+
+                # Make sure that some samples have been stored before checking the convergence
+
+                converged = sampler.chain.shape[1] > 1 and is_converged()
+
+                if converged:
+
+                    break
+
+        if converged:
+
+            if not quiet:
+
+                print("\n%s converged after %i steps\n" % (title, n_steps))
+
+        else:
+
+            custom_warnings.warn("%s did not satisfy the convergence criteria within the maximum number of steps "
+                                 "(%i). Consider increasing it." % (title, max_n_steps))
+
+        return position, log_probability, random_state, log_like
+
+    def sample_parallel_tempering(self, n_temps, n_walkers, burn_in, n_samples, quiet=False, profile=False):
         """
         Sample with parallel tempering
 
@@ -304,11 +669,25 @@ class BayesianAnalysis(object):
         :param: n_walkers
         :param: burn_in
         :param: n_samples
+        :param profile: if True, measure the time spent in each plugin and in each stage of the computation of the
+        likelihood. The summary is available as results.profiling_summary (default: False)
 
         :return: MCMC samples
 
         """
 
+        if profile:
+
+            if is_parallel_computation_active():
+
+                custom_warnings.warn("Profiling is not supported with parallel computation. Sampling without "
+                                     "profiling.")
+
+            else:
+
+                return self._sample_with_profiling(self.sample_parallel_tempering, quiet, n_temps=n_temps,
+                                                   n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples)
+
         free_parameters = self._likelihood_model.free_parameters
 
         n_dim = len(free_parameters.keys())
@@ -801,6 +1180,60 @@ class BayesianAnalysis(object):
 
         return log_prior
 
+    def _log_prior_vectorized(self, points):
+        """
+        Compute the sum of the log-priors for many points at once
+
+        :param points: a (n_points, n_free_parameters) array
+        :return: an array of n_points log-prior values (-inf for the points outside of the allowed region)
+        """
+
+        points = np.array(points, ndmin=2, dtype=float)
+
+        log_prior = np.zeros(points.shape[0])
+
+        # Points outside of the allowed region have a prior of zero, so the log is -inf (as expected)
+
+        with np.errstate(divide='ignore'):
+
+            for i, parameter in enumerate(self._free_parameters.values()):
+
+                log_prior += np.log10(parameter.prior(points[:, i]))
+
+        return log_prior
+
+    def _get_log_like_at(self, trial_values):
+        """
+        Assign the trial values to the free parameters and compute the log-likelihood
+
+        :param trial_values: the values of the free parameters
+        :return: the log-likelihood
+        """
+
+        for parameter, value in zip(self._free_parameters.values(), trial_values):
+
+            parameter.value = value
+
+        return self._log_like(trial_values)
+
+    def _get_log_posterior_and_log_like(self, trial_values):
+        """
+        Compute the posterior for the normal sampler, returning also the log-likelihood (stored as a blob by emcee)
+
+        :param trial_values: the values of the free parameters
+        :return: (log-posterior, log-likelihood)
+        """
+
+        log_prior = self._log_prior(trial_values)
+
+        if not np.isfinite(log_prior):
+
+            return -np.inf, -np.inf
+
+        log_like = self._log_like(trial_values)
+
+        return log_like + log_prior, log_like
+
     def _log_like(self, trial_values):
         """Compute the log-likelihood"""
 
@@ -895,3 +1328,13 @@ class BayesianAnalysis(object):
         # Sort univariate node
         sx = np.sort(x)
         return np.array(self._calc_min_interval(sx, alpha))
+
+
+# Make BayesianAnalysis instances serializable (needed for parallel computation)
+
+def pickle_bayesian_analysis(bs):
+
+    return BayesianAnalysis, (bs.likelihood_model, bs.data_list)
+
+
+copyreg.pickle(BayesianAnalysis, pickle_bayesian_analysis)
@@ -0,0 +1,332 @@
+import os
+
+import numpy as np
+import tables
+
+from threeML.io.file_utils import sanitize_filename, file_existing_and_readable
+
+
+class IncompatibleChainFile(RuntimeError):
+    pass
+
+
+# Phases of the sampling, as stored in the checkpoint
+
+BURN_IN = 'burn-in'
+SAMPLING = 'sampling'
+
+
+class ChainStorage(object):
+
+    def __init__(self, filename, parameter_names, n_walkers, thin=1, resume=False):
+        """
+        Store incrementally the chain produced by an ensemble sampler in a HDF5 file, together with a checkpoint of
+        the state of the walkers which allows to resume the sampling if it is interrupted.
+
+        The samples are stored by parameter (i.e., as a (n_parameters, n_samples) array) so that the samples for one
+        parameter can be read from disk without reading the others. Samples are kept in memory only between two
+        checkpoints, and only one step every "thin" steps is stored.
+
+        :param filename: name of the HDF5 file
+        :param parameter_names: names of the free parameters
+        :param n_walkers: number of walkers
+        :param thin: store only one step every thin steps (default: 1, i.e., store everything)
+        :param resume: if True and the file exists, open it to continue the sampling from the last checkpoint.
+        Otherwise, a new file is created (if the file already exists an exception is raised)
+        """
+
+        self._filename = sanitize_filename(filename, abspath=True)
+
+        self._parameter_names = list(parameter_names)
+
+        self._n_walkers = int(n_walkers)
+
+        self._thin = int(thin)
+
+        assert self._thin > 0, "thin must be > 0"
+
+        if resume and file_existing_and_readable(self._filename):
+
+            self._file = tables.open_file(self._filename, mode='a')
+
+            self._check_compatibility()
+
+        else:
+
+            if os.path.exists(self._filename):
+
+                raise IOError("The chain file %s already exists. Use resume=True to continue the sampling stored "
+                              "there, or remove it." % self._filename)
+
+            self._file = tables.open_file(self._filename, mode='w')
+
+            self._create_layout()
+
+        # Samples accumulated since the last checkpoint
+
+        self._buffer_samples = []
+        self._buffer_log_probability = []
+        self._buffer_log_like = []
+
+    def _create_layout(self):
+
+        n_dim = len(self._parameter_names)
+
+        root = self._file.root
+
+        root._v_attrs.parameter_names = self._parameter_names
+        root._v_attrs.n_walkers = self._n_walkers
+        root._v_attrs.thin = self._thin
+
+        # Store by parameter, with chunks containing only one parameter, so that reading the samples for one
+        # parameter does not require to read the others
+
+        self._file.create_earray(root, 'samples', tables.Float64Atom(), shape=(n_dim, 0), chunkshape=(1, 4096))
+
+        self._file.create_earray(root, 'log_probability', tables.Float64Atom(), shape=(0,))
+        self._file.create_earray(root, 'log_like', tables.Float64Atom(), shape=(0,))
+
+        checkpoint = self._file.create_group(root, 'checkpoint')
+
+        self._file.create_array(checkpoint, 'position', np.zeros((self._n_walkers, n_dim)))
+        self._file.create_array(checkpoint, 'log_probability', np.zeros(self._n_walkers))
+        self._file.create_array(checkpoint, 'log_like', np.zeros(self._n_walkers))
+
+        checkpoint._v_attrs.phase = BURN_IN
+        checkpoint._v_attrs.step = 0
+        checkpoint._v_attrs.random_state = None
+
+        self._file.flush()
+
+    def _check_compatibility(self):
+
+        attrs = self._file.root._v_attrs
+
+        if list(attrs.parameter_names) != self._parameter_names:
+
+            raise IncompatibleChainFile("The chain file %s has been produced with different free parameters "
+                                        "(%s)" % (self._filename, ", ".join(attrs.parameter_names)))
+
+        if int(attrs.n_walkers) != self._n_walkers:
+
+            raise IncompatibleChainFile("The chain file %s has been produced with %i walkers" % (self._filename,
+                                                                                               attrs.n_walkers))
+
+        if int(attrs.thin) != self._thin:
+
+            raise IncompatibleChainFile("The chain file %s has been produced with thin=%i" % (self._filename,
+                                                                                            attrs.thin))
+
+    @property
+    def filename(self):
+
+        return self._filename
+
+    @property
+    def checkpoint(self):
+        """
+        The state of the sampler at the last checkpoint
+
+        :return: a tuple (phase, step, position, log_probability, log_like, random_state). If no step has been
+        completed yet, step is 0 and the other elements should not be used
+        """
+
+        checkpoint = self._file.root.checkpoint
+
+        return (checkpoint._v_attrs.phase, int(checkpoint._v_attrs.step), checkpoint.position.read(),
+                checkpoint.log_probability.read(), checkpoint.log_like.read(), checkpoint._v_attrs.random_state)
+
+    def store(self, step, position, log_probability, log_like):
+        """
+        Add one step of the chain (the samples will be written to disk at the next checkpoint). Only one step every
+        thin steps is actually stored.
+
+        :param step: the number of the step (starting from 1)
+        :param position: the position of the walkers, a (n_walkers, n_parameters) array
+        :param log_probability: the log posterior for each walker
+        :param log_like: the log likelihood for each walker
+        :return: None
+        """
+
+        if step % self._thin == 0:
+
+            # NOTE: the sampler modifies the arrays in place, so we need a copy
+
+            self._buffer_samples.append(np.array(position, dtype=float).T)
+            self._buffer_log_probability.append(np.array(log_probability, dtype=float))
+            self._buffer_log_like.append(np.array(log_like, dtype=float))
+
+    def save_checkpoint(self, phase, step, position, log_probability, log_like, random_state):
+        """
+        Write to disk the samples accumulated since the last checkpoint, and the current state of the sampler
+
+        :param phase: the current phase (BURN_IN or SAMPLING)
+        :param step: the number of steps completed in the current phase
+        :param position: the position of the walkers, a (n_walkers, n_parameters) array
+        :param log_probability: the log posterior for each walker
+        :param log_like: the log likelihood for each walker
+        :param random_state: the state of the random number generator of the sampler
+        :return: None
+        """
+
+        root = self._file.root
+
+        if len(self._buffer_samples) > 0:
+
+            root.samples.append(np.hstack(self._buffer_samples))
+            root.log_probability.append(np.concatenate(self._buffer_log_probability))
+            root.log_like.append(np.concatenate(self._buffer_log_like))
+
+            self._buffer_samples = []
+            self._buffer_log_probability = []
+            self._buffer_log_like = []
+
+        root.checkpoint.position[:] = position
+        root.checkpoint.log_probability[:] = log_probability
+        root.checkpoint.log_like[:] = log_like
+
+        root.checkpoint._v_attrs.phase = phase
+        root.checkpoint._v_attrs.step = int(step)
+        root.checkpoint._v_attrs.random_state = random_state
+
+        self._file.flush()
+
+    def close(self):
+
+        self._file.close()
+
+
+class StoredSamples(object):
+
+    def __init__(self, filename, by_parameter=False):
+        """
+        Read-only access to the samples stored in a chain file (see ChainStorage), which are read from disk only when
+        needed and only for the requested elements. This behaves like a (n_samples, n_parameters) array or, if
+        by_parameter is True, like a (n_parameters, n_samples) array (.T switches between the two without reading
+        anything). Any numpy function can be used on it, but it will read all the samples in memory.
+
+        :param filename: name of the HDF5 file
+        :param by_parameter: whether the first index is the parameter (True) or the sample (False)
+        """
+
+        self._filename = sanitize_filename(filename, abspath=True)
+
+        self._by_parameter = bool(by_parameter)
+
+        self._file = tables.open_file(self._filename, mode='r')
+
+        self._samples = self._file.root.samples
+
+    def __del__(self):
+
+        if hasattr(self, '_file'):
+
+            self._file.close()
+
+    def __reduce__(self):
+
+        # Re-open the file instead of trying to serialize it
+
+        return StoredSamples, (self._filename, self._by_parameter)
+
+    @property
+    def filename(self):
+
+        return self._filename
+
+    @property
+    def T(self):
+
+        return StoredSamples(self._filename, not self._by_parameter)
+
+    @property
+    def shape(self):
+
+        n_dim, n_samples = self._samples.shape
+
+        return (n_dim, n_samples) if self._by_parameter else (n_samples, n_dim)
+
+    @property
+    def ndim(self):
+
+        return 2
+
+    @property
+    def dtype(self):
+
+        return np.dtype(float)
+
+    def __len__(self):
+
+        return self.shape[0]
+
+    def __getitem__(self, item):
+
+        if self._by_parameter:
+
+            return self._samples[item]
+
+        # Swap the indexes, since on disk the samples are stored by parameter
+
+        if isinstance(item, tuple):
+
+            assert len(item) == 2, "Too many indices"
+
+            return self._samples[item[1], item[0]].T
+
+        return self._samples[:, item].T
+
+    def __array__(self, dtype=None):
+
+        samples = self._samples.read()
+
+        if not self._by_parameter:
+
+            samples = samples.T
+
+        return samples if dtype is None else samples.astype(dtype)
+
+
+class StoredChain(object):
+
+    def __init__(self, filename):
+        """
+        Read a chain stored by ChainStorage. The samples are accessed lazily (see StoredSamples), while the values of
+        the log likelihood and of the log posterior are read in memory.
+
+        :param filename: name of the HDF5 file
+        """
+
+        self._filename = sanitize_filename(filename, abspath=True)
+
+        with tables.open_file(self._filename, mode='r') as chain_file:
+
+            self._parameter_names = list(chain_file.root._v_attrs.parameter_names)
+
+            self._log_like = chain_file.root.log_like.read()
+            self._log_probability = chain_file.root.log_probability.read()
+
+        self._samples = StoredSamples(self._filename)
+
+    @property
+    def parameter_names(self):
+
+        return self._parameter_names
+
+    @property
+    def samples(self):
+        """
+        :return: the samples, as a (n_samples, n_parameters) StoredSamples instance
+        """
+
+        return self._samples
+
+    @property
+    def log_like(self):
+
+        return self._log_like
+
+    @property
+    def log_probability(self):
+
+        return self._log_probability
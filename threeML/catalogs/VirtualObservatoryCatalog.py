@@ -9,14 +9,33 @@ from astropy.vo.client.exceptions import VOSError
 from astropy.coordinates.name_resolve import get_icrs_coordinates
 
 import astropy.table as astro_table
+import numpy as np
 
 from threeML.io.network import internet_connection_is_active
+from threeML.exceptions.custom_exceptions import custom_warnings
 
 
 class ConeSearchFailed(RuntimeError):
     pass
 
 
+def _get_unit_vectors(ra, dec):
+    """
+    Cartesian coordinates of the given positions on the unit sphere
+
+    :param ra: R.A. in decimal degrees (array)
+    :param dec: Dec. in decimal degrees (array)
+    :return: a (n, 3) array
+    """
+
+    ra_rad = np.deg2rad(np.asarray(ra, dtype=float))
+    dec_rad = np.deg2rad(np.asarray(dec, dtype=float))
+
+    cos_dec = np.cos(dec_rad)
+
+    return np.column_stack((cos_dec * np.cos(ra_rad), cos_dec * np.sin(ra_rad), np.sin(dec_rad)))
+
+
 class VirtualObservatoryCatalog(object):
     
     def __init__(self, name, url, description):
@@ -27,6 +46,10 @@ class VirtualObservatoryCatalog(object):
 
         self._last_query_results = None
 
+        # Unit vectors of the sources in the table, computed at the first offline cone search
+
+        self._sky_index = None
+
 
     def search_around_source(self, source_name, radius):
         """
@@ -45,22 +68,31 @@ class VirtualObservatoryCatalog(object):
 
         return ra, dec, self.cone_search(ra, dec, radius)
 
-    def cone_search(self, ra, dec, radius):
+    def cone_search(self, ra, dec, radius, offline=False):
         """
         Searches for sources in a cone of given radius and center
 
         :param ra: decimal degrees, R.A. of the center of the cone
         :param dec: decimal degrees, Dec. of the center of the cone
         :param radius: radius in degrees
+        :param offline: if True, search in the cached table instead of using the VO service. This is also done if
+        there is no active internet connection
         :return: a table with the list of sources
         """
 
-        skycoord = SkyCoord(ra=ra * u.degree, dec=dec * u.degree, frame='icrs')
+        if offline:
+
+            return self._offline_cone_search(ra, dec, radius)
 
         # First check that we have an active internet connection
         if not internet_connection_is_active():  # pragma: no cover
 
-            raise ConeSearchFailed("It looks like you don't have an active internet connection. Cannot continue.")
+            custom_warnings.warn("It looks like you don't have an active internet connection. Searching in the "
+                                 "cached table.")
+
+            return self._offline_cone_search(ra, dec, radius)
+
+        skycoord = SkyCoord(ra=ra * u.degree, dec=dec * u.degree, frame='icrs')
 
         with warnings.catch_warnings():
             
@@ -103,6 +135,61 @@ class VirtualObservatoryCatalog(object):
 
                 return out
 
+    def _offline_cone_search(self, ra, dec, radius):
+        """
+        Searches for sources in a cone of given radius and center in the cached table, without network access
+
+        :param ra: decimal degrees, R.A. of the center of the cone
+        :param dec: decimal degrees, Dec. of the center of the cone
+        :param radius: radius in degrees
+        :return: a table with the list of sources
+        """
+
+        if self._sky_index is None:
+
+            self._sky_index = _get_unit_vectors(self._vo_dataframe['ra'].values, self._vo_dataframe['dec'].values)
+
+        center = _get_unit_vectors([ra], [dec])[0]
+
+        selection = self._sky_index.dot(center) >= np.cos(np.deg2rad(radius))
+
+        # The angular distance from the length of the chord, which is accurate also for small distances. The offset
+        # is in arcmin, as in the results of the VO service
+
+        chords = np.sqrt(np.sum((self._sky_index[selection] - center) ** 2, axis=1))
+
+        query_results = self._vo_dataframe[selection].copy()
+
+        query_results['Search_Offset'] = np.rad2deg(2.0 * np.arcsin(np.minimum(chords / 2.0, 1.0))) * 60.0
+
+        query_results = query_results.sort_values("Search_Offset")
+
+        out = self._format_query_results(query_results)
+
+        # Save coordinates of center of cone search
+        self._ra = ra
+        self._dec = dec
+
+        return out
+
+    def _format_query_results(self, query_results):
+        """
+        Store the results of a query on the cached table, and return them formatted as an astropy table
+
+        :param query_results: pandas DataFrame with the selected rows of the table
+        :return: the formatted table
+        """
+
+        table = astro_table.Table.from_pandas(query_results)
+        name_column = astro_table.Column(name='name', data=query_results.index)
+        table.add_column(name_column, index=0)
+
+        out = self.apply_format(table)
+
+        self._last_query_results = query_results
+
+        return out
+
     @property
     def ra_center(self):
         return self._ra
@@ -141,15 +228,7 @@ class VirtualObservatoryCatalog(object):
 
         query_results = self._vo_dataframe.query(query)
 
-        table = astro_table.Table.from_pandas(query_results)
-        name_column = astro_table.Column(name='name', data=query_results.index)
-        table.add_column(name_column, index=0)
-
-        out = self.apply_format(table)
-
-        self._last_query_results = query_results
-
-        return out
+        return self._format_query_results(query_results)
 
     def query_sources(self, *sources):
         """
@@ -171,20 +250,9 @@ class VirtualObservatoryCatalog(object):
 
         if valid_sources:
 
-            query_string = ' | '.join(map(lambda x: '(index == "%s")' % x, valid_sources))
-
-            query_results = self._vo_dataframe.query(query_string)
-
-            table = astro_table.Table.from_pandas(query_results)
-
-            name_column = astro_table.Column(name='name', data=query_results.index)
-            table.add_column(name_column, index=0)
-
-            out = self.apply_format(table)
-
-            self._last_query_results = query_results
+            query_results = self._vo_dataframe[self._vo_dataframe.index.isin(valid_sources)]
 
-            return out
+            return self._format_query_results(query_results)
 
 
         else:
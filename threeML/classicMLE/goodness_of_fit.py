@@ -74,8 +74,9 @@ class GoodnessOfFit(object):
 
         jl_set.set_minimizer(self._jl_instance.minimizer_in_use)
 
-        # Run the set
-        data_frame, like_data_frame = jl_set.go(continue_on_failure=continue_on_failure)
+        # Run the set. Without the covariance matrix all the errors are zero anyway, so there is no need to generate
+        # the samples for the errors
+        data_frame, like_data_frame = jl_set.go(continue_on_failure=continue_on_failure, lazy=True)
 
         # Compute goodness of fit
 
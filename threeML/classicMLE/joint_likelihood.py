@@ -15,9 +15,19 @@ from threeML.exceptions.custom_exceptions import custom_warnings, FitFailed
 from threeML.io.results_table import ResultsTable
 from threeML.io.table import Table
 from threeML.minimizer import minimization
-from threeML.parallel.parallel_client import ParallelClient
+from threeML.parallel.parallel_client import ParallelClient, is_parallel_computation_active
+from threeML.utils.likelihood_profiler import LikelihoodProfiler
 from threeML.utils.statistics.stats_tools import aic, bic
 
+# copyreg is called copy_reg in python2
+try:
+
+    import copyreg #py3
+
+except ImportError:
+
+    import copy_reg as copyreg #py2
+
 
 class ReducingNumberOfThreads(Warning):
     pass
@@ -175,16 +185,42 @@ class JointLikelihood(object):
 
         self._free_parameters = self._likelihood_model.free_parameters
 
-    def fit(self, quiet=False, compute_covariance=True, n_samples=5000):
+    def fit(self, quiet=False, compute_covariance=True, n_samples=5000, profile=False, lazy=False):
         """
         Perform a fit of the current likelihood model on the datasets
 
         :param quiet: If True, print the results (default), otherwise do not print anything
         :param compute_covariance:If True (default), compute and display the errors and the correlation matrix.
+        :param profile: if True, measure the time spent in each plugin and in each stage of the computation of the
+        likelihood. The summary is available as results.profiling_summary (default: False)
+        :param lazy: if True, the samples used for the error propagation are generated only when they are first needed,
+        and the errors in the returned data frame come from the covariance matrix (default: False)
         :return: a dictionary with the results on the parameters, and the values of the likelihood at the minimum
                  for each dataset and the total one.
         """
 
+        if profile:
+
+            if is_parallel_computation_active():
+
+                custom_warnings.warn("Profiling is not supported with parallel computation. Fitting without "
+                                     "profiling.")
+
+            else:
+
+                with LikelihoodProfiler(self._data_list, 'inner_fit') as profiler:
+
+                    frames = self.fit(quiet=True, compute_covariance=compute_covariance, n_samples=n_samples,
+                                      lazy=lazy)
+
+                self._analysis_results.profiling_summary = profiler.summary
+
+                if not quiet:
+
+                    self._analysis_results.display()
+
+                return frames
+
         # Update the list of free parameters, to be safe against changes the user might do between
         # the creation of this class and the calling of this method
 
@@ -310,7 +346,8 @@ class JointLikelihood(object):
 
         # Now instance an analysis results class
         self._analysis_results = MLEResults(self.likelihood_model, self._minimizer.covariance_matrix,
-                                            minus_log_likelihood_values,statistical_measures=statistical_measures, n_samples=n_samples)
+                                            minus_log_likelihood_values,statistical_measures=statistical_measures, n_samples=n_samples,
+                                            lazy=lazy)
 
         # Show the results
 
@@ -318,7 +355,17 @@ class JointLikelihood(object):
 
             self._analysis_results.display()
 
-        return self._analysis_results.get_data_frame(), self._analysis_results.get_statistic_frame()
+        if lazy:
+
+            # Do not generate the samples just to compute the errors for the data frame
+
+            parameters_frame = self._analysis_results.get_covariance_data_frame()
+
+        else:
+
+            parameters_frame = self._analysis_results.get_data_frame()
+
+        return parameters_frame, self._analysis_results.get_statistic_frame()
 
     @property
     def results(self):
@@ -800,9 +847,9 @@ class JointLikelihood(object):
 
         else:
 
-            assert minimizer.upper() in minimization._minimizers, \
+            assert minimization.is_minimizer_available(minimizer), \
                 "Minimizer %s is not available on this system. " \
-                "Available minimizers: %s" % (minimizer, ",".join(minimization._minimizers.keys()))
+                "Available minimizers: %s" % (minimizer, ",".join(minimization.get_available_minimizers()))
 
             # The string can only specify a local minimization. This will return an error if that is not the case.
             # In order to setup global optimization the user needs to use the GlobalMinimization factory directly
@@ -1026,7 +1073,7 @@ class JointLikelihood(object):
         another_jl.set_minimizer(self.minimizer_in_use)
 
         # We do not need the covariance matrix, just the likelihood value
-        _, null_hyp_mlike_df = another_jl.fit(quiet=True, compute_covariance=False, n_samples=1)
+        _, null_hyp_mlike_df = another_jl.fit(quiet=True, compute_covariance=False, n_samples=1, lazy=True)
 
         # Compute TS for all datasets
         TSs = []
@@ -1055,4 +1102,14 @@ class JointLikelihood(object):
         # Reassign the original likelihood model to the datasets
         self._assign_model_to_data(self._likelihood_model)
 
-        return TS_df
\ No newline at end of file
+        return TS_df
+
+
+# Make JointLikelihood instances serializable (needed for parallel computation)
+
+def pickle_joint_likelihood(jl):
+
+    return JointLikelihood, (jl.likelihood_model, jl.data_list)
+
+
+copyreg.pickle(JointLikelihood, pickle_joint_likelihood)
@@ -10,7 +10,8 @@ from threeML.config.config import threeML_config
 from threeML.data_list import DataList
 from threeML.io.progress_bar import progress_bar
 from threeML.analysis_results import AnalysisResultsSet
-from threeML.minimizer.minimization import _Minimization, LocalMinimization, _minimizers
+from threeML.minimizer.minimization import _Minimization, LocalMinimization, is_minimizer_available, \
+    get_available_minimizers
 
 from astromodels import Model
 import pandas as pd
@@ -85,6 +86,10 @@ class JointLikelihoodSet(object):
 
         self._compute_covariance = False
 
+        # By default generate the samples for the errors in the results of each fit
+
+        self._lazy = False
+
         self._all_results = None
 
         self._preprocessor = preprocessor
@@ -97,9 +102,9 @@ class JointLikelihoodSet(object):
 
         else:
 
-            assert minimizer.upper() in _minimizers, \
+            assert is_minimizer_available(minimizer), \
                 "Minimizer %s is not available on this system. " \
-                "Available minimizers: %s" % (minimizer, ",".join(_minimizers.keys()))
+                "Available minimizers: %s" % (minimizer, ",".join(get_available_minimizers()))
 
             # The string can only specify a local minimization. This will return an error if that is not the case.
             # In order to setup global optimization the user needs to use the GlobalMinimization factory directly
@@ -175,9 +180,15 @@ class JointLikelihoodSet(object):
         # Set the minimizer
         jl.set_minimizer(self._minimization)
 
+        # Without a covariance matrix all samples for the error propagation would be identical copies of the best
+        # fit values, so there is no point in generating many of them
+
+        n_samples = 5000 if self._compute_covariance else 1
+
         try:
 
-            model_results, logl_results = jl.fit(quiet=True, compute_covariance=self._compute_covariance)
+            model_results, logl_results = jl.fit(quiet=True, compute_covariance=self._compute_covariance,
+                                                 n_samples=n_samples, lazy=self._lazy)
 
         except Exception as e:
 
@@ -198,7 +209,20 @@ class JointLikelihoodSet(object):
 
         return model_results, logl_results
 
-    def go(self, continue_on_failure=True, compute_covariance=False, verbose=False, **options_for_parallel_computation):
+    def go(self, continue_on_failure=True, compute_covariance=False, verbose=False, lazy=False,
+           **options_for_parallel_computation):
+        """
+        Perform the fits of all the iterations
+
+        :param continue_on_failure: whether to continue in the case a fit fails (default: True)
+        :param compute_covariance: whether to compute the covariance matrix in each fit (default: False)
+        :param verbose: whether to log information about each fit (default: False)
+        :param lazy: if True, the samples for the error propagation are generated only if the results of a fit are
+        used, and the errors in the frame of the parameters come from the covariance matrix instead of the samples
+        (default: False)
+        :param options_for_parallel_computation: options for the parallel client
+        :return: tuple (frame with all the parameters, frame with all the likelihood values)
+        """
 
         # Generate the data frame which will contain all results
 
@@ -210,6 +234,8 @@ class JointLikelihoodSet(object):
 
         self._compute_covariance = compute_covariance
 
+        self._lazy = lazy
+
         # let's iterate, perform the fit and fill the data frame
 
         if threeML_config['parallel']['use-parallel']:
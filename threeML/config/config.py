@@ -5,7 +5,7 @@ import pkg_resources
 import yaml
 import urlparse
 import matplotlib.colors as colors
-import matplotlib.pyplot as plt
+import matplotlib.cm as cm
 
 from threeML.exceptions.custom_exceptions import custom_warnings, ConfigurationFileCorrupt
 from threeML.io.package_data import get_path_of_data_file, get_path_of_user_dir
@@ -128,7 +128,7 @@ class Config(object):
 
         try:
 
-            plt.get_cmap(cmap)
+            cm.get_cmap(cmap)
 
             return True
 
@@ -288,7 +288,7 @@ class Config(object):
             # Make a dictionary of known checkers and what they apply to
             known_checkers = {'color'    : (self.is_matplotlib_color, 'a matplotlib color (name or html hex value)'),
                               'cmap'     : (self.is_matplotlib_cmap, 'a matplotlib color map (available: %s)' %
-                                       ", ".join(plt.colormaps())),
+                                       ", ".join(sorted(cm.cmap_d.keys()))),
                               'name'     : (self.is_string, "a valid name (string)"),
                               'switch'   : (self.is_bool, "one of yes, no, True, False"),
                               'ftp url'  : (self.is_ftp_url, "a valid FTP URL"),
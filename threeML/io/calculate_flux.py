@@ -1,7 +1,8 @@
 __author__ = 'grburgess'
 
 # from threeML.io.rich_display import display
-from threeML.utils.fitted_objects.fitted_point_sources import FittedPointSourceSpectralHandler
+from threeML.utils.fitted_objects.batched_point_source_flux import BatchedPointSourceFlux
+from threeML.utils.fitted_objects.fitted_spectrum_cache import fitted_spectrum_cache
 from threeML.exceptions.custom_exceptions import custom_warnings
 
 import numpy as np
@@ -9,261 +10,219 @@ import pandas as pd
 import collections
 
 
-def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, flux_unit, use_components,
-                                 components_to_use,
-                                 confidence_level, equal_tailed, differential, sources_to_use, include_extended):
+def _get_component_names(source):
     """
-    helper function to pull out analysis details that are common to flux and plotting functions
-
+    get the names of the components of the spectrum of a source, with a suffix for duplicate components
 
-    :param analysis_results:
-    :param energy_range:
-    :param energy_unit:
-    :param flux_unit:
-    :param use_components:
-    :param components_to_use:
-    :param confidence_level:
-    :param fraction_of_samples:
-    :param differential:
-    :param sources_to_use:
-    :param include_extended:
-    :return:
+    :param source: an astromodels source
+    :return: list of names (empty if the spectrum is not a composite function)
     """
 
-    bayesian_analyses = collections.OrderedDict()
-    mle_analyses  = collections.OrderedDict()
-
-    # first we split up the bayesian and mle analysis
-
-    mle_sources = collections.OrderedDict()
-    bayes_sources = collections.OrderedDict()
-
-    for analysis in analysis_results:
-    
-        items = analysis.optimized_model.point_sources.items() if not include_extended else analysis.optimized_model.sources.items()
-        
-        for source_name, source in items:
+    try:
 
-            if source_name in sources_to_use or not sources_to_use:
+        comps = [c.name for c in source.spectrum.main.composite.functions]
 
-                if analysis.analysis_type == "MLE":
+    except:
 
-                    # keep track of duplicate sources
+        comps = []
 
-                    mle_sources.setdefault(source_name, []).append(1)
+    # duplicate components
+    comps = ["%s_n%i" % (s, suffix) if num > 1 else s for s, num in collections.Counter(comps).items() for
+             suffix in range(1, num + 1)]
 
-                    if len(mle_sources[source_name]) > 1:
-                        name = "%s_%d" % (source_name, len(mle_sources[source_name]))
+    return comps
 
-                    else:
 
-                        name = source_name
+def _get_analyses_by_source(analysis_results, sources_to_use, include_extended):
+    """
+    split the sources of the analyses in MLE and bayesian ones, and name them (sources with the same name in
+    different analyses get a numerical suffix)
 
-                    try:
+    :param analysis_results: the analysis results
+    :param sources_to_use: the names of the sources to use (all if empty)
+    :param include_extended: whether to use the extended sources as well
+    :return: two dictionaries (MLE and bayesian) name -> {'source', 'analysis', 'component_names'}
+    """
 
-                        comps = [c.name for c in source.spectrum.main.composite.functions]
+    bayesian_analyses = collections.OrderedDict()
+    mle_analyses = collections.OrderedDict()
 
-                    except:
+    # keep track of duplicate sources
 
-                        comps = []
+    mle_sources = collections.OrderedDict()
+    bayes_sources = collections.OrderedDict()
 
-                    # duplicate components
-                    comps = ["%s_n%i" % (s, suffix) if num > 1 else s for s, num in collections.Counter(comps).items() for
-                     suffix in range(1, num + 1)]
+    for analysis in analysis_results:
 
+        items = analysis.optimized_model.point_sources.items() if not include_extended else analysis.optimized_model.sources.items()
 
+        for source_name, source in items:
 
+            if source_name in sources_to_use or not sources_to_use:
 
-                    mle_analyses[name] = {'source': source_name, 'analysis': analysis, 'component_names': comps}
+                if analysis.analysis_type == "MLE":
 
+                    analyses, sources = mle_analyses, mle_sources
 
                 else:
 
-                    bayes_sources.setdefault(source_name, []).append(1)
-
-                    # keep track of duplicate sources
+                    analyses, sources = bayesian_analyses, bayes_sources
 
-                    if len(bayes_sources[source_name]) > 1:
-                        name = "%s_%d" % (source_name, len(bayes_sources[source_name]))
+                sources.setdefault(source_name, []).append(1)
 
-                    else:
+                if len(sources[source_name]) > 1:
 
-                        name = source_name
+                    name = "%s_%d" % (source_name, len(sources[source_name]))
 
-                    try:
-
-                        comps = [c.name for c in source.spectrum.main.composite.functions]
+                else:
 
-                    except:
+                    name = source_name
 
-                        comps = []
+                analyses[name] = {'source': source_name, 'analysis': analysis,
+                                  'component_names': _get_component_names(source)}
 
-                    # duplicate components
-                    comps = ["%s_n%i" % (s, suffix) if num > 1 else s for s, num in
-                             collections.Counter(comps).items() for
-                             suffix in range(1, num + 1)]
+    return mle_analyses, bayesian_analyses
 
-                    bayesian_analyses[name] = {'source': source_name, 'analysis': analysis, 'component_names': comps}
 
-    # keep track of the number of sources we will use
+def _get_fluxes_to_use(analysis, use_components, components_to_use):
+    """
+    select the total and the components of a source to use, in the order in which they are used
 
-    num_sources_to_use = 0
+    :param analysis: one of the dictionaries returned by _get_analyses_by_source
+    :param use_components: whether to use the components
+    :param components_to_use: the components to use (all if empty). Including 'total' uses the total flux as well
+    :return: list of component names, with None for the total
+    """
 
-    # go through the MLE analysis and build up some fitted sources
+    fluxes = []
 
-    for key in mle_analyses.keys():
+    if not use_components or ('total' in components_to_use) or (not analysis['component_names']):
 
-        # if we want to use this source
+        fluxes.append(None)
 
-        if not use_components or ('total' in components_to_use) or (not mle_analyses[key]['component_names']):
-            mle_analyses[key]['fitted point source'] = FittedPointSourceSpectralHandler(mle_analyses[key]['analysis'],
-                                                                                        mle_analyses[key]['source'],
-                                                                                        energy_range,
-                                                                                        energy_unit,
-                                                                                        flux_unit,
-                                                                                        confidence_level,
-                                                                                        equal_tailed=equal_tailed,
-                                                                                        is_differential_flux=differential)
+    if use_components:
 
-            num_sources_to_use += 1
+        fluxes.extend([component for component in analysis['component_names']
+                       if not components_to_use or component in components_to_use])
 
-        # see if there are any components to use
+    return fluxes
 
-        if use_components:
 
-            num_components_to_use = 0
+def _setup_flux_dictionaries(analyses, add_flux, use_components, components_to_use):
+    """
+    select the totals and the components of the analyses and add them to the fluxes to compute
+
+    :param analyses: dictionary as returned by _get_analyses_by_source
+    :param add_flux: function taking (analysis, source, component=None) and returning the index of the flux in the
+    list of results (for example BatchedPointSourceFlux.add)
+    :param use_components: whether to use the components
+    :param components_to_use: the components to use (all if empty). Including 'total' uses the total flux as well
+    :return: list of (key, component or None, index of the flux in the results)
+    """
 
-            component_dict = {}
+    fluxes = []
 
-            for component in mle_analyses[key]['component_names']:
+    for key in analyses.keys():
 
+        # the values of the components are filled when the fluxes have been computed
 
+        component_dict = {}
 
-                # if we want to plot all the components
+        for component in _get_fluxes_to_use(analyses[key], use_components, components_to_use):
 
-                if not components_to_use:
+            if component is not None:
 
+                component_dict[component] = None
 
-                    component_dict[component] = FittedPointSourceSpectralHandler(mle_analyses[key]['analysis'],
-                                                                                 mle_analyses[key]['source'],
-                                                                                 energy_range,
-                                                                                 energy_unit,
-                                                                                 flux_unit,
-                                                                                 confidence_level,
-                                                                                 equal_tailed,
-                                                                                 component=component,
-                                                                                 is_differential_flux=differential)
+            fluxes.append((key, component, add_flux(analyses[key]['analysis'], analyses[key]['source'],
+                                                    component=component)))
 
-                    num_components_to_use += 1
+        if use_components:
 
-                else:
+            analyses[key]['components'] = component_dict
 
-                    # otherwise pick off only the ones of interest
+    return fluxes
 
-                    if component in components_to_use:
-                        component_dict[component] = FittedPointSourceSpectralHandler(mle_analyses[key]['analysis'],
-                                                                                     mle_analyses[key]['source'],
-                                                                                     energy_range,
-                                                                                     energy_unit,
-                                                                                     flux_unit,
-                                                                                     confidence_level,
-                                                                                     equal_tailed,
-                                                                                     component=component,
-                                                                                     is_differential_flux=differential)
 
-                        num_components_to_use += 1
+def _fill_flux_dictionaries(analyses, fluxes, results):
 
-            # save these to the dict
+    for key, component, index in fluxes:
 
-            mle_analyses[key]['components'] = component_dict
+        if component is None:
 
-        # keep track of how many components we need to plot
+            analyses[key]['fitted point source'] = results[index]
 
-        if use_components:
+        else:
 
-            num_sources_to_use += num_components_to_use
+            analyses[key]['components'][component] = results[index]
 
-            if 'total' in components_to_use:
-                num_sources_to_use += 1
 
-        # else:
-        #
-        #     num_sources_to_use += 1
+def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, flux_unit, use_components,
+                                 components_to_use,
+                                 confidence_level, equal_tailed, differential, sources_to_use, include_extended,
+                                 processes=1):
+    """
+    helper function to pull out analysis details that are common to flux and plotting functions. The fitted sources
+    are taken from the cache of the fitted spectra (and computed only if they are not there yet)
 
-    # repeat for the bayes analyses
 
-    for key in bayesian_analyses.keys():
+    :param analysis_results:
+    :param energy_range:
+    :param energy_unit:
+    :param flux_unit:
+    :param use_components:
+    :param components_to_use:
+    :param confidence_level:
+    :param fraction_of_samples:
+    :param differential:
+    :param sources_to_use:
+    :param include_extended:
+    :param processes: number of processes used to compute the fitted sources which are not in the cache
+    :return:
+    """
 
-        # if we have a source to use
+    mle_analyses, bayesian_analyses = _get_analyses_by_source(analysis_results, sources_to_use, include_extended)
 
-        if not use_components or ('total' in components_to_use) or (not bayesian_analyses[key]['component_names']):
-            bayesian_analyses[key]['fitted point source'] = FittedPointSourceSpectralHandler(
-                bayesian_analyses[key]['analysis'],
-                bayesian_analyses[key]['source'],
-                energy_range,
-                energy_unit,
-                flux_unit,
-                confidence_level,
-                equal_tailed,
-                is_differential_flux=differential)
+    # compute all at once the fitted sources which are not in the cache, so that they can be computed in parallel
 
-            num_sources_to_use += 1
+    requests = []
 
-        # if we want to use components
+    def add_request(analysis, source, component=None):
 
-        if use_components:
+        requests.append((analysis, source, component))
 
-            num_components_to_use = 0
+        return len(requests) - 1
 
-            component_dict = {}
+    mle_fluxes = _setup_flux_dictionaries(mle_analyses, add_request, use_components, components_to_use)
 
-            for component in bayesian_analyses[key]['component_names']:
+    bayesian_fluxes = _setup_flux_dictionaries(bayesian_analyses, add_request, use_components, components_to_use)
 
-                # extracting all components
+    spectra = fitted_spectrum_cache.compute(requests, energy_range, energy_unit, flux_unit, confidence_level,
+                                            equal_tailed, is_differential_flux=differential, processes=processes)
 
+    _fill_flux_dictionaries(mle_analyses, mle_fluxes, spectra)
+    _fill_flux_dictionaries(bayesian_analyses, bayesian_fluxes, spectra)
 
-                if not components_to_use:
-                    component_dict[component] = FittedPointSourceSpectralHandler(bayesian_analyses[key]['analysis'],
-                                                                                 bayesian_analyses[key]['source'],
-                                                                                 energy_range,
-                                                                                 energy_unit,
-                                                                                 flux_unit,
-                                                                                 confidence_level,
-                                                                                 equal_tailed,
-                                                                                 component=component,
-                                                                                 is_differential_flux=differential)
+    # keep track of the number of sources we will use. If the total is among the components to use it is counted
+    # once more (for the bayes analyses only if some components are used as well)
 
-                    num_components_to_use += 1
+    num_sources_to_use = 0
 
-                # or just some of them
+    for key in mle_analyses.keys():
 
-                if component in components_to_use:
-                    component_dict[component] = FittedPointSourceSpectralHandler(bayesian_analyses[key]['analysis'],
-                                                                                 bayesian_analyses[key]['source'],
-                                                                                 energy_range,
-                                                                                 energy_unit,
-                                                                                 flux_unit,
-                                                                                 confidence_level,
-                                                                                 equal_tailed,
-                                                                                 component=component,
-                                                                                 is_differential_flux=differential)
+        num_sources_to_use += int('fitted point source' in mle_analyses[key])
 
-                    num_components_to_use += 1
+        if use_components:
 
-            bayesian_analyses[key]['components'] = component_dict
+            num_sources_to_use += len(mle_analyses[key]['components']) + int('total' in components_to_use)
 
-        # keep track of everything we added on
+    for key in bayesian_analyses.keys():
 
-        if use_components and num_components_to_use > 0:
+        num_sources_to_use += int('fitted point source' in bayesian_analyses[key])
 
-            num_sources_to_use += num_components_to_use
+        if use_components and bayesian_analyses[key]['components']:
 
-            if 'total' in components_to_use:
-                num_sources_to_use += 1
-        #
-        # else:
-        #
-        #     num_sources_to_use += 1
+            num_sources_to_use += len(bayesian_analyses[key]['components']) + int('total' in components_to_use)
 
     # we may have the same source in a bayesian and mle analysis.
     # we want to plot them, but make sure to label them differently.
@@ -505,7 +464,8 @@ def _calculate_point_source_flux(ene_min, ene_max, *analyses, **kwargs):
     :param components_to_use: (optional) list of string names of the components to plot: including 'total'
     will also plot the total spectrum
     :param include_extended: (optional) if True, plot extended source spectra (spatially integrated) as well.
-    
+    :param processes: (optional) number of processes used to compute the fluxes (default: 1)
+
     :return: mle_dataframe, bayes_dataframe
     """
 
@@ -521,7 +481,8 @@ def _calculate_point_source_flux(ene_min, ene_max, *analyses, **kwargs):
         'components_to_use': [],
         'sources_to_use': [],
         'sum_sources': False,
-        'include_extended': False
+        'include_extended': False,
+        'processes': 1
     }
 
     for key, value in kwargs.items():
@@ -533,17 +494,28 @@ def _calculate_point_source_flux(ene_min, ene_max, *analyses, **kwargs):
 
     energy_range = np.array([_defaults['ene_min'], _defaults['ene_max']])
 
-    mle_analyses, bayesian_analyses, _, _ = _setup_analysis_dictionaries(analyses,
-                                                                         energy_range,
-                                                                         _defaults['energy_unit'],
-                                                                         _defaults['flux_unit'],
-                                                                         _defaults['use_components'],
-                                                                         _defaults['components_to_use'],
-                                                                         _defaults['confidence_level'],
-                                                                         _defaults['equal_tailed'],
-                                                                         differential=False,
-                                                                         sources_to_use=_defaults['sources_to_use'],
-                                                                         include_extended=_defaults['include_extended'])
+    mle_analyses, bayesian_analyses = _get_analyses_by_source(analyses, _defaults['sources_to_use'],
+                                                              _defaults['include_extended'])
+
+    # The fluxes of all analyses are computed together, grouping those with the same spectral function
+
+    batch = BatchedPointSourceFlux(energy_range,
+                                   _defaults['energy_unit'],
+                                   _defaults['flux_unit'],
+                                   _defaults['confidence_level'],
+                                   _defaults['equal_tailed'],
+                                   processes=_defaults['processes'])
+
+    mle_fluxes = _setup_flux_dictionaries(mle_analyses, batch.add, _defaults['use_components'],
+                                                  _defaults['components_to_use'])
+
+    bayesian_fluxes = _setup_flux_dictionaries(bayesian_analyses, batch.add, _defaults['use_components'],
+                                                       _defaults['components_to_use'])
+
+    results = batch.compute()
+
+    _fill_flux_dictionaries(mle_analyses, mle_fluxes, results)
+    _fill_flux_dictionaries(bayesian_analyses, bayesian_fluxes, results)
 
     out = []
 
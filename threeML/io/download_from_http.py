@@ -1,9 +1,15 @@
 import requests
 import re
 import os
+import gzip
+import shutil
+import hashlib
+import threading
+from multiprocessing.pool import ThreadPool
 
 from threeML.io.progress_bar import progress_bar, ProgressBarBase
 from threeML.io.file_utils import sanitize_filename, path_exists_and_is_directory, file_existing_and_readable
+from threeML.config.config import threeML_config
 
 
 class RemoteDirectoryNotFound(IOError):
@@ -15,6 +21,409 @@ class HTTPError(IOError):
     pass
 
 
+class DownloadFailed(IOError):
+
+    pass
+
+
+def _get_md5(filename, chunk_size=1024 * 1024):
+    """
+    Compute the MD5 checksum of a file, reading it in chunks
+
+    :param filename: the file
+    :param chunk_size: size of the chunks (in bytes)
+    :return: the checksum as an hexadecimal string
+    """
+
+    md5 = hashlib.md5()
+
+    with open(filename, 'rb') as f:
+
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+
+            md5.update(chunk)
+
+    return md5.hexdigest()
+
+
+class _DownloadTask(object):
+
+    def __init__(self, url, local_path, partial_path, compress, md5):
+
+        self.url = url
+        self.local_path = local_path
+
+        # The file is downloaded here, and moved to local_path only when complete
+
+        self.partial_path = partial_path
+
+        self.compress = compress
+        self.md5 = md5
+
+        # Size of the remote file (None if unknown)
+
+        self.size = None
+
+        # Number of bytes of this file accounted for in the progress bar
+
+        self.progress = 0
+
+
+class DownloadManager(object):
+
+    def __init__(self, n_threads=None, n_retries=None, timeout=None, chunk_size=1024 * 100):
+        """
+        Download files over HTTP with a pool of threads. The files are first downloaded to a temporary file (with the
+        .part extension), and moved to their destination only when they are complete and verified. An interrupted
+        download is resumed (with a HTTP Range request) from where it stopped, within the same call (up to n_retries
+        times) or in a later one. Files which already exist with the right size are not downloaded again.
+
+        > manager = DownloadManager()
+        > local_file = manager.add(url, destination_path)
+        > manager.download()
+
+        :param n_threads: maximum number of files downloaded at the same time (default: from the configuration)
+        :param n_retries: number of times an interrupted download is resumed before giving up (default: from the
+        configuration)
+        :param timeout: timeout for the connections in seconds (default: from the configuration)
+        :param chunk_size: size of the chunks written to disk (in bytes)
+        """
+
+        self._n_threads = int(threeML_config['download']['number of threads'] if n_threads is None else n_threads)
+        self._n_retries = int(threeML_config['download']['number of retries'] if n_retries is None else n_retries)
+        self._timeout = float(threeML_config['download']['timeout'] if timeout is None else timeout)
+
+        assert self._n_threads > 0, "The number of threads must be > 0"
+        assert self._n_retries >= 0, "The number of retries cannot be negative"
+
+        self._chunk_size = int(chunk_size)
+
+        self._tasks = []
+
+        # The progress bar is shared among the threads
+
+        self._progress_bar = None
+        self._lock = threading.Lock()
+
+    def add(self, url, destination_path, new_filename=None, compress=False, md5=None):
+        """
+        Add a file to the list of files to download (the download will happen when .download() is called)
+
+        :param url: URL of the remote file
+        :param destination_path: the destination directory in the local file system
+        :param new_filename: name of the local file (default: the same as the remote file)
+        :param compress: compress the file with gzip (the local file will have a .gz extension)
+        :param md5: expected MD5 checksum of the file (optional)
+        :return: the local path the file will be downloaded to
+        """
+
+        destination_path = sanitize_filename(destination_path, abspath=True)
+
+        assert path_exists_and_is_directory(destination_path), "Provided destination %s does not exist or " \
+                                                               "is not a directory" % destination_path
+
+        # If no filename is specified, use the same name that the file has on the remote server
+
+        if new_filename is None:
+
+            new_filename = url.split("/")[-1]
+
+        local_path = os.path.join(destination_path, new_filename)
+
+        partial_path = local_path + '.part'
+
+        if compress:
+
+            # Add a .gz at the end of the file path
+
+            local_path += '.gz'
+
+        self._tasks.append(_DownloadTask(url, local_path, partial_path, compress, md5))
+
+        return local_path
+
+    def download(self, progress=True, title=None):
+        """
+        Download all the files added so far, with a single progress bar. If some files cannot be downloaded the others
+        are downloaded anyway, then DownloadFailed is raised (calling again .add and .download will resume the
+        failed downloads)
+
+        :param progress: (True or False) whether to display progress or not
+        :param title: title of the progress bar (default: "Downloading n files")
+        :return: list of the local paths of the files, in the same order as they were added
+        """
+
+        tasks = self._tasks
+
+        self._tasks = []
+
+        if len(tasks) == 0:
+
+            return []
+
+        if title is None:
+
+            title = "Downloading %i files" % len(tasks)
+
+        pool = ThreadPool(min(self._n_threads, len(tasks)))
+
+        try:
+
+            # Getting the sizes is latency-bound as well, so do it in parallel
+
+            pool.map(self._get_remote_size, tasks)
+
+            total_size = sum([task.size for task in tasks if task.size is not None])
+
+            if progress:
+
+                with progress_bar(max(total_size, 1), scale=1024 * 1024, units='Mb', title=title) as bar:
+
+                    self._progress_bar = bar
+
+                    failures = self._download_tasks(pool, tasks)
+
+            else:
+
+                failures = self._download_tasks(pool, tasks)
+
+        finally:
+
+            self._progress_bar = None
+
+            pool.close()
+            pool.join()
+
+        if len(failures) > 0:
+
+            raise DownloadFailed("Could not download:\n%s" % "\n".join(["%s (%s)" % (task.url, error)
+                                                                         for task, error in failures]))
+
+        return [task.local_path for task in tasks]
+
+    def _download_tasks(self, pool, tasks):
+
+        failures = []
+
+        for task, error in pool.imap_unordered(self._download_task, tasks):
+
+            if error is not None:
+
+                failures.append((task, error))
+
+        return failures
+
+    def _get_remote_size(self, task):
+
+        try:
+
+            response = requests.head(task.url, allow_redirects=True, timeout=self._timeout,
+                                     headers={'Accept-Encoding': 'identity'})
+
+        except requests.exceptions.RequestException:
+
+            # The download will fail (and report the problem) later on
+
+            return
+
+        if response.ok and 'Content-Length' in response.headers:
+
+            task.size = int(response.headers['Content-Length'])
+
+    def _update_progress(self, task, position):
+
+        if self._progress_bar is None:
+
+            return
+
+        # Only count bytes not counted before (the download could have started again from the beginning)
+
+        with self._lock:
+
+            if position > task.progress:
+
+                self._progress_bar.increase(position - task.progress)
+
+                task.progress = position
+
+    def _is_complete(self, task):
+
+        if not file_existing_and_readable(task.local_path):
+
+            return False
+
+        # A compressed file is smaller than the remote file, so we can only check that it exists
+
+        if task.compress:
+
+            return True
+
+        if task.size is not None and os.path.getsize(task.local_path) != task.size:
+
+            return False
+
+        if task.md5 is not None and _get_md5(task.local_path) != task.md5:
+
+            return False
+
+        return True
+
+    def _download_task(self, task):
+        """
+        Download one file, resuming the download if it is interrupted
+
+        :param task: a _DownloadTask instance
+        :return: (task, None) if successful, (task, error message) otherwise
+        """
+
+        try:
+
+            if self._is_complete(task):
+
+                # No need to download it again
+
+                self._update_progress(task, task.size or 0)
+
+                return task, None
+
+            error = None
+
+            for _ in range(self._n_retries + 1):
+
+                try:
+
+                    self._transfer(task)
+
+                except requests.exceptions.RequestException as exc:
+
+                    # Keep what has been downloaded so far, and resume from there
+
+                    error = str(exc)
+
+                    continue
+
+                downloaded_size = os.path.getsize(task.partial_path)
+
+                if task.size is None or downloaded_size == task.size:
+
+                    break
+
+                error = "incomplete transfer (%i of %i bytes)" % (downloaded_size, task.size)
+
+            else:
+
+                return task, error
+
+            self._finalize(task)
+
+        except Exception as exc:
+
+            return task, str(exc)
+
+        return task, None
+
+    def _transfer(self, task):
+        """
+        Download a file (or the part of it which is not in the partial file yet) to the partial file
+
+        :param task: a _DownloadTask instance
+        :return: none
+        """
+
+        start = os.path.getsize(task.partial_path) if os.path.exists(task.partial_path) else 0
+
+        # If we do not know the size of the file, we cannot tell whether the partial file is valid
+
+        if task.size is None or start > task.size:
+
+            start = 0
+
+        elif start == task.size:
+
+            # Already complete (the previous attempt was interrupted after the download)
+
+            self._update_progress(task, start)
+
+            return
+
+        # Ask for the bytes we do not have yet. Do not accept a compressed transfer, otherwise the size would not
+        # match the size of the file
+
+        headers = {'Accept-Encoding': 'identity'}
+
+        if start > 0:
+
+            headers['Range'] = 'bytes=%i-' % start
+
+        # Use stream=True so that the file is not downloaded all in memory before being written to the disk
+
+        response = requests.get(task.url, headers=headers, stream=True, timeout=self._timeout)
+
+        try:
+
+            response.raise_for_status()
+
+            if start > 0 and response.status_code != 206:
+
+                # The server does not support resuming, so we are getting the whole file
+
+                start = 0
+
+            position = start
+
+            self._update_progress(task, position)
+
+            with open(task.partial_path, 'ab' if start > 0 else 'wb') as f:
+
+                for chunk in response.iter_content(chunk_size=self._chunk_size):
+
+                    if chunk:  # filter out keep-alive new chunks
+
+                        f.write(chunk)
+
+                        position += len(chunk)
+
+                        self._update_progress(task, position)
+
+        finally:
+
+            response.close()
+
+    def _finalize(self, task):
+        """
+        Verify the downloaded file and move it (compressing it if requested) to its final destination
+
+        :param task: a _DownloadTask instance
+        :return: none
+        """
+
+        if task.md5 is not None and _get_md5(task.partial_path) != task.md5:
+
+            # Do not try to resume from a corrupted file
+
+            os.remove(task.partial_path)
+
+            raise DownloadFailed("The checksum of %s does not match" % task.url)
+
+        if task.compress:
+
+            with open(task.partial_path, 'rb') as f_in:
+
+                with gzip.open(task.local_path, 'wb') as f_out:
+
+                    shutil.copyfileobj(f_in, f_out)
+
+            os.remove(task.partial_path)
+
+        else:
+
+            if os.path.exists(task.local_path):
+
+                os.remove(task.local_path)
+
+            os.rename(task.partial_path, task.local_path)
+
+
 class ApacheDirectory(object):
     """
     Allows to interact with a directory listing like the one returned by an Apache server
@@ -111,109 +520,42 @@ class ApacheDirectory(object):
 
         return self._directories
 
-    def download(self, remote_filename, destination_path, new_filename=None, progress=True, compress=False):
+    def get_file_url(self, remote_filename):
+        """
+        :param remote_filename: name of a file in this directory
+        :return: the URL of the file
+        """
 
         assert remote_filename in self.files, "File %s is not contained in this directory (%s)" % (remote_filename,
                                                                                                    self._request_result.url)
 
-        destination_path = sanitize_filename(destination_path, abspath=True)
-
-        assert path_exists_and_is_directory(destination_path), "Provided destination does not exist or " \
-                                                               "is not a directory" % destination_path
-
-        # If no filename is specified, use the same name that the file has on the remote server
-
-        if new_filename is None:
-            new_filename = remote_filename.split("/")[-1]
-
-        # Get the fully qualified path for the remote and the local file
-
-        remote_path = self._request_result.url + remote_filename
-        local_path = os.path.join(destination_path, new_filename)
-
-        # Ask the server for the file, but do not download it just yet
-        # (stream=True will get the HTTP header but nothing else)
-        # Use stream=True for two reasons:
-        # * so that the file is not downloaded all in memory before being written to the disk
-        # * so that we can report progress is requested
-
-        this_request = requests.get(remote_path, stream=True)
-
-        # Figure out the size of the file
-
-        file_size = int(this_request.headers['Content-Length'])
-
-        # Now check if we really need to download this file
-
-        if compress:
-            # Add a .gz at the end of the file path
-
-            local_path += '.gz'
-
-        if file_existing_and_readable(local_path):
-
-            local_size = os.path.getsize(local_path)
-
-            if local_size == file_size or compress:
-                # if the compressed file already exists
-                # it will have a smaller size
+        return self._request_result.url + remote_filename
 
-                # No need to download it again
-                return local_path
-
-        # Chunk size shouldn't bee too small otherwise we are causing a bottleneck in the download speed
-        chunk_size = 1024 * 10
-
-        # If the user wants to compress the file, use gzip, otherwise the normal opener
-        if compress:
-
-            import gzip
-
-            opener = gzip.open
-
-
-
-
-        else:
-
-            opener = open
-
-        if progress:
-
-            # Set a title for the progress bar
-            bar_title = "Downloading %s" % new_filename
-
-            with progress_bar(file_size, scale=1024 * 1024, units='Mb',
-                              title=bar_title) as bar:  # type: ProgressBarBase
-
-                with opener(local_path, 'wb') as f:
-
-                    for chunk in this_request.iter_content(chunk_size=chunk_size):
-
-                        if chunk:  # filter out keep-alive new chunks
-
-                            f.write(chunk)
-                            bar.increase(len(chunk))
-
-            this_request.close()
-
-        else:
-
-            with opener(local_path, 'wb') as f:
+    def download(self, remote_filename, destination_path, new_filename=None, progress=True, compress=False):
+        """
+        Download a file in the current directory. If the file already exists in the destination directory with the
+        same size it is not downloaded again, and an interrupted download is resumed (see DownloadManager)
 
-                for chunk in this_request.iter_content(chunk_size=chunk_size):
+        :param remote_filename: name of the file in this directory
+        :param destination_path: the path for the destination directory in the local file system
+        :param new_filename: name of the local file (default: the same as the remote file)
+        :param progress: (True or False) whether to display progress or not
+        :param compress: compress the file with gzip (a .gz extension is added to the local file)
+        :return: the absolute path of the file in the local file system
+        """
 
-                    if chunk:  # filter out keep-alive new chunks
+        manager = DownloadManager()
 
-                        f.write(chunk)
+        local_path = manager.add(self.get_file_url(remote_filename), destination_path, new_filename=new_filename,
+                                 compress=compress)
 
-            this_request.close()
+        manager.download(progress=progress, title="Downloading %s" % os.path.basename(local_path))
 
         return local_path
 
     def download_all_files(self, destination_path, progress=True, pattern=None):
         """
-        Download all files in the current directory
+        Download all files in the current directory. The files are downloaded concurrently (see DownloadManager)
 
         :param destination_path: the path for the destination directory in the local file system
         :param progress: (True or False) whether to display progress or not
@@ -222,7 +564,7 @@ class ApacheDirectory(object):
         :return: list of the downloaded files as absolute paths in the local file system
         """
 
-        local_files = []
+        manager = DownloadManager()
 
         for file in self.files:
 
@@ -232,9 +574,6 @@ class ApacheDirectory(object):
 
                     continue
 
-            this_local_file = self.download(file, destination_path, progress=progress)
-
-            local_files.append(this_local_file)
-
-        return local_files
+            manager.add(self.get_file_url(file), destination_path)
 
+        return manager.download(progress=progress)
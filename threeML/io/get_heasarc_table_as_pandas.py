@@ -7,6 +7,15 @@ from threeML.io.file_utils import sanitize_filename, if_directory_not_existing_t
 import warnings
 import yaml
 import codecs
+import collections
+import numpy as np
+import pandas as pd
+
+
+# Version of the format of the binary cache of the parsed tables. Increase it every time the format changes, so that
+# the caches written with the old format are rebuilt
+
+_table_cache_version = 1
 
 
 def get_heasarc_table_as_pandas(heasarc_table_name, update=False, cache_time_days=1):
@@ -18,7 +27,10 @@ def get_heasarc_table_as_pandas(heasarc_table_name, update=False, cache_time_day
 
     In order to speed up the processing of the tables, 3ML can cache the XML table in a cache
     that is updated every cache_time_days. The cache can be forced to update, i.e, reload from
-    the web, by setting update to True.
+    the web, by setting update to True. The parsed table is cached as well in a binary (npz) file,
+    which is rebuilt only when the XML file changes, so that the XML is not parsed every time.
+
+    If the cache is outdated but the internet cannot be reached, the cached table is used.
 
 
     :param heasarc_table_name: the name of a HEASARC browse table
@@ -47,6 +59,12 @@ def get_heasarc_table_as_pandas(heasarc_table_name, update=False, cache_time_day
 
     file_name_sanatized = sanitize_filename(file_name)
 
+    # and the binary cache of the parsed table
+
+    table_cache_file = os.path.join(cache_directory, '%s_table.npz' % heasarc_table_name)
+
+    table_cache_file_sanatized = sanitize_filename(table_cache_file)
+
     if not file_existing_and_readable(cache_file_sanatized):
 
         print("The cache for %s does not yet exist. We will try to build it\n" % heasarc_table_name)
@@ -132,10 +150,48 @@ def get_heasarc_table_as_pandas(heasarc_table_name, update=False, cache_time_day
 
                 yaml.dump(yaml_dict, stream=cache, default_flow_style=False)
 
+    if not file_existing_and_readable(file_name_sanatized):
+
+        raise IOError("The table %s is not in the cache and it could not be downloaded" % heasarc_table_name)
+
+    # use the parsed table in the binary cache, if it has been made from the current XML file
+
+    xml_signature = _get_xml_signature(file_name_sanatized)
+
+    pandas_df = _read_table_cache(table_cache_file_sanatized, xml_signature)
+
+    if pandas_df is None:
+
+        pandas_df = _read_votable(file_name_sanatized)
+
+        _write_table_cache(pandas_df, table_cache_file_sanatized, xml_signature)
+
+    return pandas_df
+
+
+def _get_xml_signature(file_name):
+    """
+    Identify the version of an XML file, so that the binary cache can be rebuilt when the XML file changes
+
+    :param file_name: the XML file
+    :return: an array with the size and the modification time of the file
+    """
+
+    return np.array([os.path.getsize(file_name), os.path.getmtime(file_name)], dtype=float)
+
+
+def _read_votable(file_name):
+    """
+    Parse a VO table
+
+    :param file_name: the XML file
+    :return: pandas DataFrame indexed by name
+    """
+
     # use astropy routines to read the votable
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
-        vo_table = votable.parse(file_name_sanatized)
+        vo_table = votable.parse(file_name)
 
     table = vo_table.get_first_table().to_table(use_names_over_ids=True)
 
@@ -146,3 +202,77 @@ def get_heasarc_table_as_pandas(heasarc_table_name, update=False, cache_time_day
     del vo_table
 
     return pandas_df
+
+
+def _write_table_cache(pandas_df, table_cache_file, xml_signature):
+    """
+    Save a parsed table in a binary (npz) file, with one array per column, together with the signature of the XML
+    file it has been made from
+
+    :param pandas_df: the table
+    :param table_cache_file: the npz file
+    :param xml_signature: the signature of the XML file (see _get_xml_signature)
+    :return: none
+    """
+
+    columns = {}
+
+    for i, column in enumerate(pandas_df.columns):
+
+        columns['column_%i' % i] = pandas_df[column].values
+
+    # Use a file object, otherwise numpy would add the .npz extension to the name
+
+    with open(table_cache_file, 'wb') as cache:
+
+        np.savez(cache,
+                 version=_table_cache_version,
+                 signature=xml_signature,
+                 column_names=np.array(map(str, pandas_df.columns)),
+                 index=pandas_df.index.values,
+                 index_name=str(pandas_df.index.name),
+                 **columns)
+
+
+def _read_table_cache(table_cache_file, xml_signature):
+    """
+    Read a table saved with _write_table_cache
+
+    :param table_cache_file: the npz file
+    :param xml_signature: the signature of the current XML file (see _get_xml_signature)
+    :return: the pandas DataFrame, or None if the cache does not exist, cannot be read, or has been written with a
+    different format or from a different XML file
+    """
+
+    if not file_existing_and_readable(table_cache_file):
+
+        return None
+
+    try:
+
+        # The string columns are stored as object arrays, which need pickle
+
+        with np.load(table_cache_file, allow_pickle=True) as cache:
+
+            if int(cache['version']) != _table_cache_version or \
+                    not np.array_equal(cache['signature'], xml_signature):
+
+                return None
+
+            column_names = map(str, cache['column_names'])
+
+            data = collections.OrderedDict()
+
+            for i, column_name in enumerate(column_names):
+
+                data[column_name] = cache['column_%i' % i]
+
+            index = pd.Index(cache['index'], name=str(cache['index_name']))
+
+    except Exception:
+
+        # The file is corrupted (for example because the writing has been interrupted). It will be rebuilt
+
+        return None
+
+    return pd.DataFrame(data, index=index, columns=column_names)
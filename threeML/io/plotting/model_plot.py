@@ -43,6 +43,9 @@ def plot_spectra(*analysis_results, **kwargs):
     :param xscale: 'log' or 'linear'
     :param yscale: 'log' or 'linear'
     :param include_extended: True or False, also plot extended source spectra.
+    :param processes: (optional) number of processes used to compute the spectra (default: 1). The spectra are cached,
+    so plotting them again (for example with a different style) does not compute them again. Use
+    export_spectral_bands() to get them as arrays
     :return:
     """
 
@@ -74,7 +77,8 @@ def plot_spectra(*analysis_results, **kwargs):
                  'subplot': None,
                  'xscale': 'log',
                  'yscale': 'log',
-                 'include_extended':False
+                 'include_extended':False,
+                 'processes': 1
                  }
 
     for key, value in kwargs.iteritems():
@@ -116,7 +120,8 @@ def plot_spectra(*analysis_results, **kwargs):
         _defaults['equal_tailed'],
         differential=True,
         sources_to_use=_defaults['sources_to_use'],
-        include_extended=_defaults['include_extended'] )
+        include_extended=_defaults['include_extended'],
+        processes=_defaults['processes'])
 
     # we are now ready to plot.
     # all calculations have been made.
@@ -1,28 +1,7 @@
-from threeML.classicMLE.joint_likelihood import JointLikelihood
-from threeML.bayesian.bayesian_analysis import BayesianAnalysis
-
-__all__ = []
-
-# copyreg is called copy_reg in python2
-try:
-
-    import copyreg #py3
-
-except ImportError:
-
-    import copy_reg as copyreg #py2
+# The serialization of JointLikelihood and BayesianAnalysis instances is now registered in the modules defining
+# them. This module is kept for backward compatibility
 
+from threeML.classicMLE.joint_likelihood import JointLikelihood, pickle_joint_likelihood
+from threeML.bayesian.bayesian_analysis import BayesianAnalysis, pickle_bayesian_analysis
 
-# Serialization for JointLikelihood object
-def pickle_joint_likelihood(jl):
-
-    return JointLikelihood, (jl.likelihood_model, jl.data_list)
-
-copyreg.pickle(JointLikelihood, pickle_joint_likelihood)
-
-# Serialization for BayesianAnalysis object
-def pickle_bayesian_analysis(bs):
-
-    return BayesianAnalysis, (bs.likelihood_model, bs.data_list)
-
-copyreg.pickle(BayesianAnalysis, pickle_bayesian_analysis)
+__all__ = []
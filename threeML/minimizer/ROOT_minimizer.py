@@ -3,6 +3,7 @@ import numpy as np
 
 from threeML.minimizer.minimization import LocalMinimizer, FitFailed, CannotComputeCovariance
 from threeML.io.dict_with_pretty_print import DictWithPrettyPrint
+from threeML.config.config import threeML_config
 
 # These are the status returned by Minuit
 #     status = 1    : Covariance was made pos defined
@@ -106,6 +107,14 @@ class ROOTMinimizer(LocalMinimizer):
                 # No limits
                 self.minimizer.SetVariable(i, par_name, cur_value, cur_delta)
 
+    def _set_internal_starting_values(self, internal_values):
+
+        super(ROOTMinimizer, self)._set_internal_starting_values(internal_values)
+
+        for i, value in enumerate(internal_values):
+
+            self.minimizer.SetVariableValue(i, value)
+
     def _minimize(self, compute_covar=True):
 
         # Minimize with MIGRAD
@@ -138,22 +147,25 @@ class ROOTMinimizer(LocalMinimizer):
 
     def _compute_covariance_matrix(self, best_fit_values):
 
-        # Gather the current status so we can offset it later
-        status_before_hesse = self.minimizer.Status()
+        # Unless we have been asked to reuse the covariance matrix estimated by MIGRAD, use Hesse to compute the
+        # covariance matrix accurately
+
+        if threeML_config['mle']['covariance method'] != 'minimizer':
 
-        # Use Hesse to compute the covariance matrix accurately
+            # Gather the current status so we can offset it later
+            status_before_hesse = self.minimizer.Status()
 
-        self.minimizer.Hesse()
+            self.minimizer.Hesse()
 
-        # Gather the current status and remove the offset so that we get the HESSE status
-        status_after_hesse = self.minimizer.Status() - status_before_hesse
+            # Gather the current status and remove the offset so that we get the HESSE status
+            status_after_hesse = self.minimizer.Status() - status_before_hesse
 
-        if status_after_hesse > 0:
+            if status_after_hesse > 0:
 
-            failure_reason = _hesse_status_translation[status_after_hesse]
+                failure_reason = _hesse_status_translation[status_after_hesse]
 
-            raise CannotComputeCovariance("HESSE failed. Reason: %s (status: %i)" % (failure_reason,
-                                                                                     status_after_hesse))
+                raise CannotComputeCovariance("HESSE failed. Reason: %s (status: %i)" % (failure_reason,
+                                                                                         status_after_hesse))
 
         # Gather the covariance matrix and return it
 
@@ -1,9 +1,13 @@
 import collections
+import json
+import os
 import numpy as np
 import itertools
 
 from threeML.minimizer.minimization import GlobalMinimizer
 from threeML.io.progress_bar import progress_bar
+from threeML.io.file_utils import sanitize_filename
+from threeML.parallel.parallel_client import ParallelClient, is_parallel_computation_active
 from astromodels import Parameter
 
 
@@ -11,9 +15,13 @@ class AllFitFailed(RuntimeError):
     pass
 
 
+class IncompatibleCheckpoint(RuntimeError):
+    pass
+
+
 class GridMinimizer(GlobalMinimizer):
 
-    valid_setup_keys = ('grid', 'second_minimization', 'callbacks')
+    valid_setup_keys = ('grid', 'second_minimization', 'callbacks', 'checkpoint', 'refine', 'refine_levels')
 
     def __init__(self, function, parameters, verbosity=1):
 
@@ -32,6 +40,13 @@ class GridMinimizer(GlobalMinimizer):
         # This list will contain callbacks, if any
         self._callbacks = []
 
+        # File where to save the results of the points already fitted (if any), and options for the refinement
+        # of the grid around the best points
+
+        self._checkpoint_file = None
+        self._n_refine = 0
+        self._refine_levels = 1
+
     def _setup(self, user_setup_dict):
 
         if user_setup_dict is None:
@@ -61,6 +76,28 @@ class GridMinimizer(GlobalMinimizer):
 
                 self.add_callback(callback)
 
+        # Checkpoint file. Every point in the grid is saved there as soon as its fit is completed, so that an
+        # interrupted grid search can be resumed by running it again with the same checkpoint file
+
+        if 'checkpoint' in user_setup_dict:
+
+            self._checkpoint_file = sanitize_filename(user_setup_dict['checkpoint'])
+
+        # Coarse-to-fine search: after the grid, a finer grid is explored around the best 'refine' points, for
+        # 'refine_levels' times (every time halving the spacing of the grid)
+
+        if 'refine' in user_setup_dict:
+
+            self._n_refine = int(user_setup_dict['refine'])
+
+            assert self._n_refine >= 0, "The number of points to refine must be >= 0"
+
+        if 'refine_levels' in user_setup_dict:
+
+            self._refine_levels = int(user_setup_dict['refine_levels'])
+
+            assert self._refine_levels >= 1, "The number of refinement levels must be >= 1"
+
     def add_callback(self, function):
         """
         This adds a callback function which is called after each point in the grid has been used.
@@ -134,82 +171,352 @@ class GridMinimizer(GlobalMinimizer):
 
         self._grid[parameter.path] = grid
 
-    def _minimize(self):
+    def _fit_point(self, values_tuple):
+        """
+        Perform a fit starting from the provided point in the grid
 
-        assert len(self._grid) > 0, "You need to set up a grid using add_parameter_to_grid"
+        :param values_tuple: the values for the parameters in the grid
+        :return: (best fit values in the internal system, minimum), or None if the fit failed
+        """
 
-        if self._2nd_minimization is None:
+        # Reset everything to the original values, so that the fit will always start
+        # from there, instead that from the values obtained in the last iterations, which
+        # might have gone completely awry
 
-            raise RuntimeError("You did not setup this global minimizer (GRID). You need to use the .setup() method")
+        for par_name, par_value in self._original_values.items():
 
-        # For each point in the grid, perform a fit
+            self.parameters[par_name].value = par_value
 
-        parameters = self._grid.keys()
+        # Now set the parameters in the grid to their starting values
 
-        overall_minimum = 1e20
-        internal_best_fit_values = None
+        for par_name, this_value in zip(self._grid.keys(), values_tuple):
 
-        n_iterations = np.prod([x.shape for x in self._grid.values()])
+            self.parameters[par_name].value = this_value
 
-        with progress_bar(n_iterations, title='Grid minimization') as progress:
+        # Get a new instance of the minimizer. We need to do this instead of reusing an existing instance
+        # because some minimizers (like iminuit) keep internal track of their status, so that reusing
+        # a minimizer will create correlation between the different points
+        # NOTE: this line necessarily needs to be after the values of the parameters has been set to the
+        # point, because the init method of the minimizer instance will use those values to set the starting
+        # point for the fit
 
-            for values_tuple in itertools.product(*self._grid.values()):
+        _minimizer = self._2nd_minimization.get_instance(self.function, self.parameters, verbosity=0)
 
-                # Reset everything to the original values, so that the fit will always start
-                # from there, instead that from the values obtained in the last iterations, which
-                # might have gone completely awry
+        # Perform fit
 
-                for par_name, par_value in self._original_values.items():
+        try:
 
-                    self.parameters[par_name].value = par_value
+            # We call _minimize() and not minimize() so that the best fit values are
+            # in the internal system.
 
-                # Now set the parameters in the grid to their starting values
+            this_best_fit_values_internal, this_minimum = _minimizer._minimize()
 
-                for i, this_value in enumerate(values_tuple):
+        except:
 
-                    self.parameters[parameters[i]].value = this_value
+            # A failure is not a problem here, only if all of the fit fail then we have a problem
+            # but this case is handled later
 
-                # Get a new instance of the minimizer. We need to do this instead of reusing an existing instance
-                # because some minimizers (like iminuit) keep internal track of their status, so that reusing
-                # a minimizer will create correlation between the different points
-                # NOTE: this line necessarily needs to be after the values of the parameters has been set to the
-                # point, because the init method of the minimizer instance will use those values to set the starting
-                # point for the fit
+            return None
 
-                _minimizer = self._2nd_minimization.get_instance(self.function, self.parameters, verbosity=0)
+        return np.array(this_best_fit_values_internal, float), float(this_minimum)
 
-                # Perform fit
+    def _get_checkpoint_header(self, reference_point):
+        """
+        Build the header of the checkpoint file, which identifies the search the results belong to: the parameters in
+        the grid, the free parameters, and the value of the function at a reference point (which changes if the
+        model or the data change)
 
-                try:
+        :param reference_point: the point (in the internal system) where to evaluate the function
+        :return: dictionary
+        """
+
+        header = collections.OrderedDict()
+
+        header['grid_parameters'] = list(self._grid.keys())
+        header['free_parameters'] = list(self.parameters.keys())
+        header['reference_point'] = map(float, reference_point)
+        header['reference_value'] = float(self.function(*reference_point))
+
+        return header
+
+    def _check_checkpoint_header(self, header):
+
+        current = self._get_checkpoint_header(header['reference_point'])
+
+        # Evaluating the function changed the values of the parameters, restore them
+
+        for par_name, par_value in self._original_values.items():
+
+            self.parameters[par_name].value = par_value
+
+        for key, description in (('grid_parameters', 'parameters in the grid'),
+                                 ('free_parameters', 'free parameters')):
+
+            if header[key] != current[key]:
+
+                raise IncompatibleCheckpoint("The checkpoint file %s has been produced with different %s (%s). "
+                                             "Remove it or use a different file." % (self._checkpoint_file,
+                                                                                     description,
+                                                                                     ", ".join(header[key])))
+
+        if not np.isclose(header['reference_value'], current['reference_value'], rtol=1e-9, atol=0):
+
+            raise IncompatibleCheckpoint("The checkpoint file %s has been produced with a different model or "
+                                         "different data. Remove it or use a different "
+                                         "file." % self._checkpoint_file)
+
+    def _read_checkpoint(self):
+        """
+        Read the results of the points already fitted from the checkpoint file (if any). If the file does not exist
+        yet, it is created with a header identifying the current search. Otherwise, its header is checked against
+        the current search (an IncompatibleCheckpoint exception is raised if they do not match)
+
+        :return: a dictionary point -> (best fit values, minimum) or point -> None (failed fit)
+        """
+
+        completed = collections.OrderedDict()
+
+        if self._checkpoint_file is None:
+
+            return completed
+
+        if not os.path.exists(self._checkpoint_file) or os.path.getsize(self._checkpoint_file) == 0:
+
+            reference_point = [value for value, _, _, _ in self._internal_parameters.values()]
+
+            with open(self._checkpoint_file, "w") as f:
+
+                f.write(json.dumps({'header': self._get_checkpoint_header(reference_point)}) + "\n")
 
-                    # We call _minimize() and not minimize() so that the best fit values are
-                    # in the internal system.
+            return completed
 
-                    this_best_fit_values_internal, this_minimum = _minimizer._minimize()
+        with open(self._checkpoint_file) as f:
+
+            try:
+
+                header = json.loads(f.readline())['header']
+
+            except (ValueError, KeyError, TypeError):
+
+                raise IncompatibleCheckpoint("The checkpoint file %s has no valid header. Remove it or use a "
+                                             "different file." % self._checkpoint_file)
+
+            self._check_checkpoint_header(header)
+
+            for line in f:
+
+                # Skip incomplete lines (for example if the previous run was killed while writing)
+
+                try:
 
-                except:
+                    record = json.loads(line)
 
-                    # A failure is not a problem here, only if all of the fit fail then we have a problem
-                    # but this case is handled later
+                except ValueError:
 
                     continue
 
-                # If this minimum is the overall minimum, save the result
+                point = tuple(record['point'])
 
-                if this_minimum < overall_minimum:
+                if record['minimum'] is None:
 
-                    overall_minimum = this_minimum
-                    internal_best_fit_values = this_best_fit_values_internal
+                    completed[point] = None
 
-                # Use callbacks (if any)
-                for callback in self._callbacks:
+                else:
+
+                    completed[point] = (np.array(record['best_fit_values'], float), float(record['minimum']))
+
+        return completed
+
+    def _fit_points(self, points, completed, title):
+        """
+        Fit all the provided points (skipping those already completed), serially or in parallel. Callbacks are
+        called in this process as soon as each result becomes available.
+
+        :param points: list of points in the grid
+        :param completed: dictionary of completed points (will be updated)
+        :param title: title for the progress bar
+        :return: none
+        """
+
+        # Call the callbacks also for the points restored from a previous run, so that callers receive the results
+        # for all points
+
+        to_be_done = []
+
+        for values_tuple in points:
+
+            if values_tuple in completed:
+
+                if completed[values_tuple] is not None:
+
+                    for callback in self._callbacks:
+
+                        callback(values_tuple, completed[values_tuple][1])
+
+            else:
+
+                to_be_done.append(values_tuple)
+
+        if len(to_be_done) == 0:
+
+            return
 
-                    callback(values_tuple, this_minimum)
+        if is_parallel_computation_active():
 
-                progress.increase()
+            client = ParallelClient()
 
-        if internal_best_fit_values is None:
+            def worker(values_tuple):
+
+                return values_tuple, self._fit_point(values_tuple)
+
+            results = client.execute_and_stream(worker, to_be_done)
+
+        else:
+
+            results = ((values_tuple, self._fit_point(values_tuple)) for values_tuple in to_be_done)
+
+        checkpoint = open(self._checkpoint_file, "a") if self._checkpoint_file is not None else None
+
+        try:
+
+            with progress_bar(len(to_be_done), title=title) as progress:
+
+                for values_tuple, result in results:
+
+                    completed[values_tuple] = result
+
+                    if checkpoint is not None:
+
+                        record = {'point': list(values_tuple), 'minimum': None, 'best_fit_values': None}
+
+                        if result is not None:
+
+                            record['minimum'] = result[1]
+                            record['best_fit_values'] = list(result[0])
+
+                        checkpoint.write(json.dumps(record) + "\n")
+                        checkpoint.flush()
+
+                    # Use callbacks (if any)
+
+                    if result is not None:
+
+                        for callback in self._callbacks:
+
+                            callback(values_tuple, result[1])
+
+                    progress.increase()
+
+        finally:
+
+            if checkpoint is not None:
+
+                checkpoint.close()
+
+    @staticmethod
+    def _get_successful(points, completed):
+
+        # NOTE: the checkpoint file contains also the points of the refinement, which might not be part of the
+        # current list of points
+
+        return [(completed[point][1], point) for point in points if completed.get(point) is not None]
+
+    def _get_refined_points(self, points, completed, spacings):
+        """
+        Build a finer grid around the best points found so far
+
+        :param points: the points explored so far
+        :param completed: dictionary of completed points
+        :param spacings: the current spacing of the grid for each parameter
+        :return: list of new points
+        """
+
+        successful = self._get_successful(points, completed)
+
+        best_points = [point for _, point in sorted(successful)[:self._n_refine]]
+
+        explored = set(points)
+
+        new_points = []
+
+        for point in best_points:
+
+            # Explore the cell around the point, i.e., half the spacing of the grid on each side
+
+            axes = []
+
+            for par_name, value, spacing in zip(self._grid.keys(), point, spacings):
+
+                parameter = self.parameters[par_name]
+
+                this_axis = [value + spacing / 2.0 * step for step in (-1, 0, 1)]
+
+                # Make sure we do not go beyond the boundaries of the parameters
+
+                this_axis = filter(lambda x: (parameter.min_value is None or x > parameter.min_value) and
+                                             (parameter.max_value is None or x < parameter.max_value), this_axis)
+
+                axes.append(this_axis)
+
+            for values_tuple in itertools.product(*axes):
+
+                values_tuple = tuple(map(float, values_tuple))
+
+                if values_tuple not in explored:
+
+                    explored.add(values_tuple)
+
+                    new_points.append(values_tuple)
+
+        return new_points
+
+    def _minimize(self):
+
+        assert len(self._grid) > 0, "You need to set up a grid using add_parameter_to_grid"
+
+        if self._2nd_minimization is None:
+
+            raise RuntimeError("You did not setup this global minimizer (GRID). You need to use the .setup() method")
+
+        # Restore the results from a previous (interrupted) run, if any
+
+        completed = self._read_checkpoint()
+
+        # For each point in the grid, perform a fit
+
+        points = [tuple(map(float, values_tuple)) for values_tuple in itertools.product(*self._grid.values())]
+
+        self._fit_points(points, completed, 'Grid minimization')
+
+        # Coarse-to-fine: refine the grid around the best points (if requested)
+
+        if self._n_refine > 0:
+
+            # The initial spacing for each parameter is the smallest distance between two points in its grid
+
+            spacings = [np.min(np.diff(np.unique(grid))) if np.unique(grid).shape[0] > 1 else 0.0
+                        for grid in self._grid.values()]
+
+            for level in range(self._refine_levels):
+
+                new_points = self._get_refined_points(points, completed, spacings)
+
+                self._fit_points(new_points, completed, 'Grid refinement (level %i)' % (level + 1))
+
+                points.extend(new_points)
+
+                spacings = [spacing / 2.0 for spacing in spacings]
+
+        # Find the overall minimum
+
+        successful = self._get_successful(points, completed)
+
+        if len(successful) == 0:
 
             raise AllFitFailed("All fit starting from values in the grid have failed!")
 
-        return internal_best_fit_values, overall_minimum
\ No newline at end of file
+        _, best_point = min(successful)
+
+        internal_best_fit_values, overall_minimum = completed[best_point]
+
+        return internal_best_fit_values, overall_minimum
@@ -1,10 +1,12 @@
 import collections
+import importlib
 import math
 import numpy as np
 import pandas as pd
 import scipy.optimize
 
 from threeML.io.progress_bar import progress_bar
+from threeML.config.config import threeML_config
 from threeML.exceptions.custom_exceptions import custom_warnings
 from threeML.utils.differentiation import get_hessian, ParameterOnBoundary
 
@@ -42,10 +44,27 @@ class MinimizerNotAvailable(Exception):
 class BetterMinimumDuringProfiling(RuntimeWarning):
     pass
 
-# This will contain the available minimizers
+# Known minimizers, with the module and the class implementing them. The modules are imported only when a
+# minimizer is used for the first time, because some of them depend on heavy libraries (ROOT, pygmo...)
+
+_minimizer_modules = collections.OrderedDict()
+
+_minimizer_modules["MINUIT"] = ("threeML.minimizer.minuit_minimizer", "MinuitMinimizer")
+_minimizer_modules["ROOT"] = ("threeML.minimizer.ROOT_minimizer", "ROOTMinimizer")
+_minimizer_modules["MULTINEST"] = ("threeML.minimizer.multinest_minimizer", "MultinestMinimizer")
+_minimizer_modules["PAGMO"] = ("threeML.minimizer.pagmo_minimizer", "PAGMOMinimizer")
+_minimizer_modules["SCIPY"] = ("threeML.minimizer.scipy_minimizer", "ScipyMinimizer")
+_minimizer_modules["GRID"] = ("threeML.minimizer.grid_minimizer", "GridMinimizer")
+_minimizer_modules["MULTISTART"] = ("threeML.minimizer.multistart_minimizer", "MultiStartMinimizer")
+
+# This will contain the minimizers which have been imported successfully
 
 _minimizers = {}
 
+# This will contain the minimizers which could not be imported
+
+_not_available_minimizers = set()
+
 
 def get_minimizer(minimizer_type):
     """
@@ -55,15 +74,66 @@ def get_minimizer(minimizer_type):
     :return: the class (i.e., the type) for the requested minimizer
     """
 
+    name = minimizer_type.upper()
+
+    if name not in _minimizers and name in _minimizer_modules and name not in _not_available_minimizers:
+
+        module_name, class_name = _minimizer_modules[name]
+
+        try:
+
+            module = importlib.import_module(module_name)
+
+        except ImportError:
+
+            custom_warnings.warn("%s minimizer not available" % name, ImportWarning)
+
+            _not_available_minimizers.add(name)
+
+        else:
+
+            _minimizers[name] = getattr(module, class_name)
+
     try:
 
-        return _minimizers[minimizer_type.upper()]
+        return _minimizers[name]
 
     except KeyError:
 
         raise MinimizerNotAvailable("Minimizer %s is not available on your system" % minimizer_type)
 
 
+def is_minimizer_available(minimizer_type):
+    """
+    Test whether the requested minimizer is available (importing it if needed)
+
+    :param minimizer_type: MINUIT, ROOT, PYOPT...
+    :return: True or False
+    """
+
+    try:
+
+        _ = get_minimizer(minimizer_type)
+
+    except MinimizerNotAvailable:
+
+        return False
+
+    else:
+
+        return True
+
+
+def get_available_minimizers():
+    """
+    Returns the names of all the minimizers available on this system. Note that this imports all of them.
+
+    :return: a list of names
+    """
+
+    return filter(is_minimizer_available, _minimizer_modules.keys())
+
+
 class FunctionWrapper(object):
 
     def __init__(self, function, all_parameters, fixed_parameters):
@@ -90,6 +160,10 @@ class FunctionWrapper(object):
 
         self._all_values = np.zeros(len(self._all_parameters))
 
+        # Number of calls to the function (used to measure the cost of each profile point)
+
+        self.n_calls = 0
+
     def set_fixed_values(self, new_fixed_values):
 
         # Note that this will receive the fixed values in internal reference (after the transformations, if any)
@@ -106,6 +180,8 @@ class FunctionWrapper(object):
         self._all_values[self._indexes_of_fixed_par] = self._fixed_parameters_values
         self._all_values[~self._indexes_of_fixed_par] = trial_values
 
+        self.n_calls += 1
+
         return self._function(*self._all_values)
 
 
@@ -162,6 +238,70 @@ class ProfileLikelihood(object):
             self._wrapper = None
             self._optimizer = None
 
+        # Solutions found so far, used to start each new profile fit from the solution for the closest point
+        # already solved (warm start). These are in the internal reference
+
+        self._solved_fixed_values = []
+        self._solved_free_values = []
+
+        # Number of function calls for each point of the last call to step()
+
+        self._n_function_calls = None
+
+    @property
+    def n_function_calls(self):
+        """
+        The number of function evaluations needed to profile each point in the last call to step(), with the
+        same shape as the returned array (useful to measure the efficiency of the profiling)
+
+        :return: array of number of calls
+        """
+
+        return self._n_function_calls
+
+    def _profile(self, fixed_values, scales=None):
+        """
+        Minimize the function with respect to the free parameters, keeping the fixed parameters to the provided
+        values. The fit starts from the solution found for the closest point already solved.
+
+        :param fixed_values: values for the fixed parameters (in the internal reference)
+        :param scales: scale for each fixed parameter used to compute the distance between points (default: 1)
+        :return: (minimum, number of function calls)
+        """
+
+        fixed_values = np.array(fixed_values, float, ndmin=1)
+
+        self._wrapper.set_fixed_values(fixed_values)
+
+        if len(self._solved_fixed_values) > 0:
+
+            scales = np.ones_like(fixed_values) if scales is None else np.array(scales, float)
+
+            distances = np.sum(((np.array(self._solved_fixed_values) - fixed_values) / scales) ** 2, axis=1)
+
+            # In case of ties, prefer the most recent solution
+
+            closest = len(distances) - 1 - np.argmin(distances[::-1])
+
+            self._optimizer._set_internal_starting_values(self._solved_free_values[closest])
+
+        n_calls_before = self._wrapper.n_calls
+
+        try:
+
+            _, this_log_like = self._optimizer.minimize(compute_covar=False)
+
+        finally:
+
+            n_calls = self._wrapper.n_calls - n_calls_before
+
+        # Store the solution for the warm start of the next points
+
+        self._solved_fixed_values.append(fixed_values)
+        self._solved_free_values.append([par._get_internal_value() for par in self._optimizer.parameters.values()])
+
+        return this_log_like, n_calls
+
     def _transform_steps(self, parameter_name, steps):
         """
         If the parameter has a transformation, use it for the steps and return the transformed steps
@@ -227,9 +367,7 @@ class ProfileLikelihood(object):
 
     def __call__(self, values):
 
-        self._wrapper.set_fixed_values(values)
-
-        _, this_log_like = self._optimizer.minimize(compute_covar=False)
+        this_log_like, _ = self._profile(values)
 
         return this_log_like
 
@@ -237,6 +375,8 @@ class ProfileLikelihood(object):
 
         log_likes = np.zeros_like(steps1)
 
+        self._n_function_calls = np.zeros(len(steps1), int)
+
         with progress_bar(len(steps1), title='Profiling likelihood') as p:
 
             for i, step in enumerate(steps1):
@@ -245,9 +385,7 @@ class ProfileLikelihood(object):
 
                     # Profile out the free parameters
 
-                    self._wrapper.set_fixed_values(step)
-
-                    _, this_log_like = self._optimizer.minimize(compute_covar=False)
+                    this_log_like, self._n_function_calls[i] = self._profile(step)
 
                 else:
 
@@ -255,6 +393,8 @@ class ProfileLikelihood(object):
 
                     this_log_like = self._function(step)
 
+                    self._n_function_calls[i] = 1
+
                 log_likes[i] = this_log_like
 
                 p.increase()
@@ -265,21 +405,37 @@ class ProfileLikelihood(object):
 
         log_likes = np.zeros((len(steps1), len(steps2)))
 
+        self._n_function_calls = np.zeros((len(steps1), len(steps2)), int)
+
+        # Use the grid step as the scale for the distances between points, so that the closest solved point
+        # is always one of the neighbours in the grid
+
+        scales = [np.min(np.abs(np.diff(steps))) if len(steps) > 1 else 1.0 for steps in (steps1, steps2)]
+
+        scales = [scale if scale > 0 else 1.0 for scale in scales]
+
         with progress_bar(len(steps1) * len(steps2), title='Profiling likelihood') as p:
 
             for i, step1 in enumerate(steps1):
 
-                for j,step2 in enumerate(steps2):
+                # Walk the grid in a serpentine path (left to right, then right to left and so on), so that
+                # consecutive points are always neighbours
+
+                columns = range(len(steps2)) if i % 2 == 0 else range(len(steps2) - 1, -1, -1)
+
+                for j in columns:
+
+                    step2 = steps2[j]
 
                     if self._n_free_parameters > 0:
 
                         # Profile out the free parameters
 
-                        self._wrapper.set_fixed_values([step1, step2])
+                        n_calls_before = self._wrapper.n_calls
 
                         try:
 
-                            _, this_log_like = self._optimizer.minimize(compute_covar=False)
+                            this_log_like, _ = self._profile([step1, step2], scales)
 
                         except FitFailed:
 
@@ -288,12 +444,16 @@ class ProfileLikelihood(object):
 
                             this_log_like = np.nan
 
+                        self._n_function_calls[i, j] = self._wrapper.n_calls - n_calls_before
+
                     else:
 
                         # No free parameters, just compute the likelihood
 
                         this_log_like = self._function(step1, step2)
 
+                        self._n_function_calls[i, j] = 1
+
                     log_likes[i,j] = this_log_like
 
                     p.increase()
@@ -612,6 +772,19 @@ class Minimizer(object):
 
         raise NotImplemented("This is the method of the base class. Must be implemented by the actual minimizer")
 
+    def _set_internal_starting_values(self, internal_values):
+        """
+        Set the starting point for the next minimization. Minimizers which keep their own copy of the starting
+        point should override this (calling this method as well).
+
+        :param internal_values: the starting values for the parameters, in the internal reference
+        :return: none
+        """
+
+        for (par_name, (_, delta, minimum, maximum)), value in zip(self._internal_parameters.items(), internal_values):
+
+            self._internal_parameters[par_name] = (value, delta, minimum, maximum)
+
     def set_algorithm(self, algorithm):
 
         raise NotImplementedError("Must be implemented by the actual minimizer if it provides more than one algorithm")
@@ -727,11 +900,30 @@ class Minimizer(object):
         The sqrt of the diagonal of the result is an accurate estimate of the errors only if the
         log.likelihood is parabolic in the neighborhood of the minimum.
 
-        Derivatives are computed numerically.
+        Derivatives are computed numerically, using the method selected in the configuration
+        (threeML_config['mle']['covariance method']). With the 'minimizer' method the estimate built by the minimizer
+        during the minimization is used instead, if available.
 
         :return: the covariance matrix
         """
 
+        method = threeML_config['mle']['covariance method']
+
+        assert method in ('adaptive', 'central', 'minimizer'), "Covariance method must be one of 'adaptive', " \
+                                                                 "'central' or 'minimizer'"
+
+        if method == 'minimizer':
+
+            covariance_matrix = self._get_minimizer_covariance()
+
+            if covariance_matrix is not None:
+
+                return self._check_covariance_matrix(covariance_matrix)
+
+            custom_warnings.warn("The minimizer did not provide a covariance matrix. Using central differences.")
+
+            method = 'central'
+
         minima = map(lambda parameter:parameter._get_internal_min_value(), self.parameters.values())
         maxima = map(lambda parameter: parameter._get_internal_max_value(), self.parameters.values())
 
@@ -757,7 +949,7 @@ class Minimizer(object):
 
         try:
 
-            hessian_matrix = get_hessian(self.function, best_fit_values, minima, maxima)
+            hessian_matrix = get_hessian(self.function, best_fit_values, minima, maxima, method=method)
 
         except ParameterOnBoundary:
 
@@ -782,7 +974,23 @@ class Minimizer(object):
 
             return np.zeros((n_dim, n_dim)) * np.nan
 
-        # Now check that the covariance matrix is semi-positive definite (it must be unless
+        return self._check_covariance_matrix(covariance_matrix)
+
+    def _get_minimizer_covariance(self):
+        """
+        Returns the covariance matrix estimated by the minimizer itself during the minimization (for example the
+        inverse Hessian built by quasi-Newton methods), or None if not available. Minimizers which provide such
+        estimate should override this.
+
+        :return: the covariance matrix or None
+        """
+
+        return None
+
+    @staticmethod
+    def _check_covariance_matrix(covariance_matrix):
+
+        # Check that the covariance matrix is semi-positive definite (it must be unless
         # there have been numerical problems, which can happen when some parameter is unconstrained)
 
         # The fastest way is to try and compute the Cholesky decomposition, which
@@ -1167,77 +1375,3 @@ class LocalMinimizer(Minimizer):
 class GlobalMinimizer(Minimizer):
 
     pass
-
-
-# Check which minimizers are available
-
-try:
-
-    from threeML.minimizer.minuit_minimizer import MinuitMinimizer
-
-except ImportError:
-
-    custom_warnings.warn("Minuit minimizer not available", ImportWarning)
-
-else:
-
-    _minimizers["MINUIT"] = MinuitMinimizer
-
-try:
-
-    from threeML.minimizer.ROOT_minimizer import ROOTMinimizer
-
-except ImportError:
-
-    custom_warnings.warn("ROOT minimizer not available", ImportWarning)
-
-else:
-
-    _minimizers["ROOT"] = ROOTMinimizer
-
-try:
-
-    from threeML.minimizer.multinest_minimizer import MultinestMinimizer
-
-except ImportError:
-
-    custom_warnings.warn("Multinest minimizer not available", ImportWarning)
-
-else:
-
-    _minimizers["MULTINEST"] = MultinestMinimizer
-
-try:
-
-    from threeML.minimizer.pagmo_minimizer import PAGMOMinimizer
-
-except ImportError:
-
-    custom_warnings.warn("PyGMO is not available", ImportWarning)
-
-else:
-
-    _minimizers["PAGMO"] = PAGMOMinimizer
-
-try:
-
-    from threeML.minimizer.scipy_minimizer import ScipyMinimizer
-
-except ImportError:
-
-    custom_warnings.warn("Scipy minimizer is not available", ImportWarning)
-
-else:
-
-    _minimizers["SCIPY"] = ScipyMinimizer
-
-# Check that we have at least one minimizer available
-
-if len(_minimizers) == 0:
-
-    raise SystemError("You do not have any minimizer available! You need to install at least iminuit.")
-
-# Add the GRID minimizer here since it needs at least one other minimizer
-
-from threeML.minimizer.grid_minimizer import GridMinimizer
-_minimizers["GRID"] = GridMinimizer
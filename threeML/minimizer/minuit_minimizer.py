@@ -1,5 +1,6 @@
 from threeML.minimizer.minimization import LocalMinimizer, CannotComputeErrors, FitFailed, CannotComputeCovariance
 from threeML.io.detect_notebook import is_inside_notebook
+from threeML.config.config import threeML_config
 
 from iminuit import Minuit
 from iminuit.frontends.console import ConsoleFrontend
@@ -169,6 +170,19 @@ class MinuitMinimizer(LocalMinimizer):
 
             self.minuit.values[minuit_name] = par._get_internal_value()
 
+    def _set_internal_starting_values(self, internal_values):
+
+        super(MinuitMinimizer, self)._set_internal_starting_values(internal_values)
+
+        # MIGRAD (with resume=False) always restarts from the values used when the Minuit instance was created,
+        # so we need a new instance starting from the new values (keeping the same tolerance)
+
+        tolerance = self.minuit.tol
+
+        self._setup(None)
+
+        self.minuit.tol = tolerance
+
     def _is_fit_ok(self):
         """
         iMinuit provides the method migrad_ok(). However, that method also checks for a valid Hessian matrix, which
@@ -251,6 +265,18 @@ class MinuitMinimizer(LocalMinimizer):
     # Override the default _compute_covariance_matrix
     def _compute_covariance_matrix(self, best_fit_values):
 
+        if threeML_config['mle']['covariance method'] == 'minimizer':
+
+            # Reuse the covariance matrix estimated by MIGRAD, if it has one
+
+            try:
+
+                return np.array(self.minuit.matrix(correlation=False))
+
+            except RuntimeError:
+
+                pass
+
         self.minuit.hesse()
 
         try:
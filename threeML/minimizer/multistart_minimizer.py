@@ -0,0 +1,376 @@
+import collections
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from threeML.minimizer.minimization import GlobalMinimizer
+from threeML.minimizer.grid_minimizer import AllFitFailed
+from threeML.io.progress_bar import progress_bar
+from threeML.parallel.parallel_client import ParallelClient, is_parallel_computation_active
+from threeML.parallel.fork_pool import ForkPool
+
+
+_SUPPORTED_SAMPLINGS = ['latin', 'halton']
+
+
+def _latin_hypercube(n_points, n_dim, random_state):
+    """
+    Latin hypercube sampling of the unit cube: each axis is divided in n_points strata of equal size, and each
+    stratum is sampled exactly once
+
+    :param n_points: number of points
+    :param n_dim: number of dimensions
+    :param random_state: a numpy RandomState instance
+    :return: a (n_points, n_dim) array
+    """
+
+    strata = np.arange(n_points)[:, np.newaxis]
+
+    points = (strata + random_state.uniform(size=(n_points, n_dim))) / float(n_points)
+
+    # Pair the strata of the different axes at random
+
+    for j in range(n_dim):
+
+        points[:, j] = points[random_state.permutation(n_points), j]
+
+    return points
+
+
+def _get_primes(n):
+
+    primes = []
+
+    candidate = 2
+
+    while len(primes) < n:
+
+        if all(candidate % prime != 0 for prime in primes):
+
+            primes.append(candidate)
+
+        candidate += 1
+
+    return primes
+
+
+def _halton(n_points, n_dim, random_state):
+    """
+    Halton (quasi-random, low discrepancy) sampling of the unit cube, randomized with a random shift modulo 1 of
+    the whole sequence
+
+    :param n_points: number of points
+    :param n_dim: number of dimensions
+    :param random_state: a numpy RandomState instance
+    :return: a (n_points, n_dim) array
+    """
+
+    points = np.zeros((n_points, n_dim))
+
+    for j, base in enumerate(_get_primes(n_dim)):
+
+        # Radical inverse of the indexes 1, 2, ... in this base
+
+        indexes = np.arange(1, n_points + 1)
+
+        factor = 1.0 / base
+
+        while np.any(indexes > 0):
+
+            points[:, j] += factor * (indexes % base)
+
+            indexes //= base
+
+            factor /= base
+
+    return (points + random_state.uniform(size=n_dim)) % 1.0
+
+
+class MultiStartMinimizer(GlobalMinimizer):
+
+    valid_setup_keys = ('second_minimization', 'local_minimization', 'n_starts', 'sampling', 'processes',
+                        'tolerance', 'seed')
+
+    def __init__(self, function, parameters, verbosity=1, setup_dict=None):
+
+        self._2nd_minimization = None
+        self._local_minimization = None
+
+        self._sampling = 'latin'
+        self._processes = multiprocessing.cpu_count()
+        self._tolerance = 1e-3
+        self._seed = None
+
+        self._starting_points = None
+        self._minima = None
+
+        super(MultiStartMinimizer, self).__init__(function, parameters, verbosity, setup_dict)
+
+        # By default use 10 starting points per free parameter
+
+        self._n_starts = max(10 * self.Npar, 20)
+
+    def _setup(self, user_setup_dict):
+
+        if user_setup_dict is None:
+
+            return
+
+        assert 'second_minimization' in user_setup_dict, "You have to set up a second minimizer"
+
+        self._2nd_minimization = user_setup_dict['second_minimization']
+
+        # The local fits from each starting point are made with this minimizer (by default the same as the
+        # second minimization, but it is a good idea to use a cheaper setup here, for example a larger tolerance)
+
+        self._local_minimization = user_setup_dict.get('local_minimization', self._2nd_minimization)
+
+        if 'n_starts' in user_setup_dict:
+
+            self._n_starts = int(user_setup_dict['n_starts'])
+
+            assert self._n_starts > 0, "The number of starting points must be > 0"
+
+        if 'sampling' in user_setup_dict:
+
+            self._sampling = str(user_setup_dict['sampling']).lower()
+
+            assert self._sampling in _SUPPORTED_SAMPLINGS, "Supported samplings are %s" % \
+                                                           (",".join(_SUPPORTED_SAMPLINGS))
+
+        if 'processes' in user_setup_dict:
+
+            self._processes = int(user_setup_dict['processes'])
+
+            assert self._processes > 0, "The number of processes must be > 0"
+
+        if 'tolerance' in user_setup_dict:
+
+            self._tolerance = float(user_setup_dict['tolerance'])
+
+        if 'seed' in user_setup_dict:
+
+            self._seed = user_setup_dict['seed']
+
+    @property
+    def minima(self):
+        """
+        The distinct minima found during the last minimization, sorted from the best to the worst, with the number
+        of starting points which converged to each one of them
+
+        :return: a pandas DataFrame
+        """
+
+        return self._minima
+
+    def _get_starting_points(self):
+        """
+        Generate the starting points for the local fits, in the internal reference. Parameters with both bounds
+        are sampled uniformly within them, parameters with a prior (and not both bounds) are sampled from the prior.
+
+        :return: a (n_starts, n_parameters) array
+        """
+
+        random_state = np.random.RandomState(self._seed)
+
+        if self._sampling == 'latin':
+
+            unit_cube = _latin_hypercube(self._n_starts, self.Npar, random_state)
+
+        else:
+
+            unit_cube = _halton(self._n_starts, self.Npar, random_state)
+
+        starting_points = np.zeros_like(unit_cube)
+
+        for i, (par_name, (_, _, minimum, maximum)) in enumerate(self._internal_parameters.items()):
+
+            parameter = self.parameters[par_name]
+
+            if minimum is not None and maximum is not None:
+
+                starting_points[:, i] = minimum + unit_cube[:, i] * (maximum - minimum)
+
+            else:
+
+                assert parameter.has_prior(), "Parameter %s has no bounds and no prior. In order to use the " \
+                                              "multi-start minimizer you need to define either proper bounds or a " \
+                                              "prior for each free parameter" % par_name
+
+                values = np.array(map(parameter.prior.from_unit_cube, unit_cube[:, i]))
+
+                if parameter.has_transformation():
+
+                    values = np.array(map(parameter.transformation.forward, values))
+
+                starting_points[:, i] = values
+
+        return starting_points
+
+    def _fit_start(self, start_id):
+        """
+        Perform a local fit from one of the starting points
+
+        :param start_id: the index of the starting point
+        :return: (start_id, best fit values in the internal reference, minimum), or (start_id, None, None) if the
+        fit failed
+        """
+
+        for parameter, value in zip(self.parameters.values(), self._starting_points[start_id]):
+
+            parameter._set_internal_value(value)
+
+        # Get a new instance of the minimizer. This needs to happen after setting the starting point, because
+        # the minimizer uses the current values of the parameters as starting point
+
+        _minimizer = self._local_minimization.get_instance(self.function, self.parameters, verbosity=0)
+
+        try:
+
+            # We call _minimize() and not minimize() so that the best fit values are in the internal reference
+
+            best_fit_values, minimum = _minimizer._minimize()
+
+        except:
+
+            # A failure is not a problem here, only if all the fits fail then we have a problem
+
+            return start_id, None, None
+
+        return start_id, np.array(best_fit_values, float), float(minimum)
+
+    def _fit_starts(self):
+        """
+        Perform the local fits from all the starting points, using the parallel engines if parallel computation is
+        active, a local pool of processes if more than one process has been requested, or serially
+
+        :return: a list of (start_id, best fit values, minimum)
+        """
+
+        start_ids = range(self._n_starts)
+
+        results = []
+
+        with progress_bar(self._n_starts, title='Multi-start minimization') as progress:
+
+            if is_parallel_computation_active():
+
+                client = ParallelClient()
+
+                for result in client.execute_and_stream(self._fit_start, start_ids):
+
+                    results.append(result)
+
+                    progress.increase()
+
+            else:
+
+                # The processes inherit the minimizer (and the likelihood function with all the plugins), which is
+                # never serialized
+
+                with ForkPool(self._fit_start, min(self._processes, self._n_starts)) as pool:
+
+                    for result in pool.imap_unordered(start_ids):
+
+                        results.append(result)
+
+                        progress.increase()
+
+        return results
+
+    def _get_scales(self):
+
+        # The scale used to decide whether two minima are the same: the size of the allowed range, if the
+        # parameter has one, or the magnitude of the value otherwise
+
+        scales = []
+
+        for par_name, (value, _, minimum, maximum) in self._internal_parameters.items():
+
+            if minimum is not None and maximum is not None:
+
+                scales.append(maximum - minimum)
+
+            else:
+
+                scales.append(max(abs(value), 1.0))
+
+        return np.array(scales)
+
+    def _cluster_minima(self, results):
+        """
+        Group the results of the local fits which converged to the same minimum
+
+        :param results: list of (start_id, best fit values, minimum)
+        :return: a list of [minimum, best fit values, number of fits converged there], sorted by minimum
+        """
+
+        successful = sorted([(minimum, start_id, values) for start_id, values, minimum in results
+                             if values is not None and np.isfinite(minimum)])
+
+        scales = self._get_scales()
+
+        clusters = []
+
+        for minimum, _, values in successful:
+
+            for cluster in clusters:
+
+                if np.all(np.abs(values - cluster[1]) / scales < self._tolerance):
+
+                    cluster[2] += 1
+
+                    break
+
+            else:
+
+                clusters.append([minimum, values, 1])
+
+        return clusters
+
+    def _get_minima_frame(self, clusters):
+
+        data = collections.OrderedDict()
+
+        for par_name in self.parameters.keys():
+
+            data[par_name] = []
+
+        data['-log(likelihood)'] = []
+        data['n_starts'] = []
+
+        for minimum, values, n_starts in clusters:
+
+            for parameter, value in zip(self.parameters.values(), values):
+
+                parameter._set_internal_value(value)
+
+                data[parameter.path].append(parameter.value)
+
+            data['-log(likelihood)'].append(minimum)
+            data['n_starts'].append(n_starts)
+
+        return pd.DataFrame(data)
+
+    def _minimize(self):
+
+        if self._2nd_minimization is None:
+
+            raise RuntimeError("You did not setup this global minimizer (MULTISTART). You need to use the .setup() "
+                               "method")
+
+        self._starting_points = self._get_starting_points()
+
+        results = self._fit_starts()
+
+        clusters = self._cluster_minima(results)
+
+        if len(clusters) == 0:
+
+            raise AllFitFailed("All fits from the starting points have failed!")
+
+        self._minima = self._get_minima_frame(clusters)
+
+        best_minimum, best_fit_values, _ = clusters[0]
+
+        return best_fit_values, best_minimum
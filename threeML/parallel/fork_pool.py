@@ -0,0 +1,136 @@
+import itertools
+import multiprocessing
+import os
+
+from threeML.exceptions.custom_exceptions import custom_warnings
+
+
+# The functions executed by the pools which are open. They are set before the processes of a pool are forked, so the
+# processes inherit them and they never need to be serialized (they can be closures, or methods of objects holding
+# the model and the data)
+
+_functions = {}
+
+_pool_ids = itertools.count()
+
+
+def _call(pool_id_and_item):
+
+    pool_id, item = pool_id_and_item
+
+    return _functions[pool_id](item)
+
+
+def _get_fork_context():
+    """
+    :return: the multiprocessing context which forks the processes, or None if forking is not available
+    """
+
+    if not hasattr(os, 'fork'):
+
+        return None
+
+    try:
+
+        return multiprocessing.get_context('fork')
+
+    except AttributeError:
+
+        # Python 2 always forks on the systems which support it
+
+        return multiprocessing
+
+    except ValueError:
+
+        return None
+
+
+class ForkPool(object):
+
+    def __init__(self, function, processes):
+        """
+        A pool of processes, forked after function has been set, which compute function(item) for the items given to
+        map or imap_unordered. Only the items and the results are sent between the processes. If only one process is
+        requested, or if forking is not available on this system, the items are processed serially in this process.
+
+        :param function: the function to compute
+        :param processes: the number of processes
+        """
+
+        self._function = function
+
+        self._pool = None
+
+        self._pool_id = None
+
+        if processes <= 1:
+
+            return
+
+        context = _get_fork_context()
+
+        if context is None:
+
+            custom_warnings.warn("Forking processes is not supported on this system. Computing serially.")
+
+            return
+
+        self._pool_id = next(_pool_ids)
+
+        _functions[self._pool_id] = function
+
+        try:
+
+            self._pool = context.Pool(processes)
+
+        except:
+
+            _functions.pop(self._pool_id)
+
+            raise
+
+    @property
+    def is_parallel(self):
+
+        return self._pool is not None
+
+    def map(self, items):
+        """
+        :return: the list of function(item) for the items, in the same order
+        """
+
+        if self._pool is None:
+
+            return [self._function(item) for item in items]
+
+        return self._pool.map(_call, [(self._pool_id, item) for item in items])
+
+    def imap_unordered(self, items):
+        """
+        :return: an iterator over function(item) for the items, in the order in which they are completed
+        """
+
+        if self._pool is None:
+
+            return (self._function(item) for item in items)
+
+        return self._pool.imap_unordered(_call, ((self._pool_id, item) for item in items))
+
+    def close(self):
+
+        if self._pool is not None:
+
+            self._pool.close()
+            self._pool.join()
+
+            self._pool = None
+
+            _functions.pop(self._pool_id)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.close()
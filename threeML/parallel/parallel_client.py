@@ -271,6 +271,23 @@ if has_parallel:
             # Reorder the list according to the id
             return map(lambda x:x[1], sorted(results, key=lambda x:x[0]))
 
+        def execute_and_stream(self, worker, items, chunk_size=None):
+            """
+            Apply the worker to all items, yielding the results as soon as they become available (in no particular
+            order, so the worker should return enough information to identify the item)
+
+            :param worker: the function to be applied
+            :param items: the items to apply the function to
+            :param chunk_size: how many items an engine should process before reporting back (None for automatic)
+            :return: a generator over the results
+            """
+
+            amr = self._interactive_map(worker, items, ordered=False, chunk_size=chunk_size)
+
+            for res in amr:
+
+                yield res
+
 
 else:
 
@@ -108,6 +108,18 @@ class PluginPrototype(object):
 
         return 1.
 
+    def _get_profiled_stages(self):
+        """
+        Returns the stages of the computation of the likelihood which are timed separately by the LikelihoodProfiler,
+        as a list of (stage name, object, name of the attribute of the object to be timed). The stages must be listed
+        from the outermost to the innermost, i.e., each stage must be called within the previous one. Plugins can
+        override this, the default is to time only the likelihood as a whole.
+
+        :return: a list of tuples (stage name, object, attribute name)
+        """
+
+        return []
+
     def _get_tag(self):
 
         return self._tag
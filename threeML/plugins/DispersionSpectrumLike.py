@@ -72,6 +72,12 @@ class DispersionSpectrumLike(SpectrumLike):
 
         self._rsp.set_function(integral)
 
+    def _get_profiled_stages(self):
+
+        # Here the model is called by the response, through the integral function
+
+        return [('folding', self, 'get_model'), ('model evaluation', self._rsp, '_integral_function')]
+
     def _evaluate_model(self):
         """
         evaluates the full model over all channels
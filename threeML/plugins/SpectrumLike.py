@@ -1436,6 +1436,13 @@ class SpectrumLike(PluginPrototype):
 
         self._integral_flux = integral
 
+    def _get_profiled_stages(self):
+
+        # The folding (integration over the bins, masking, rebinning) happens in get_model, which calls the model
+        # through the integral function
+
+        return [('folding', self, 'get_model'), ('model evaluation', self, '_integral_flux')]
+
     def _evaluate_model(self):
         """
         Since there is no dispersion, we simply evaluate the model by integrating over the energy bins.
@@ -37,6 +37,10 @@ class UnresolvedExtendedXYLike(XYLike):
 
         self._source_name = source_name
 
+        if self._likelihood_model is not None:
+
+            self._setup_expectation()
+
     def set_model(self, likelihood_model_instance):
         """
         Set the model to be used in the joint minimization. Must be a LikelihoodModel instance.
@@ -58,47 +62,45 @@ class UnresolvedExtendedXYLike(XYLike):
 
         self._likelihood_model = likelihood_model_instance
 
-    def _get_total_expectation(self):
+        self._setup_expectation()
+
+    def _get_sources(self, likelihood_model):
+        """
+        Get the sources contributing to the expectation: all the point and extended sources of the model or, if this
+        plugin has been assigned to a source, only that one
+
+        :param likelihood_model: instance of astromodels.Model
+        :return: a tuple (list of point sources, list of extended sources)
+        """
 
         if self._source_name is None:
 
-            n_point_sources = self._likelihood_model.get_number_of_point_sources()
-            n_ext_sources = self._likelihood_model.get_number_of_extended_sources()
+            n_point_sources = likelihood_model.get_number_of_point_sources()
+            n_ext_sources = likelihood_model.get_number_of_extended_sources()
 
             assert n_point_sources + n_ext_sources > 0, "You need to have at least one source defined"
- 
-            # Make a function which will stack all point sources (XYLike do not support spatial dimension)
-
-            expectation_point = np.sum(map(lambda source: source(self._x, tag=self._tag),
-                                     self._likelihood_model.point_sources.values()),
-                                 axis=0)
-                                 
-            expectation_ext = np.sum(map(lambda source: source.get_spatially_integrated_flux(self._x),
-                                     self._likelihood_model.extended_sources.values()), axis=0)
-                                     
-            expectation = expectation_point + expectation_ext
+
+            # The extended sources are integrated over the sky (XYLike do not support spatial dimension)
+
+            return list(likelihood_model.point_sources.values()), list(likelihood_model.extended_sources.values())
 
         else:
 
             # This XYLike dataset refers to a specific source
 
-            # Note that we checked that self._source_name is in the model when the model was set
+            if self._source_name in likelihood_model.point_sources:
 
-            if self._source_name in self._likelihood_model.point_sources:
-            
-                expectation = self._likelihood_model.point_sources[self._source_name](self._x)
+                return [likelihood_model.point_sources[self._source_name]], []
 
-            elif self._source_name in self._likelihood_model.extended_sources:
-            
-                expectation = self._likelihood_model.extended_sources[self._source_name].get_spatially_integrated_flux(self._x)
+            elif self._source_name in likelihood_model.extended_sources:
+
+                return [], [likelihood_model.extended_sources[self._source_name]]
 
             else:
 
                 raise KeyError("This XYLike plugin has been assigned to source %s, "
                                "which is neither a point soure not an extended source in the current model" % self._source_name)
 
-        return expectation
-
     def plot(self, x_label='x', y_label='y', x_scale='linear', y_scale='linear'):
 
         fig, sub = plt.subplots(1,1)
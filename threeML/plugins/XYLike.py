@@ -12,6 +12,7 @@ from threeML.plugin_prototype import PluginPrototype
 from threeML.utils.statistics.likelihood_functions import half_chi2
 from threeML.utils.statistics.likelihood_functions import poisson_log_likelihood_ideal_bkg
 from threeML.exceptions.custom_exceptions import custom_warnings
+from threeML.config.config import threeML_config
 __instrument_name = "n.a."
 
 
@@ -83,6 +84,17 @@ class XYLike(PluginPrototype):
         # This is the name of the source this SED refers to (if it is a SED)
         self._source_name = source_name
 
+        # These are resolved when the model is set (see _setup_expectation)
+
+        self._point_sources = []
+        self._extended_sources = []
+        self._expectation_parameters = []
+
+        # Buffer for the expectation, and the values of the parameters (and the tag) used to compute it
+
+        self._expectation = None
+        self._expectation_key = None
+
     @classmethod
     def from_function(cls, name, function, x, yerr, **kwargs):
         """
@@ -241,6 +253,10 @@ class XYLike(PluginPrototype):
 
         self._source_name = source_name
 
+        if self._likelihood_model is not None:
+
+            self._setup_expectation()
+
     @property
     def x(self):
 
@@ -287,37 +303,133 @@ class XYLike(PluginPrototype):
 
         self._likelihood_model = likelihood_model_instance
 
-    def _get_total_expectation(self):
+        self._setup_expectation()
+
+    def _get_sources(self, likelihood_model):
+        """
+        Get the sources contributing to the expectation: all the point sources of the model or, if this plugin has
+        been assigned to a source, only that one
+
+        :param likelihood_model: instance of astromodels.Model
+        :return: a tuple (list of point sources, list of extended sources)
+        """
 
         if self._source_name is None:
 
-            n_point_sources = self._likelihood_model.get_number_of_point_sources()
+            n_point_sources = likelihood_model.get_number_of_point_sources()
 
             assert n_point_sources > 0, "You need to have at least one point source defined"
-            assert self._likelihood_model.get_number_of_extended_sources() == 0, "XYLike does not support extended sources"
+            assert likelihood_model.get_number_of_extended_sources() == 0, "XYLike does not support extended sources"
 
-            # Make a function which will stack all point sources (XYLike do not support spatial dimension)
+            # XYLike do not support spatial dimension, so the expectation is the sum of all point sources
 
-            expectation = np.sum(map(lambda source: source(self._x, tag=self._tag),
-                                     self._likelihood_model.point_sources.values()),
-                                 axis=0)
+            return list(likelihood_model.point_sources.values()), []
 
         else:
 
             # This XYLike dataset refers to a specific source
 
-            # Note that we checked that self._source_name is in the model when the model was set
+            if self._source_name in likelihood_model.point_sources:
 
-            if self._source_name in self._likelihood_model.point_sources:
-            
-                expectation = self._likelihood_model.point_sources[self._source_name](self._x)
+                return [likelihood_model.point_sources[self._source_name]], []
 
             else:
 
                 raise KeyError("This XYLike plugin has been assigned to source %s, "
                                "which is not a point soure in the current model" % self._source_name)
 
-        return expectation
+    def _setup_expectation(self):
+        """
+        Resolve the sources contributing to the expectation and the parameters it depends on, and allocate the
+        buffer for the expectation. This happens once, when the model is set or the plugin is assigned to a source,
+        so that the evaluation of the likelihood does not need to go through the model
+
+        :return: none
+        """
+
+        self._point_sources, self._extended_sources = self._get_sources(self._likelihood_model)
+
+        # The expectation depends on all the parameters of the spectral shapes (not only the free ones, since the
+        # fixed ones can be changed by the user, or linked to other parameters)
+
+        self._expectation_parameters = []
+
+        for source in self._point_sources + self._extended_sources:
+
+            for component in source.components.values():
+
+                self._collect_expectation_parameters(component.shape.parameters.values())
+
+        self._expectation = np.zeros(self._x.shape)
+
+        # Force the computation at the next evaluation
+
+        self._expectation_key = None
+
+    def _collect_expectation_parameters(self, parameters):
+        """
+        Add the parameters to the ones the expectation depends on. A parameter linked to an auxiliary variable depends
+        also on the variable and on the parameters of the law, which are added as well (its value alone is not
+        enough, because it is computed with the current value of the variable, which might not be the one of the tag)
+
+        :param parameters: list of parameters
+        :return: none
+        """
+
+        for parameter in parameters:
+
+            self._expectation_parameters.append(parameter)
+
+            if parameter.has_auxiliary_variable():
+
+                variable, law = parameter.auxiliary_variable
+
+                self._expectation_parameters.append(variable)
+
+                self._collect_expectation_parameters(law.parameters.values())
+
+    def _evaluate_expectation(self, expectation):
+        """
+        Compute the expectation as the sum of the contributions of the sources, in place
+
+        :param expectation: the array to fill (same shape as x)
+        :return: none
+        """
+
+        expectation[:] = 0.0
+
+        for source in self._point_sources:
+
+            expectation += source(self._x, tag=self._tag)
+
+        for source in self._extended_sources:
+
+            expectation += source.get_spatially_integrated_flux(self._x)
+
+    def _get_total_expectation(self):
+
+        if threeML_config['xylike']['debug']:
+
+            # Make sure that the sources are still those found when the model was set
+
+            point_sources, extended_sources = self._get_sources(self._likelihood_model)
+
+            assert map(id, point_sources + extended_sources) == \
+                   map(id, self._point_sources + self._extended_sources), \
+                "The sources in the likelihood model have changed after it has been set. Set the model again."
+
+        # If the parameters of the sources (and the tag) have not changed since the last evaluation, the expectation
+        # in the buffer is still valid
+
+        key = [self._tag] + [parameter.value for parameter in self._expectation_parameters]
+
+        if key != self._expectation_key:
+
+            self._evaluate_expectation(self._expectation)
+
+            self._expectation_key = key
+
+        return self._expectation
 
     def get_log_like(self):
         """
@@ -338,7 +450,9 @@ class XYLike(PluginPrototype):
             # Chi squared
             chi2_ = half_chi2(self._y, self._yerr, expectation)
 
-            assert np.all(np.isfinite(chi2_))
+            if threeML_config['xylike']['debug']:
+
+                assert np.all(np.isfinite(chi2_)), "The chi2 is not finite for some of the points"
 
             return np.sum(chi2_) * (-1)
 
@@ -435,7 +549,9 @@ class XYLike(PluginPrototype):
 
     def get_model(self):
 
-        return self._get_total_expectation()
+        # Return a copy, since the expectation is a buffer which is overwritten at the next evaluation
+
+        return np.array(self._get_total_expectation())
 
 
     def fit(self, function, minimizer='minuit', verbose=False):
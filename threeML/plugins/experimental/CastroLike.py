@@ -5,6 +5,7 @@ import numpy as np
 import scipy.integrate
 import scipy.interpolate
 import scipy.optimize
+import scipy.sparse
 
 import matplotlib.pyplot as plt
 
@@ -39,6 +40,15 @@ class IntervalContainer(object):
                                                                                        -likelihood_values,
                                                                                        k=1, ext=0)
 
+        # Keep also the coefficients of the interpolation (which is linear in each interval between two knots, and
+        # extrapolated linearly outside of them), so that many containers can be evaluated at once (see CastroLike)
+
+        self._knots = self._minus_likelihood_interp.get_knots()
+
+        self._knot_values = self._minus_likelihood_interp(self._knots)
+
+        self._slopes = np.diff(self._knot_values) / np.diff(self._knots)
+
         # Find maximum of loglike
         idx = likelihood_values.argmax()
 
@@ -73,6 +83,34 @@ class IntervalContainer(object):
     def n_integration_points(self):
         return self._n_integration_points
 
+    @property
+    def interpolation_coefficients(self):
+        """
+        The coefficients of the piecewise-linear interpolation of -log(likelihood) as a function of
+        log10(parameter value): in the interval between knots[i] and knots[i+1] the interpolation is
+        values[i] + slopes[i] * (x - knots[i]). The first and the last intervals are extended to infinity.
+
+        :return: (knots, values, slopes)
+        """
+
+        return self._knots, self._knot_values, self._slopes
+
+    def get_integration_grid(self):
+        """
+        The points used to integrate the model over the interval, and the Simpson's weights such that the average of
+        the model over the interval is np.sum(weights * model(points))
+
+        :return: (points, weights)
+        """
+
+        points = np.logspace(np.log10(self._start), np.log10(self._stop), self._n_integration_points)
+
+        # simps is linear in the integrand, so the weights are the integrals of the unit vectors
+
+        weights = scipy.integrate.simps(np.eye(self._n_integration_points), points, axis=1)
+
+        return points, weights / (self._stop - self._start)
+
     def __call__(self, parameter_value):
 
         return -self._minus_likelihood_interp(np.log10(parameter_value))
@@ -125,53 +163,129 @@ class CastroLike(PluginPrototype):
 
         self._interval_containers = sorted(interval_containers, key=lambda x:x.start)
 
-        # By default all containers are active
-        self._active_containers = self._interval_containers
-
         self._likelihood_model = None
 
-        self._all_xx, self._all_xx_split, self._splits = self._setup_x_values()
+        self._setup_arrays()
+
+        # By default all containers are active
+
+        self._set_active_mask(np.ones(len(self._interval_containers), bool))
 
         super(CastroLike, self).__init__(name, {})
 
-    def _setup_x_values(self):
+    def _setup_arrays(self):
+        """
+        Precompute, for all the containers, the integration points, the matrix of the Simpson's weights and the
+        coefficients of the interpolations of the likelihood curves, so that the likelihood can be computed with one
+        evaluation of the model, one (sparse) matrix product and one vectorized interpolation
+        """
+
+        n_containers = len(self._interval_containers)
 
-        # Create a list of all x values for each container
         xxs = []
-        splits = []
+        weights = []
+
+        # Row and column of each element of the weight matrix
+
+        rows = []
+        columns = []
 
-        # This will keep the total number of x values, so we can check for overlapping intervals
         total_n = 0
 
-        # Loop over the active containers and fill the list
-        for container in self._active_containers:
+        for i, container in enumerate(self._interval_containers):
 
-            xxs.append(np.logspace(np.log10(container.start),
-                                   np.log10(container.stop),
-                                   container.n_integration_points))
+            this_xx, this_weights = container.get_integration_grid()
 
-            total_n += container.n_integration_points
+            xxs.append(this_xx)
+            weights.append(this_weights)
 
-            splits.append(total_n)
+            rows.append(np.zeros(this_xx.shape[0], int) + i)
+            columns.append(np.arange(total_n, total_n + this_xx.shape[0]))
 
-        all_xx = np.concatenate(xxs)
+            total_n += this_xx.shape[0]
 
-        assert all_xx.shape[0] == total_n, "One or more containers are overlapping. This is not supported."
+        self._all_xx = np.concatenate(xxs)
 
-        return all_xx, np.split(all_xx, splits), splits
+        self._container_of_point = np.concatenate(rows)
 
-    def set_active_measurements(self, tmin, tmax):
+        self._all_weights = scipy.sparse.csr_matrix((np.concatenate(weights),
+                                                     (self._container_of_point, np.concatenate(columns))),
+                                                    shape=(n_containers, total_n))
+
+        # The interpolations have in general a different number of knots. Pad them to the same length, repeating
+        # the last knot (the padding is never used, see _interpolate)
+
+        n_knots = np.array([len(container.interpolation_coefficients[0]) for container in self._interval_containers])
 
-        self._active_containers = []
+        max_n_knots = n_knots.max()
 
-        for interval_container in self._interval_containers:
+        self._all_n_knots = n_knots
 
-            if interval_container.start >= tmin and interval_container.stop <= tmax:
+        self._all_knots = np.zeros((n_containers, max_n_knots))
+        self._all_knot_values = np.zeros((n_containers, max_n_knots))
+        self._all_slopes = np.zeros((n_containers, max_n_knots - 1))
 
-                self._active_containers.append(interval_container)
+        for i, container in enumerate(self._interval_containers):
 
-        # Reset the global xx
-        self._all_xx, self._all_xx_split, self._splits = self._setup_x_values()
+            knots, values, slopes = container.interpolation_coefficients
+
+            self._all_knots[i, :n_knots[i]] = knots
+            self._all_knots[i, n_knots[i]:] = knots[-1]
+
+            self._all_knot_values[i, :n_knots[i]] = values
+            self._all_slopes[i, :n_knots[i] - 1] = slopes
+
+    def _set_active_mask(self, active_mask):
+
+        self._active_mask = np.array(active_mask, bool)
+
+        self._active_containers = [container for container, active in zip(self._interval_containers,
+                                                                          self._active_mask) if active]
+
+        # Just reslice the precomputed arrays
+
+        active_points = self._active_mask[self._container_of_point]
+
+        self._xx = self._all_xx[active_points]
+
+        self._weights = self._all_weights[self._active_mask][:, active_points]
+
+        self._n_knots = self._all_n_knots[self._active_mask]
+        self._knots = self._all_knots[self._active_mask]
+        self._knot_values = self._all_knot_values[self._active_mask]
+        self._slopes = self._all_slopes[self._active_mask]
+
+    def _interpolate(self, parameter_values):
+        """
+        Evaluate at once the interpolated likelihood curves of all the active containers, each one at its own
+        parameter value
+
+        :param parameter_values: an array with one value per active container
+        :return: the log-likelihood for each active container
+        """
+
+        log_values = np.log10(parameter_values)
+
+        # Find the interval between knots containing each value (the first or the last one if the value is
+        # outside the knots, so that the interpolation is extrapolated linearly)
+
+        idx = np.sum(self._knots[:, 1:] <= log_values[:, np.newaxis], axis=1)
+
+        idx = np.clip(idx, 0, self._n_knots - 2)
+
+        rows = np.arange(idx.shape[0])
+
+        minus_log_like = self._knot_values[rows, idx] + self._slopes[rows, idx] * (log_values -
+                                                                                   self._knots[rows, idx])
+
+        return -minus_log_like
+
+    def set_active_measurements(self, tmin, tmax):
+
+        starts = np.array([container.start for container in self._interval_containers])
+        stops = np.array([container.stop for container in self._interval_containers])
+
+        self._set_active_mask((starts >= tmin) & (stops <= tmax))
 
         return len(self._active_containers)
 
@@ -200,33 +314,18 @@ class CastroLike(PluginPrototype):
         parameters
         """
 
-        log_l = 0.0
-
-        # Evaluate once for all
-        all_yy = np.split(self._likelihood_model.get_total_flux(self._all_xx), self._splits)
+        if len(self._active_containers) == 0:
 
-        for i, interval_container in enumerate(self._active_containers):
+            return 0.0
 
-            # Get integral of model between start and stop for this interval
-            # xx = np.logspace(np.log10(interval_container.start),
-            #                  np.log10(interval_container.stop),
-            #                  interval_container.n_integration_points)
-            #
-            # yy = self._likelihood_model.get_total_flux(xx)
-            #
-            # assert np.allclose(yy, all_yy[i])
-            xx = self._all_xx_split[i]
-            yy = all_yy[i]
-
-            length = interval_container.stop - interval_container.start
-
-            expected_flux = scipy.integrate.simps(yy, xx) / length
+        # Evaluate once for all
+        all_yy = self._likelihood_model.get_total_flux(self._xx)
 
-            this_log_l = interval_container(expected_flux)
+        # Average of the model over each active interval
 
-            log_l += this_log_l
+        expected_fluxes = self._weights.dot(all_yy)
 
-        return log_l
+        return np.sum(self._interpolate(expected_fluxes))
 
 
     def inner_fit(self):
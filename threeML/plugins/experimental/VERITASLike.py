@@ -98,6 +98,18 @@ class VERITASRun(object):
         # Now use the effective area provided in the file to renormalize the migration matrix appropriately
         self._renorm_hMigration()
 
+        # Precompute the quadrature nodes and weights for all the Monte Carlo energy bins, as well as the simulated
+        # spectrum, so that the folding needs only one evaluation of the model
+
+        mc_e1 = 10 ** self._log_mc_energies[:-1]
+        mc_e2 = 10 ** self._log_mc_energies[1:]
+
+        self._quadrature_nodes, self._quadrature_weights = self._get_quadrature(mc_e1, mc_e2)
+
+        self._sim_spectrum_c = self._simulated_spectrum(self._mc_energies_c)
+
+        self._sim_spectrum_integral = self._simulated_spectrum_f(mc_e1, mc_e2) / self._dE  # 1 / keV cm2 s
+
         # Exposure is tOn*(1-tDeadtimeFrac)
         self._exposure = float(1 - self._tRunSummary['DeadTimeFracOn']) * float(self._tRunSummary['tOn'])
 
@@ -191,6 +203,42 @@ class VERITASRun(object):
 
         return self._hMigration
 
+    @property
+    def exposure(self):
+
+        return self._exposure
+
+    @property
+    def counts(self):
+
+        return self._counts
+
+    @property
+    def background_counts(self):
+
+        return self._bkg_counts
+
+    @property
+    def background_renormalization(self):
+
+        return self._bkg_renorm
+
+    @property
+    def active_channels(self):
+        """
+        :return: a slice selecting the channels used in the likelihood
+        """
+
+        return slice(self._first_chan, self._last_chan + 1)
+
+    @property
+    def binning_key(self):
+        """
+        :return: a key which is the same for runs with the same binning in reconstructed and Monte Carlo energy
+        """
+
+        return self._log_recon_energies.tobytes(), self._log_mc_energies.tobytes()
+
     @property
     def total_counts(self):
 
@@ -262,50 +310,72 @@ class VERITASRun(object):
         return integral_f(e2) - integral_f(e1)
 
     @staticmethod
-    def _integrate(function, e1, e2):
+    def _get_quadrature(e1, e2, n_points=30):
+        """
+        Nodes and weights of Simpson's rule on n_points equally-spaced points within each of the intervals e1 - e2
+        (the same as scipy.integrate.simps on np.linspace(e1, e2, n_points)), so that the integrals over all the
+        intervals are np.sum(function(nodes) * weights, axis=1)
 
-        integrals = []
+        :return: (nodes, weights), both (n_intervals, n_points) arrays
+        """
 
-        for ee1, ee2 in zip(e1,e2):
+        # simps is linear, so the weights for a unit step are the integrals of the unit vectors
 
-            grid = np.linspace(ee1, ee2, 30)
+        unit_weights = scipy.integrate.simps(np.eye(n_points), dx=1.0, axis=1)
 
-            integrals.append(scipy.integrate.simps(function(grid), grid))
+        steps = (e2 - e1) / (n_points - 1.0)
 
-        # integrals = map(lambda x:scipy.integrate.quad(function, x[0], x[1], epsrel=1e-2)[0], zip(e1, e2))
+        nodes = e1[:, np.newaxis] + steps[:, np.newaxis] * np.arange(n_points)
 
-        return np.array(integrals)
+        weights = steps[:, np.newaxis] * unit_weights
 
-    def get_log_like(self, like_model, fast=True):
+        return nodes, weights
 
-        # Reweight the response matrix
-        diff_flux, integral = self._get_diff_flux_and_integral(like_model)
+    @staticmethod
+    def _integrate(function, e1, e2):
+
+        nodes, weights = VERITASRun._get_quadrature(e1, e2)
+
+        return np.einsum('ij,ij->i', function(nodes.flatten()).reshape(nodes.shape), weights)
 
-        e1 = 10**self._log_mc_energies[:-1]
-        e2 = 10**self._log_mc_energies[1:]
+    def get_weight(self, like_model, fast=True):
+        """
+        Return the ratio between the spectrum of the model and the simulated spectrum in each Monte Carlo energy bin,
+        i.e., the weight to be applied to the migration matrix
 
-        dE = (e2 - e1)
+        :param like_model: the likelihood model
+        :param fast: if True, use the value of the spectra at the center of the bins, otherwise their average over
+        the bins
+        :return: an array with one element per Monte Carlo energy bin
+        """
+
+        diff_flux, integral = self._get_diff_flux_and_integral(like_model)
 
         if not fast:
 
-            this_spectrum = self._integrate(diff_flux, e1, e2) / dE  # 1 / keV cm2 s
+            # One evaluation of the model on the quadrature nodes of all the bins
+
+            fluxes = diff_flux(self._quadrature_nodes.flatten()).reshape(self._quadrature_nodes.shape)
 
-            sim_spectrum = self._simulated_spectrum_f(e1, e2) / dE # 1 / keV cm2 s
+            this_spectrum = np.einsum('ij,ij->i', fluxes, self._quadrature_weights) / self._dE  # 1 / keV cm2 s
+
+            sim_spectrum = self._sim_spectrum_integral
 
         else:
+
             this_spectrum = diff_flux(self._mc_energies_c)
 
-            sim_spectrum = self._simulated_spectrum(self._mc_energies_c)
+            sim_spectrum = self._sim_spectrum_c
 
-        weight = this_spectrum / sim_spectrum  # type: np.ndarray
+        return this_spectrum / sim_spectrum  # type: np.ndarray
 
-        # print("Sum of weight: %s" % np.sum(weight))
+    def get_log_like(self, like_model, fast=True):
 
-        n_pred = np.zeros(self._n_chan)
+        # Reweight the response matrix
 
-        for i in range(n_pred.shape[0]):
+        weight = self.get_weight(like_model, fast)
 
-            n_pred[i] = np.sum(self._hMigration[i, :] * weight) * self._exposure
+        n_pred = self._hMigration.dot(weight) * self._exposure
 
         log_like, _ = poisson_observed_poisson_background(self._counts, self._bkg_counts, self._bkg_renorm,
                                                           n_pred)
@@ -324,6 +394,49 @@ class VERITASRun(object):
 
 
 
+class VERITASRunStack(object):
+
+    def __init__(self, runs):
+        """
+        A group of runs with the same binning in reconstructed and Monte Carlo energy. Their migration matrices
+        (multiplied by the exposure) are stacked in one (n_runs, n_channels, n_mc_energies) tensor, so that the
+        predicted counts for all the runs are computed with one evaluation of the model and one einsum.
+
+        :param runs: a list of VERITASRun instances with the same binning_key
+        """
+
+        self._runs = list(runs)
+
+        assert len(set(run.binning_key for run in self._runs)) == 1, "All runs in a stack must have the same binning"
+
+        self._stacked_migration = np.array([run.migration_matrix * run.exposure for run in self._runs])
+
+        self._counts = np.array([run.counts for run in self._runs])
+
+        self._bkg_counts = np.array([run.background_counts for run in self._runs])
+
+        self._bkg_renorm = np.array([run.background_renormalization for run in self._runs])[:, np.newaxis]
+
+        self._active_channels = self._runs[0].active_channels
+
+    @property
+    def runs(self):
+
+        return self._runs
+
+    def get_log_like(self, like_model, fast=True):
+
+        # The weight depends only on the Monte Carlo energies, which are the same for all runs
+
+        weight = self._runs[0].get_weight(like_model, fast)
+
+        n_pred = np.einsum('rcm,m->rc', self._stacked_migration, weight)
+
+        log_like, _ = poisson_observed_poisson_background(self._counts, self._bkg_counts, self._bkg_renorm, n_pred)
+
+        return np.sum(log_like[:, self._active_channels])
+
+
 class VERITASLike(PluginPrototype):
 
     def __init__(self, name, veritas_root_data):
@@ -372,6 +485,16 @@ class VERITASLike(PluginPrototype):
                 # self._runs_like[run_name].set_active_measurements("c50-c130")
                 self._runs_like[run_name] = this_run
 
+        # Group the runs with the same binning, so that each group can be folded at once
+
+        groups = collections.OrderedDict()
+
+        for run in self._runs_like.values():
+
+            groups.setdefault(run.binning_key, []).append(run)
+
+        self._run_stacks = [VERITASRunStack(runs) for runs in groups.values()]
+
         super(VERITASLike, self).__init__(name, {})
 
     def rebin_on_background(self, *args, **kwargs):
@@ -404,12 +527,12 @@ class VERITASLike(PluginPrototype):
         parameters
         """
 
-        # Collect the likelihood from each run
+        # Collect the likelihood from each group of runs with the same binning
         total = 0
 
-        for run in self._runs_like.values():
+        for run_stack in self._run_stacks:
 
-            total += run.get_log_like(self._likelihood_model)[0]
+            total += run_stack.get_log_like(self._likelihood_model)
 
         return total
 
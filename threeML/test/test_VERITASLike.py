@@ -0,0 +1,125 @@
+import pytest
+import numpy as np
+import scipy.integrate
+
+
+try:
+
+    import ROOT
+
+except:
+
+    has_root = False
+
+else:
+
+    has_root = True
+
+skip_if_ROOT_is_not_available = pytest.mark.skipif(not has_root, reason="No ROOT available")
+
+
+class _PowerLawModel(object):
+    """
+    The minimal interface of a likelihood model used by VERITASRun.get_weight
+    """
+
+    @staticmethod
+    def get_number_of_point_sources():
+
+        return 1
+
+    @staticmethod
+    def get_point_source_fluxes(id, energies):
+
+        return 1e-3 * (energies / 1e9) ** -2.2
+
+
+def _get_synthetic_run(log_recon_energies, log_mc_energies, exposure, seed):
+    """
+    Build a VERITASRun from synthetic arrays, without reading a ROOT file
+    """
+
+    from threeML.plugins.experimental.VERITASLike import VERITASRun
+
+    random_state = np.random.RandomState(seed)
+
+    n_channels = log_recon_energies.shape[0] - 1
+
+    run = VERITASRun.__new__(VERITASRun)
+
+    run._run_name = "run_%i" % seed
+    run._log_recon_energies = log_recon_energies
+    run._log_mc_energies = log_mc_energies
+    run._mc_energies_c = 10 ** ((log_mc_energies[:-1] + log_mc_energies[1:]) / 2.0)
+    run._sim_spectrum_c = VERITASRun._simulated_spectrum(run._mc_energies_c)
+    run._hMigration = random_state.uniform(0, 1e7, size=(n_channels, log_mc_energies.shape[0] - 1))
+    run._exposure = exposure
+    run._counts = random_state.poisson(50, size=n_channels).astype(float)
+    run._bkg_counts = random_state.poisson(200, size=n_channels).astype(float)
+    run._bkg_renorm = random_state.uniform(0.1, 0.3)
+    run._first_chan = 2
+    run._last_chan = n_channels - 3
+
+    return run
+
+
+@skip_if_ROOT_is_not_available
+def test_quadrature():
+
+    from threeML.plugins.experimental.VERITASLike import VERITASRun
+
+    e1 = np.logspace(8, 10, 20)[:-1]
+    e2 = np.logspace(8, 10, 20)[1:]
+
+    nodes, weights = VERITASRun._get_quadrature(e1, e2)
+
+    assert nodes.shape == weights.shape == (e1.shape[0], 30)
+
+    function = lambda x: x ** -2.45
+
+    expected = np.array([scipy.integrate.simps(function(np.linspace(a, b, 30)), np.linspace(a, b, 30))
+                         for a, b in zip(e1, e2)])
+
+    assert np.allclose(np.sum(function(nodes) * weights, axis=1), expected, rtol=1e-10)
+
+    assert np.allclose(VERITASRun._integrate(function, e1, e2), expected, rtol=1e-10)
+
+
+@skip_if_ROOT_is_not_available
+def test_run_stack():
+
+    from threeML.plugins.experimental.VERITASLike import VERITASRunStack
+
+    log_recon_energies = np.linspace(8, 10.5, 21)
+    log_mc_energies = np.linspace(7.5, 11, 41)
+
+    runs = [_get_synthetic_run(log_recon_energies, log_mc_energies, exposure, seed)
+            for seed, exposure in enumerate([1200.0, 1750.0, 900.0])]
+
+    stack = VERITASRunStack(runs)
+
+    model = _PowerLawModel()
+
+    # The stacked einsum gives the same predicted counts as the migration matrix of each run
+
+    weight = runs[0].get_weight(model)
+
+    n_pred = np.einsum('rcm,m->rc', stack._stacked_migration, weight)
+
+    for i, run in enumerate(runs):
+
+        assert np.allclose(n_pred[i], run.migration_matrix.dot(weight) * run.exposure, rtol=1e-12)
+
+    # and then the same likelihood
+
+    expected = sum(run.get_log_like(model)[0] for run in runs)
+
+    assert np.isclose(stack.get_log_like(model), expected, rtol=1e-12)
+
+    # Runs with a different binning cannot be stacked
+
+    other_run = _get_synthetic_run(log_recon_energies, np.linspace(7.5, 11, 31), 1000.0, 10)
+
+    with pytest.raises(AssertionError):
+
+        _ = VERITASRunStack(runs + [other_run])
@@ -1,5 +1,7 @@
 from threeML import *
 from threeML.plugins.XYLike import XYLike
+from threeML.config.config import threeML_config
+import pytest
 
 
 def get_signal():
@@ -160,6 +162,113 @@ def test_XYLike_assign_to_source():
     assert log_like_before != log_like_after
 
 
+def test_XYLike_expectation_cache():
+
+    yerr = np.array(gauss_sigma)
+    y = np.array(gauss_signal)
+
+    xy = XYLike("test", x, y, yerr)
+
+    fitfun = Line() + Gaussian()
+    fitfun2 = Line()
+
+    pts1 = PointSource("pts1", ra=0.0, dec=0.0, spectral_shape=fitfun)
+    pts2 = PointSource("pts2", ra=2.5, dec=3.2, spectral_shape=fitfun2)
+
+    fitfun2.b.fix = True
+
+    model = Model(pts1, pts2)
+
+    xy.set_model(model)
+
+    assert np.allclose(xy.get_model(), fitfun(x) + fitfun2(x))
+
+    # With the same parameters the cached expectation is used
+
+    log_like = xy.get_log_like()
+
+    assert xy._expectation_key is not None
+
+    assert xy.get_log_like() == log_like
+
+    # Changing a free or a fixed parameter changes the expectation
+
+    fitfun.F_2 = 60.0
+
+    assert xy.get_log_like() != log_like
+
+    assert np.allclose(xy.get_model(), fitfun(x) + fitfun2(x))
+
+    fitfun2.b = 12.0
+
+    assert np.allclose(xy.get_model(), fitfun(x) + fitfun2(x))
+
+    # get_model returns a copy of the buffer
+
+    expectation = xy.get_model()
+
+    fitfun.F_2 = 30.0
+
+    assert not np.allclose(xy.get_model(), expectation)
+
+    # Assigning the plugin to a source changes the sources used
+
+    xy.assign_to_source("pts2")
+
+    assert np.allclose(xy.get_model(), fitfun2(x))
+
+    # In debug mode changes in the model after it has been set are detected
+
+    xy.assign_to_source(None)
+
+    model.remove_source("pts2")
+
+    threeML_config['xylike']['debug'] = True
+
+    try:
+
+        with pytest.raises(AssertionError):
+
+            xy.get_log_like()
+
+        xy.set_model(model)
+
+        assert np.allclose(xy.get_model(), fitfun(x))
+
+    finally:
+
+        threeML_config['xylike']['debug'] = False
+
+    # A parameter linked to an independent variable depends on the parameters of the law, even when the variable is
+    # not at the value of the tag (for example because it has been changed by another plugin)
+
+    xy = XYLike("test", x, y, yerr)
+
+    line = Line()
+
+    time = IndependentVariable("time", 1.0, u.s)
+
+    model = Model(PointSource("pts", ra=0.0, dec=0.0, spectral_shape=line))
+
+    model.add_independent_variable(time)
+
+    law = Powerlaw()
+
+    model.link(line.b, time, law)
+
+    xy.tag = (time, 5.0)
+
+    xy.set_model(model)
+
+    log_like = xy.get_log_like()
+
+    time.value = 1.0
+
+    law.index = -1.0
+
+    assert xy.get_log_like() != log_like
+
+
 def test_XYLike_dataframe():
 
 
@@ -246,3 +246,39 @@ def test_one_free_parameter_input_output():
 
 
 
+
+
+def test_mle_samples_within_bounds():
+
+    spectrum = Powerlaw()
+    source = PointSource("tst", ra=100, dec=20, spectral_shape=spectrum)
+    model = Model(source)
+
+    spectrum.index = -2.0
+    spectrum.index.bounds = (-2.1, -1.5)
+    spectrum.K.fix = True
+
+    # The boundary is at 1 sigma from the best fit value, so many samples have to be replaced
+
+    cov_matrix = np.diag([0.01])
+
+    with pytest.warns(UserWarning):
+
+        ar = MLEResults(model, cov_matrix, {}, n_samples=1000)
+
+    assert ar.samples.shape == (1, 1000)
+    assert np.all(ar.samples >= -2.1)
+    assert np.all(ar.samples <= -1.5)
+
+    # With lazy=True the samples are generated only when needed
+
+    ar = MLEResults(model, cov_matrix, {}, n_samples=1000, lazy=True)
+
+    assert ar._stored_samples_transposed is None
+
+    ar.display()
+
+    assert ar._stored_samples_transposed is None
+
+    assert ar.samples.shape == (1, 1000)
+    assert ar._stored_samples_transposed is not None
@@ -12,6 +12,33 @@ def test_basic_analsis_results(fitted_joint_likelihood_bn090217206_nai):
     assert np.allclose(fit_results['value'], expected, rtol=0.1)
 
 
+def test_basic_analysis_lazy_fit(joint_likelihood_bn090217206_nai):
+
+    jl = joint_likelihood_bn090217206_nai
+
+    fit_results, like_frame = jl.fit(lazy=True)
+
+    # The errors of a lazy fit come from the covariance matrix
+
+    assert np.allclose(fit_results['value'], [2.531028, -1.1831566000728451], rtol=0.1)
+
+    covariance_frame = jl.results.get_covariance_data_frame()
+
+    for column in ['value', 'negative_error', 'positive_error']:
+
+        assert np.allclose(fit_results[column], covariance_frame[column])
+
+    assert np.all(fit_results['positive_error'] > 0)
+
+    # The samples are generated when they are needed, and give similar errors
+
+    samples_frame = jl.results.get_data_frame()
+
+    assert jl.results.samples.shape == (2, 5000)
+
+    assert np.allclose(samples_frame['positive_error'], fit_results['positive_error'], rtol=0.2)
+
+
 def test_basic_analysis_get_errors(fitted_joint_likelihood_bn090217206_nai):
 
     jl, fit_results, like_frame = fitted_joint_likelihood_bn090217206_nai
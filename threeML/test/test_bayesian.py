@@ -1,4 +1,4 @@
-from threeML import BayesianAnalysis, Uniform_prior, Log_uniform_prior
+from threeML import BayesianAnalysis, Uniform_prior, Log_uniform_prior, threeML_config
 import numpy as np
 import pytest
 
@@ -57,6 +57,252 @@ def test_emcee():
     pass
 
 
+def test_emcee_local_pool(fitted_joint_likelihood_bn090217206_nai):
+
+    jl, _, _ = fitted_joint_likelihood_bn090217206_nai
+
+    jl.restore_best_fit()
+
+    set_priors(jl.likelihood_model)
+
+    bayes = BayesianAnalysis(jl.likelihood_model, jl.data_list)
+
+    # The starting points are generated with the numpy random generator, while the seed is used for the sampler
+
+    np.random.seed(1234)
+
+    _ = bayes.sample(n_walkers=20, burn_in=10, n_samples=20, quiet=True, seed=1234)
+
+    raw_samples_serial = bayes.raw_samples
+
+    log_like_serial = bayes.log_like_values
+
+    # The log-likelihood values (stored as blobs while sampling) must correspond to the samples
+
+    for i in [0, 57, raw_samples_serial.shape[0] - 1]:
+
+        assert np.isclose(log_like_serial[i], bayes._get_log_like_at(raw_samples_serial[i]))
+
+    assert np.allclose(log_like_serial + map(bayes._log_prior, raw_samples_serial), bayes.log_probability_values)
+
+    # With the same seed, sampling with a pool of processes must give exactly the same results
+
+    jl.restore_best_fit()
+
+    np.random.seed(1234)
+
+    _ = bayes.sample(n_walkers=20, burn_in=10, n_samples=20, quiet=True, seed=1234, processes=2)
+
+    assert np.all(bayes.raw_samples == raw_samples_serial)
+
+    assert np.all(bayes.log_like_values == log_like_serial)
+
+    # The vectorized prior must agree with the scalar one
+
+    assert np.allclose(bayes._log_prior_vectorized(raw_samples_serial[:10]),
+                       map(bayes._log_prior, raw_samples_serial[:10]))
+
+    assert bayes._log_prior_vectorized([[1e6, -1.0]])[0] == -np.inf
+
+
+def _get_bayesian_analysis(jl):
+
+    jl.restore_best_fit()
+
+    set_priors(jl.likelihood_model)
+
+    return BayesianAnalysis(jl.likelihood_model, jl.data_list)
+
+
+def test_emcee_chain_storage(fitted_joint_likelihood_bn090217206_nai, tmpdir):
+
+    jl, _, _ = fitted_joint_likelihood_bn090217206_nai
+
+    n_walkers, burn_in, n_samples = 10, 5, 12
+
+    bayes = _get_bayesian_analysis(jl)
+
+    np.random.seed(1234)
+
+    _ = bayes.sample(n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples, quiet=True, seed=1234)
+
+    samples_in_memory = bayes.raw_samples
+
+    log_like_in_memory = bayes.log_like_values
+
+    # Now store the chain on disk
+
+    chain_file = str(tmpdir.join("chain.h5"))
+
+    bayes = _get_bayesian_analysis(jl)
+
+    np.random.seed(1234)
+
+    _ = bayes.sample(n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples, quiet=True, seed=1234,
+                     chain_file=chain_file, checkpoint_every=5)
+
+    # The chain on disk is ordered by (step, walker), the one in memory by (walker, step)
+
+    def reorder(array):
+
+        return np.swapaxes(np.array(array).reshape((n_samples, n_walkers, -1)), 0, 1).reshape((n_samples * n_walkers,
+                                                                                               -1))
+
+    assert np.all(reorder(bayes.raw_samples) == samples_in_memory)
+
+    assert np.all(reorder(bayes.log_like_values)[:, 0] == log_like_in_memory)
+
+    # The results read the samples from disk
+
+    assert bayes.results._samples_transposed.filename == chain_file
+
+    assert np.allclose(np.array(bayes.results.samples), samples_in_memory.T[:, np.argsort(reorder(
+        np.arange(n_samples * n_walkers))[:, 0])])
+
+    _ = bayes.results.get_data_frame()
+
+    bayes.results.write_to(str(tmpdir.join("results.fits")))
+
+    # The file exists, so without resume we refuse to overwrite it
+
+    with pytest.raises(IOError):
+
+        _ = bayes.sample(n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples, quiet=True,
+                         chain_file=chain_file)
+
+    # Thinning
+
+    bayes = _get_bayesian_analysis(jl)
+
+    _ = bayes.sample(n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples, quiet=True, seed=1234,
+                     chain_file=str(tmpdir.join("thinned_chain.h5")), thin=3)
+
+    assert bayes.raw_samples.shape == (n_samples // 3 * n_walkers, 2)
+
+
+def test_emcee_resume(fitted_joint_likelihood_bn090217206_nai, tmpdir):
+
+    jl, _, _ = fitted_joint_likelihood_bn090217206_nai
+
+    n_walkers, burn_in, n_samples = 10, 6, 12
+
+    bayes = _get_bayesian_analysis(jl)
+
+    np.random.seed(1234)
+
+    _ = bayes.sample(n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples, quiet=True, seed=1234,
+                     chain_file=str(tmpdir.join("reference.h5")))
+
+    reference_samples = np.array(bayes.raw_samples)
+
+    # Now simulate a job which is killed during the sampling
+
+    chain_file = str(tmpdir.join("chain.h5"))
+
+    bayes = _get_bayesian_analysis(jl)
+
+    dataset = jl.data_list.values()[0]
+
+    n_calls = [0]
+
+    def killed_get_log_like():
+
+        n_calls[0] += 1
+
+        if n_calls[0] > n_walkers * (burn_in + 8):
+
+            raise KeyboardInterrupt()
+
+        return type(dataset).get_log_like(dataset)
+
+    dataset.get_log_like = killed_get_log_like
+
+    np.random.seed(1234)
+
+    try:
+
+        with pytest.raises(KeyboardInterrupt):
+
+            _ = bayes.sample(n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples, quiet=True, seed=1234,
+                             chain_file=chain_file, checkpoint_every=4)
+
+    finally:
+
+        del dataset.get_log_like
+
+    # Resume, the result must be the same as if the sampling had never been interrupted
+
+    bayes = _get_bayesian_analysis(jl)
+
+    _ = bayes.sample(n_walkers=n_walkers, burn_in=burn_in, n_samples=n_samples, quiet=True,
+                     chain_file=chain_file, checkpoint_every=4, resume=True)
+
+    assert np.all(np.array(bayes.raw_samples) == reference_samples)
+
+
+def test_emcee_adaptive(fitted_joint_likelihood_bn090217206_nai, capsys):
+
+    jl, _, _ = fitted_joint_likelihood_bn090217206_nai
+
+    n_walkers = 10
+
+    # A normal run provides the diagnostics as well
+
+    bayes = _get_bayesian_analysis(jl)
+
+    _ = bayes.sample(n_walkers=n_walkers, burn_in=5, n_samples=50, quiet=True, seed=1234)
+
+    diagnostics = bayes.results.convergence_diagnostics
+
+    assert list(diagnostics.index) == bayes.results.optimized_model.free_parameters.keys()
+
+    assert np.allclose(diagnostics['effective sample size'],
+                       n_walkers * 50 / diagnostics['autocorrelation time'])
+
+    old_interval = threeML_config['bayesian']['convergence check interval']
+
+    try:
+
+        threeML_config['bayesian']['convergence check interval'] = 20
+
+        bayes = _get_bayesian_analysis(jl)
+
+        _ = bayes.sample(n_walkers=n_walkers, burn_in=1000, n_samples=2000, quiet=True, seed=1234, target_ess=200)
+
+        # Nothing is printed about the convergence in quiet mode
+
+        assert "converged" not in capsys.readouterr()[0]
+
+        n_steps = bayes.raw_samples.shape[0] // n_walkers
+
+        assert n_steps < 2000
+
+        assert n_steps % 20 == 0
+
+        diagnostics = bayes.results.convergence_diagnostics
+
+        assert np.all(diagnostics['effective sample size'] >= 200)
+
+        assert np.all(diagnostics['gelman-rubin'] < threeML_config['bayesian']['gelman-rubin threshold'])
+
+        # With a too small budget the sampling stops anyway
+
+        bayes = _get_bayesian_analysis(jl)
+
+        _ = bayes.sample(n_walkers=n_walkers, burn_in=10, n_samples=30, quiet=True, seed=1234, target_ess=1e6)
+
+        assert bayes.raw_samples.shape[0] == 30 * n_walkers
+
+    finally:
+
+        threeML_config['bayesian']['convergence check interval'] = old_interval
+
+    with pytest.raises(AssertionError):
+
+        _ = bayes.sample(n_walkers=n_walkers, burn_in=10, n_samples=30, quiet=True, target_ess=100,
+                         chain_file="chain.h5")
+
+
 def test_multinest(completed_bn090217206_bayesian_analysis):
 
     bayes, _ = completed_bn090217206_bayesian_analysis
@@ -0,0 +1,83 @@
+import numpy as np
+import scipy.integrate
+from astromodels import Model, PointSource, Powerlaw
+
+from threeML.plugins.experimental.CastroLike import CastroLike, IntervalContainer
+
+
+def _get_containers(n_containers=20):
+
+    random_state = np.random.RandomState(1234)
+
+    edges = np.logspace(0, 3, n_containers + 1)
+
+    containers = []
+
+    for start, stop in zip(edges[:-1], edges[1:]):
+
+        # A parabolic likelihood curve in log10(flux), sampled on a grid with a random number of points
+
+        best_log_flux = np.log10(0.3 * ((start + stop) / 2.0) ** -2.0)
+
+        n_values = random_state.randint(10, 30)
+
+        log_fluxes = np.linspace(best_log_flux - 2, best_log_flux + 2, n_values)
+
+        likelihood_values = -0.5 * ((log_fluxes - best_log_flux) / 0.3) ** 2
+
+        containers.append(IntervalContainer(start, stop, 10 ** log_fluxes, likelihood_values, 21))
+
+    return containers
+
+
+def _get_reference_log_like(containers, model):
+
+    # Direct computation, one container at the time
+
+    log_like = 0.0
+
+    for container in containers:
+
+        xx = np.logspace(np.log10(container.start), np.log10(container.stop), container.n_integration_points)
+
+        expected_flux = scipy.integrate.simps(model.get_total_flux(xx), xx) / (container.stop - container.start)
+
+        log_like += container(expected_flux)
+
+    return log_like
+
+
+def test_castro_like():
+
+    containers = _get_containers()
+
+    castro = CastroLike("castro", containers)
+
+    powerlaw = Powerlaw()
+
+    model = Model(PointSource("source", 0.0, 0.0, spectral_shape=powerlaw))
+
+    castro.set_model(model)
+
+    for index, K in ((-2.0, 0.3), (-1.8, 0.1), (-2.5, 3.0)):
+
+        powerlaw.index = index
+        powerlaw.K = K
+
+        assert np.isclose(castro.get_log_like(), _get_reference_log_like(containers, model), rtol=1e-10)
+
+    # Changing the active measurements only selects a subset of the containers
+
+    n_active = castro.set_active_measurements(10.0, 100.0)
+
+    active = [container for container in containers if container.start >= 10.0 and container.stop <= 100.0]
+
+    assert n_active == len(active)
+
+    assert castro.active_containers == active
+
+    assert np.isclose(castro.get_log_like(), _get_reference_log_like(active, model), rtol=1e-10)
+
+    _ = castro.set_active_measurements(1.0, 1000.0)
+
+    assert np.isclose(castro.get_log_like(), _get_reference_log_like(containers, model), rtol=1e-10)
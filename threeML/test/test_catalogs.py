@@ -1,7 +1,13 @@
+import datetime
+import shutil
+
 import pytest
+from astromodels.utils.angular_distance import angular_distance
 
 from threeML import *
 from threeML.io.network import internet_connection_is_active
+from threeML.io.package_data import get_path_of_data_file
+from threeML.io.get_heasarc_table_as_pandas import get_heasarc_table_as_pandas, _read_votable
 
 skip_if_internet_is_not_available = pytest.mark.skipif(not internet_connection_is_active(),
                                                        reason="No active internet connection")
@@ -110,3 +116,128 @@ def test_swift_catalog():
     _ = swift_catalog.get_redshift()
 
 
+
+
+def _install_test_table(home, table_name):
+
+    # Put the bundled VO table in the cache as if it had just been downloaded, so no network access is needed
+
+    cache_directory = home.mkdir('.threeML').mkdir('.cache')
+
+    shutil.copy(get_path_of_data_file('datasets/heasarc_test_votable.xml'),
+                str(cache_directory.join('%s_votable.xml' % table_name)))
+
+    now = datetime.datetime.utcnow().strftime('%Y-%m-%d-%H-%M-%S')
+
+    cache_directory.join('%s_cache.yml' % table_name).write("cache time: 86400.0\nlast save: %s\n" % now)
+
+    return cache_directory
+
+
+def test_heasarc_table_cache(tmpdir, monkeypatch):
+
+    monkeypatch.setenv('HOME', str(tmpdir))
+
+    cache_directory = _install_test_table(tmpdir, 'testtable')
+
+    table_cache = cache_directory.join('testtable_table.npz')
+
+    # The first time the XML file is parsed and the binary cache written
+
+    table = get_heasarc_table_as_pandas('testtable')
+
+    assert table_cache.check()
+
+    reference = _read_votable(str(cache_directory.join('testtable_votable.xml')))
+
+    pd.testing.assert_frame_equal(table, reference)
+
+    assert table.index.name == 'name'
+    assert len(table) == 40
+    assert np.isnan(table.loc['GRB080116838', 'flux'])
+
+    # The second time the binary cache is used (make it recognizable)
+
+    with np.load(str(table_cache), allow_pickle=True) as cache:
+
+        arrays = dict(cache.items())
+
+    arrays['column_%i' % list(table.columns).index('t90')] = np.zeros(len(table))
+
+    with open(str(table_cache), 'wb') as f:
+
+        np.savez(f, **arrays)
+
+    assert np.all(get_heasarc_table_as_pandas('testtable')['t90'] == 0)
+
+    # If the XML file changes, the binary cache is rebuilt
+
+    xml_file = cache_directory.join('testtable_votable.xml')
+
+    xml_file.setmtime(xml_file.mtime() - 100)
+
+    pd.testing.assert_frame_equal(get_heasarc_table_as_pandas('testtable'), reference)
+
+    # The same if the cache has an old format, or is corrupted
+
+    arrays['version'] = -1
+    arrays['signature'] = np.array([xml_file.size(), xml_file.mtime()], dtype=float)
+
+    with open(str(table_cache), 'wb') as f:
+
+        np.savez(f, **arrays)
+
+    pd.testing.assert_frame_equal(get_heasarc_table_as_pandas('testtable'), reference)
+
+    table_cache.write('garbage')
+
+    pd.testing.assert_frame_equal(get_heasarc_table_as_pandas('testtable'), reference)
+
+    pd.testing.assert_frame_equal(get_heasarc_table_as_pandas('testtable'), reference)
+
+
+def test_offline_cone_search(tmpdir, monkeypatch):
+
+    monkeypatch.setenv('HOME', str(tmpdir))
+
+    _install_test_table(tmpdir, 'fermigbrst')
+
+    gbm_catalog = FermiGBMBurstCatalog()
+
+    table = gbm_catalog._vo_dataframe
+
+    for ra, dec, radius in [(0.0, 0.0, 5.0), (359.0, -0.5, 2.0), (120.0, 89.0, 3.0), (35.0, -20.0, 60.0)]:
+
+        _ = gbm_catalog.cone_search(ra, dec, radius, offline=True)
+
+        assert gbm_catalog.ra_center == ra
+        assert gbm_catalog.dec_center == dec
+
+        results = gbm_catalog.result
+
+        distances = angular_distance(ra, dec, table['ra'].values, table['dec'].values)
+
+        expected = table.index[distances <= radius]
+
+        assert sorted(results.index) == sorted(expected)
+
+        # Sorted by distance, which is in arcmin
+
+        assert np.all(np.diff(results['Search_Offset'].values) >= 0)
+
+        assert np.allclose(results['Search_Offset'].values,
+                           angular_distance(ra, dec, results['ra'].values, results['dec'].values) * 60.0)
+
+    # This cone crosses ra = 0
+
+    _ = gbm_catalog.cone_search(0.0, 0.0, 5.0, offline=True)
+
+    assert set(gbm_catalog.result.index) == {'GRB080101000', 'GRB080108919', 'GRB080116838', 'GRB080124757'}
+
+    _ = gbm_catalog.query_sources('GRB080108919', 'GRB080124757')
+
+    assert list(gbm_catalog.result.index) == ['GRB080108919', 'GRB080124757']
+
+    _ = gbm_catalog.query('t90 > 2')
+
+    assert np.all(gbm_catalog.result['t90'] > 2)
@@ -0,0 +1,323 @@
+import gzip
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+import pytest
+
+try:
+
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+except ImportError:
+
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+from threeML.io.download_from_http import ApacheDirectory, DownloadManager, DownloadFailed
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class _FileServer(object):
+    """
+    A minimal HTTP server serving some files from memory, with support for Range requests. It can simulate
+    interrupted transfers and servers which do not support resuming
+    """
+
+    def __init__(self, files):
+
+        self.files = files
+
+        # Requests received, as (method, path, range header)
+
+        self.requests = []
+
+        # Paths for which the next GET will be interrupted halfway through
+
+        self.interrupt = set()
+
+        self.support_ranges = True
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+
+                pass
+
+            def do_HEAD(self):
+
+                server.requests.append(('HEAD', self.path, None))
+
+                self._send(head=True)
+
+            def do_GET(self):
+
+                server.requests.append(('GET', self.path, self.headers.get('Range')))
+
+                self._send(head=False)
+
+            def _send(self, head):
+
+                name = self.path.lstrip('/')
+
+                if name not in server.files:
+
+                    self.send_response(404)
+                    self.end_headers()
+
+                    return
+
+                data = server.files[name]
+
+                start = 0
+
+                range_header = self.headers.get('Range')
+
+                if range_header is not None and server.support_ranges and not head:
+
+                    start = int(re.match('bytes=(\d+)-', range_header).group(1))
+
+                    self.send_response(206)
+                    self.send_header('Content-Range', 'bytes %i-%i/%i' % (start, len(data) - 1, len(data)))
+
+                else:
+
+                    self.send_response(200)
+
+                self.send_header('Content-Length', str(len(data) - start))
+                self.end_headers()
+
+                if head:
+
+                    return
+
+                body = data[start:]
+
+                if name in server.interrupt:
+
+                    server.interrupt.discard(name)
+
+                    body = body[:len(body) // 2]
+
+                self.wfile.write(body)
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+
+        self.url = 'http://127.0.0.1:%i' % self._httpd.server_address[1]
+
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def get_requests(self, method, name=None):
+
+        return [r for r in self.requests if r[0] == method and (name is None or r[1] == '/' + name)]
+
+    def shutdown(self):
+
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def file_server():
+
+    random_state = np.random.RandomState(1234)
+
+    files = {}
+
+    for i in range(5):
+
+        files['file_%i.fit' % i] = random_state.bytes(100000 + 1000 * i)
+
+    apache_listing = ['<html><body><pre>']
+
+    for name in sorted(files.keys()):
+
+        apache_listing.append('<img src="/icons/unknown.gif" alt="[   ]"> <a href="%s">%s</a>   '
+                              '16-Nov-2012 15:14   96K' % (name, name))
+
+    apache_listing.append('</pre></body></html>')
+
+    files[''] = "\n".join(apache_listing).encode('utf-8')
+
+    server = _FileServer(files)
+
+    yield server
+
+    server.shutdown()
+
+
+def _read(filename):
+
+    with open(filename, 'rb') as f:
+
+        return f.read()
+
+
+def test_download_manager(file_server, tmpdir):
+
+    destination = str(tmpdir)
+
+    names = ['file_%i.fit' % i for i in range(5)]
+
+    # Interrupt one of the transfers, it will be resumed
+
+    file_server.interrupt.add('file_1.fit')
+
+    # Leave a partial file from a previous (interrupted) download of another file
+
+    tmpdir.join('file_2.fit.part').write_binary(file_server.files['file_2.fit'][:30000])
+
+    manager = DownloadManager(n_threads=3, chunk_size=4096)
+
+    local_files = [manager.add('%s/%s' % (file_server.url, name), destination) for name in names]
+
+    assert manager.download(progress=False) == local_files
+
+    for name, local_file in zip(names, local_files):
+
+        assert local_file == os.path.join(destination, name)
+
+        assert _read(local_file) == file_server.files[name]
+
+        assert not os.path.exists(local_file + '.part')
+
+    ranges = [r[2] for r in file_server.get_requests('GET', 'file_1.fit')]
+
+    assert ranges == [None, 'bytes=%i-' % (len(file_server.files['file_1.fit']) // 2)]
+
+    assert [r[2] for r in file_server.get_requests('GET', 'file_2.fit')] == ['bytes=30000-']
+
+    # Complete files are not downloaded again
+
+    file_server.requests = []
+
+    manager = DownloadManager(n_threads=3)
+
+    for name in names:
+
+        manager.add('%s/%s' % (file_server.url, name), destination)
+
+    _ = manager.download(progress=True)
+
+    assert len(file_server.get_requests('GET')) == 0
+
+    # A server which does not support resuming sends the whole file again
+
+    file_server.support_ranges = False
+
+    tmpdir.join('file_0.fit').remove()
+    tmpdir.join('file_0.fit.part').write_binary(b'x' * 1000)
+
+    manager = DownloadManager()
+
+    local_file = manager.add('%s/file_0.fit' % file_server.url, destination, new_filename='renamed.fit')
+
+    _ = manager.download(progress=False)
+
+    assert _read(local_file) == file_server.files['file_0.fit']
+
+
+def test_download_manager_verification(file_server, tmpdir):
+
+    destination = str(tmpdir)
+
+    data = file_server.files['file_3.fit']
+
+    # Checksum
+
+    manager = DownloadManager()
+
+    local_file = manager.add('%s/file_3.fit' % file_server.url, destination, md5=hashlib.md5(data).hexdigest())
+
+    _ = manager.download(progress=False)
+
+    assert _read(local_file) == data
+
+    manager = DownloadManager()
+
+    _ = manager.add('%s/file_4.fit' % file_server.url, destination, md5=hashlib.md5(data).hexdigest())
+
+    with pytest.raises(DownloadFailed):
+
+        _ = manager.download(progress=False)
+
+    assert not tmpdir.join('file_4.fit').check()
+    assert not tmpdir.join('file_4.fit.part').check()
+
+    # A file with the wrong size is downloaded again
+
+    tmpdir.join('file_3.fit').write_binary(data[:100])
+
+    manager = DownloadManager()
+
+    local_file = manager.add('%s/file_3.fit' % file_server.url, destination)
+
+    _ = manager.download(progress=False)
+
+    assert _read(local_file) == data
+
+    # A transfer which keeps failing is reported, the other files are downloaded anyway
+
+    file_server.interrupt.add('file_0.fit')
+
+    manager = DownloadManager(n_retries=0)
+
+    _ = manager.add('%s/file_0.fit' % file_server.url, destination)
+    _ = manager.add('%s/not_existing.fit' % file_server.url, destination)
+    local_file = manager.add('%s/file_1.fit' % file_server.url, destination)
+
+    with pytest.raises(DownloadFailed):
+
+        _ = manager.download(progress=False)
+
+    assert _read(local_file) == file_server.files['file_1.fit']
+
+    # ...and can be resumed later
+
+    manager = DownloadManager()
+
+    local_file = manager.add('%s/file_0.fit' % file_server.url, destination)
+
+    _ = manager.download(progress=False)
+
+    assert _read(local_file) == file_server.files['file_0.fit']
+
+
+def test_apache_directory(file_server, tmpdir):
+
+    destination = str(tmpdir)
+
+    directory = ApacheDirectory(file_server.url + '/')
+
+    assert sorted(directory.files) == ['file_%i.fit' % i for i in range(5)]
+
+    local_files = directory.download_all_files(destination, progress=False, pattern='file_[0-2]')
+
+    assert [os.path.basename(f) for f in local_files] == ['file_0.fit', 'file_1.fit', 'file_2.fit']
+
+    for local_file in local_files:
+
+        assert _read(local_file) == file_server.files[os.path.basename(local_file)]
+
+    local_file = directory.download('file_4.fit', destination, compress=True)
+
+    assert local_file == os.path.join(destination, 'file_4.fit.gz')
+
+    with gzip.open(local_file, 'rb') as f:
+
+        assert f.read() == file_server.files['file_4.fit']
+
+    with pytest.raises(AssertionError):
+
+        _ = directory.download('not_existing.fit', destination)
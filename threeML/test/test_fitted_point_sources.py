@@ -1,10 +1,17 @@
 import pytest
 from threeML import *
 from threeML.plugins.OGIPLike import OGIPLike
-from threeML.utils.fitted_objects.fitted_point_sources import InvalidUnitError
+from threeML.utils.fitted_objects.fitted_point_sources import InvalidUnitError, FittedPointSourceSpectralHandler
+from threeML.utils.fitted_objects.fitted_point_sources import integrate_flux
+from threeML.utils.fitted_objects.fitted_source_handler import VariatesContainer
+from threeML.utils.fitted_objects.batched_point_source_flux import BatchedPointSourceFlux
+from threeML.utils.fitted_objects.fitted_spectrum_cache import FittedSpectrumCache
+import threeML.utils.fitted_objects.fitted_spectrum_cache
+from threeML.random_variates import RandomVariates
 from threeML.io.calculate_flux import _calculate_point_source_flux
 import astropy.units as u
 import matplotlib.pyplot as plt
+import scipy.integrate
 
 from threeML.io.package_data import get_path_of_data_dir
 
@@ -188,3 +195,245 @@ def test_units_on_energy_range(analysis_to_test):
     with pytest.raises(AssertionError):
         plot_point_source_spectra(analysis_to_test[0], ene_min=1.*u.keV, ene_max=1.)
 
+
+
+def test_variates_container_matches_random_variates():
+
+    np.random.seed(1234)
+
+    samples = np.random.lognormal(size=(7, 500))
+
+    variates = [RandomVariates(s) for s in samples]
+
+    identity = lambda x: x
+
+    for equal_tailed in [True, False]:
+
+        container = VariatesContainer(samples, (7,), 0.68, identity, equal_tailed)
+
+        for i, variate in enumerate(variates):
+
+            if equal_tailed:
+
+                low, hi = variate.equal_tail_interval(0.68)
+
+            else:
+
+                low, hi = variate.highest_posterior_density_interval(0.68)
+
+            assert np.isclose(container.lower_error[i], low)
+            assert np.isclose(container.upper_error[i], hi)
+            assert np.isclose(container.median[i], variate.median)
+            assert np.isclose(container.average[i], variate.average)
+
+    # The container built from a list of RandomVariates is the same
+
+    assert np.allclose(VariatesContainer(variates, (7,), 0.68, identity).samples, samples)
+
+    summed = container + container
+
+    assert np.allclose(summed.samples, 2 * samples)
+
+
+def test_fitted_point_source_vectorized_propagation(analysis_to_test):
+
+    # The propagation over the whole energy grid must give the same result as the point by point one
+
+    energies = np.logspace(1, 3, 10)
+
+    for x in analysis_to_test[:2]:
+
+        handler = FittedPointSourceSpectralHandler(x, 'bn090217206', energies, 'keV', '1/(cm2 s keV)')
+
+        for i, energy in enumerate(energies):
+
+            point_by_point = np.asarray(handler._propagated_function(energy))
+
+            assert np.allclose(handler.samples.value[i], point_by_point)
+
+        # The RandomVariates of the handler have a value (the median), as the propagated ones
+
+        for variate, median in zip(handler.values.values, handler.median.value):
+
+            assert np.isclose(variate.value, median)
+
+            assert np.isclose(variate.value, variate.median)
+
+
+def test_batched_flux_integration():
+
+    band = Band()
+
+    powerlaw = Powerlaw()
+
+    integrand = lambda x, param_specification: x * powerlaw.evaluate(x, **param_specification)
+
+    indices = np.array([-2.5, -2.0, -1.5, -1.0])
+
+    fluxes = integrate_flux(integrand, 10., 1000., {'K': 2., 'piv': 1., 'index': indices}, relative_accuracy=1e-7)
+
+    for flux, index in zip(fluxes, indices):
+
+        expected = scipy.integrate.quad(lambda x: integrand(x, {'K': 2., 'piv': 1., 'index': index}), 10., 1000.)[0]
+
+        assert np.isclose(flux, expected, rtol=1e-6)
+
+    # This one does not support arrays as parameters, so it is integrated one sample at the time
+
+    band_integrand = lambda x, param_specification: band.evaluate(x, **param_specification)
+
+    parameters = {'K': 1., 'alpha': np.array([-1.0, -0.5]), 'xp': 300., 'beta': -2.3, 'piv': 100.}
+
+    fluxes = integrate_flux(band_integrand, 10., 1000., parameters)
+
+    for flux, alpha in zip(fluxes, parameters['alpha']):
+
+        this_parameters = dict(parameters)
+        this_parameters['alpha'] = alpha
+
+        expected = scipy.integrate.quad(lambda x: band_integrand(np.array([x]), this_parameters)[0], 10., 1000.)[0]
+
+        assert np.isclose(flux, expected, rtol=1e-4)
+
+
+def test_batched_point_source_flux(analysis_to_test):
+
+    # The batched fluxes must be the same as those computed one by one
+
+    cases = [(x, None) for x in analysis_to_test] + \
+            [(x, component) for x in (analysis_to_test[1], analysis_to_test[4]) for component in ('Powerlaw', 'Blackbody')]
+
+    for processes in [1, 2]:
+
+        np.random.seed(1234)
+
+        batch = BatchedPointSourceFlux([10., 1000.], 'keV', 'erg/(cm2 s)', processes=processes)
+
+        indices = [batch.add(x, 'bn090217206', component=component) for x, component in cases]
+
+        results = batch.compute()
+
+        np.random.seed(1234)
+
+        for index, (x, component) in zip(indices, cases):
+
+            handler = FittedPointSourceSpectralHandler(x, 'bn090217206', [10., 1000.], 'keV', 'erg/(cm2 s)',
+                                                       component=component, is_differential_flux=False)
+
+            assert np.allclose(results[index].samples.value, handler.samples.value, rtol=1e-5)
+
+            assert np.isclose(results[index].median[0, 0].value, handler.median[0, 0].value, rtol=1e-5)
+            assert np.isclose(results[index].upper_error[0, 0].value, handler.upper_error[0, 0].value, rtol=1e-5)
+            assert np.isclose(results[index].lower_error[0, 0].value, handler.lower_error[0, 0].value, rtol=1e-5)
+
+    # The output of calculate_point_source_flux does not depend on the number of processes
+
+    flux_keywords = {'use_components': True,
+                     'components_to_use': ['total', 'Powerlaw'],
+                     'flux_unit': 'erg/(cm2 s)',
+                     'energy_unit': 'keV'}
+
+    mle_serial, bayes_serial = _calculate_point_source_flux(10, 1000, *analysis_to_test, **flux_keywords)
+
+    mle_parallel, bayes_parallel = _calculate_point_source_flux(10, 1000, *analysis_to_test, processes=2,
+                                                                **flux_keywords)
+
+    assert list(mle_serial.index) == list(mle_parallel.index)
+    assert list(bayes_serial.index) == list(bayes_parallel.index)
+
+    assert np.allclose(mle_serial['flux'].apply(lambda f: f.value), mle_parallel['flux'].apply(lambda f: f.value))
+    assert np.allclose(bayes_serial['flux'].apply(lambda f: f.value), bayes_parallel['flux'].apply(lambda f: f.value))
+
+
+def test_fitted_spectrum_cache(analysis_to_test, monkeypatch):
+
+    clear_spectral_cache()
+
+    plot_keywords = {'use_components': True,
+                     'components_to_use': ['Powerlaw', 'total'],
+                     'flux_unit': 'erg/(cm2 s keV)',
+                     'num_ene': 10}
+
+    np.random.seed(1234)
+
+    for x in analysis_to_test:
+
+        _ = plot_spectra(x, **plot_keywords)
+
+    bands = [band for x in analysis_to_test for band in export_spectral_bands(x)]
+
+    assert len(export_spectral_bands()) == len(bands)
+
+    # simple: total; complex: total and Powerlaw; dless: total and Powerlaw (for MLE and bayes)
+
+    assert len(bands) == 10
+
+    # The cached spectra are the same as those computed directly
+
+    np.random.seed(1234)
+
+    energies = np.logspace(1, 4, 10)
+
+    for band in export_spectral_bands(analysis_to_test[1]):
+
+        handler = FittedPointSourceSpectralHandler(analysis_to_test[1], band['source'], energies, 'keV',
+                                                   'erg/(cm2 s keV)', component=band['component'])
+
+        assert np.allclose(band['energies'], energies)
+        assert np.allclose(band['median'], handler.median.value)
+        assert np.allclose(band['lower bound'], handler.lower_error.value)
+        assert np.allclose(band['upper bound'], handler.upper_error.value)
+
+    # Plotting again, also with a different style, does not compute the spectra again
+
+    def fail(*args):
+
+        raise AssertionError("The spectrum should have been taken from the cache")
+
+    monkeypatch.setattr(threeML.utils.fitted_objects.fitted_spectrum_cache, '_compute_spectrum', fail)
+
+    for x in analysis_to_test:
+
+        _ = plot_spectra(x, plot_style_kwargs={'linestyle': '--'}, **plot_keywords)
+
+    _ = plot_spectra(analysis_to_test[0], ene_min=10. * u.keV, ene_max=1E4 * u.keV, num_ene=10,
+                     flux_unit='erg/(cm2 s keV)')
+
+    monkeypatch.undo()
+
+    # The parallel computation gives the same spectra
+
+    clear_spectral_cache()
+
+    for x in analysis_to_test:
+
+        _ = plot_spectra(x, processes=2, **plot_keywords)
+
+    parallel_bands = [band for x in analysis_to_test for band in export_spectral_bands(x)]
+
+    assert len(parallel_bands) == len(bands)
+
+    for band, parallel_band in zip(bands, parallel_bands):
+
+        assert band['source'] == parallel_band['source']
+        assert band['component'] == parallel_band['component']
+
+        # The MLE results have more than 1000 samples, so a random subset of them is used
+
+        if band['analysis type'] == 'Bayesian':
+
+            assert np.allclose(band['median'], parallel_band['median'])
+
+    plt.close('all')
+
+    # The size of the cache is limited
+
+    cache = FittedSpectrumCache(max_entries=2)
+
+    for ene_max in [100., 200., 300.]:
+
+        _ = cache.get(analysis_to_test[0], 'bn090217206', [10., ene_max], 'keV', '1/(cm2 s keV)')
+
+    assert len(cache) == 2
+
+    assert np.allclose(cache.export_bands()[0]['energies'], [10., 200.])
@@ -0,0 +1,65 @@
+import os
+import warnings
+
+import numpy as np
+
+import threeML.parallel.fork_pool
+from threeML.parallel.fork_pool import ForkPool
+
+
+def test_fork_pool():
+
+    # The function is a closure, which could not be sent to the processes
+
+    offset = np.arange(5)
+
+    function = lambda i: (os.getpid(), offset[i] * 2)
+
+    with ForkPool(function, 2) as pool:
+
+        assert pool.is_parallel
+
+        results = pool.map(range(5))
+
+        assert [value for _, value in results] == [0, 2, 4, 6, 8]
+
+        assert os.getpid() not in [pid for pid, _ in results]
+
+        assert sorted(value for _, value in pool.imap_unordered(range(5))) == [0, 2, 4, 6, 8]
+
+    assert not threeML.parallel.fork_pool._functions
+
+    # With one process everything happens here
+
+    with ForkPool(function, 1) as pool:
+
+        assert not pool.is_parallel
+
+        assert pool.map(range(5)) == [(os.getpid(), value) for value in [0, 2, 4, 6, 8]]
+
+
+def test_fork_pool_without_fork():
+
+    original_get_fork_context = threeML.parallel.fork_pool._get_fork_context
+
+    threeML.parallel.fork_pool._get_fork_context = lambda: None
+
+    try:
+
+        with warnings.catch_warnings(record=True) as caught:
+
+            warnings.simplefilter('always')
+
+            with ForkPool(lambda i: i ** 2, 4) as pool:
+
+                assert not pool.is_parallel
+
+                assert pool.map(range(4)) == [0, 1, 4, 9]
+
+                assert list(pool.imap_unordered(range(4))) == [0, 1, 4, 9]
+
+        assert len(caught) == 1
+
+    finally:
+
+        threeML.parallel.fork_pool._get_fork_context = original_get_fork_context
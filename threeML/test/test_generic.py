@@ -1,6 +1,7 @@
 from threeML import *
 from threeML.utils.cartesian import cartesian
-from threeML.utils.statistics.stats_tools import PoissonResiduals, Significance
+from threeML.utils.statistics.stats_tools import PoissonResiduals, Significance, integrated_autocorrelation_time, \
+    gelman_rubin
 
 
 def test_step_generator_setup():
@@ -62,3 +63,44 @@ def test_poisson_classes():
 
 def test_cartesian():
     cart = cartesian(([1, 2, 3], [1, 2, 3]))
+
+
+def test_convergence_diagnostics():
+
+    random_state = np.random.RandomState(1234)
+
+    # AR(1) processes, whose autocorrelation time is (1 + rho) / (1 - rho)
+
+    rho = 0.9
+
+    n_walkers, n_steps = 20, 5000
+
+    chain = np.zeros((n_walkers, n_steps))
+
+    innovations = random_state.normal(size=(n_walkers, n_steps))
+
+    for i in range(1, n_steps):
+
+        chain[:, i] = rho * chain[:, i - 1] + innovations[:, i]
+
+    tau = integrated_autocorrelation_time(chain)
+
+    assert np.isclose(tau, (1 + rho) / (1 - rho), rtol=0.15)
+
+    # Uncorrelated samples
+
+    assert np.isclose(integrated_autocorrelation_time(innovations), 1.0, rtol=0.15)
+
+    # Walkers sampling the same distribution
+
+    assert gelman_rubin(chain) < 1.01
+
+    # Walkers sampling different distributions
+
+    shifted = chain + 10 * np.arange(n_walkers)[:, np.newaxis]
+
+    assert gelman_rubin(shifted) > 2
+
+    # Walkers which never moved
+
+    assert np.isinf(integrated_autocorrelation_time(np.ones((n_walkers, 10))))
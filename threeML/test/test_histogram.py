@@ -105,3 +105,56 @@ def test_hist_addition():
 
 
 
+
+
+def test_hist_sum_and_entries():
+
+    bins = [-3, -2, -1, 0, 1, 2, 3]
+
+    bounds = IntervalSet.from_list_of_edges(bins)
+
+    random_state = np.random.RandomState(1234)
+
+    histograms = []
+
+    for i in range(10):
+
+        contents = random_state.uniform(0, 10, len(bins) - 1)
+
+        errors = random_state.uniform(0, 1, len(bins) - 1)
+
+        histograms.append(Histogram(bounds, contents, errors=errors))
+
+    total = Histogram.sum(histograms)
+
+    # Same as adding them one at the time
+
+    reference = histograms[0]
+
+    for histogram in histograms[1:]:
+
+        reference = reference + histogram
+
+    assert np.allclose(total.contents, reference.contents)
+    assert np.allclose(total.errors, reference.errors)
+
+    assert np.allclose(total.contents, np.sum([h.contents for h in histograms], axis=0))
+    assert np.allclose(total.errors, np.sqrt(np.sum([h.errors ** 2 for h in histograms], axis=0)))
+
+    with pytest.raises(AssertionError):
+
+        _ = Histogram.sum([histograms[0], Histogram(bounds, np.ones(len(bins) - 1), is_poisson=True)])
+
+    # Entries: each bin includes its lower edge, entries outside the bins are ignored
+
+    entries = np.concatenate((random_state.normal(size=1000), [-3.0, -1.0, 3.0, -5.0, 5.0]))
+
+    hh = Histogram.from_entries(bounds, entries)
+
+    which_bins = np.digitize(entries, bins) - 1
+
+    valid = (which_bins >= 0) & (which_bins < len(bins) - 1)
+
+    assert np.all(hh.contents == np.bincount(which_bins[valid], minlength=len(bins) - 1))
+
+    assert hh.total == np.sum(valid)
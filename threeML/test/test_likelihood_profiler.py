@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from astromodels import Powerlaw, Uniform_prior, Log_uniform_prior
+
+from threeML.bayesian.bayesian_analysis import BayesianAnalysis
+from threeML.utils.likelihood_profiler import LikelihoodProfiler
+from threeML.test.conftest import get_grb_model
+
+
+def _check_summary(summary, plugin_name):
+
+    plugin_rows = summary.loc[plugin_name]
+
+    assert list(plugin_rows.index) == ['statistic', 'folding', 'model evaluation', 'total']
+
+    total_calls = plugin_rows.loc['total', 'n_calls']
+
+    assert total_calls > 0
+
+    # The folding and the model evaluation happen once per evaluation of the likelihood
+
+    assert plugin_rows.loc['folding', 'n_calls'] == total_calls
+    assert plugin_rows.loc['model evaluation', 'n_calls'] == total_calls
+
+    # The exclusive times of the stages add up to the total
+
+    assert np.isclose(plugin_rows['time (s)'].iloc[:-1].sum(), plugin_rows.loc['total', 'time (s)'])
+
+    assert np.all(plugin_rows['time (s)'] >= 0)
+
+    wall_time = summary.loc[('total', 'wall time'), 'time (s)']
+
+    assert plugin_rows.loc['total', 'time (s)'] <= wall_time
+
+    assert np.isclose(summary.loc[('total', 'other'), 'time (s)'] + plugin_rows.loc['total', 'time (s)'], wall_time)
+
+
+def _check_restored(plugin):
+
+    # After profiling there must be no timed functions left on the instances
+
+    assert 'get_model' not in plugin.__dict__
+    assert 'inner_fit' not in plugin.__dict__
+    assert 'get_log_like' not in plugin.__dict__
+
+    assert plugin._rsp._integral_function.__name__ != 'timed_function'
+
+
+def test_profile_joint_likelihood(joint_likelihood_bn090217206_nai):
+
+    jl = joint_likelihood_bn090217206_nai
+
+    _ = jl.fit(quiet=True)
+
+    assert jl.results.profiling_summary is None
+
+    _ = jl.fit(quiet=True, profile=True)
+
+    summary = jl.results.profiling_summary
+
+    _check_summary(summary, 'NaI6')
+
+    _check_restored(jl.data_list['NaI6'])
+
+    # The fit still works after profiling
+
+    _ = jl.fit(quiet=True)
+
+
+def test_profiler_context_manager(joint_likelihood_bn090217206_nai):
+
+    jl = joint_likelihood_bn090217206_nai
+
+    with LikelihoodProfiler(jl.data_list, 'inner_fit') as profiler:
+
+        _ = jl.fit(quiet=True, compute_covariance=False)
+
+    _check_summary(profiler.summary, 'NaI6')
+
+    assert profiler.wall_time > 0
+
+    _check_restored(jl.data_list['NaI6'])
+
+    # Errors in the profiled code are propagated, and the plugins restored anyway
+
+    with pytest.raises(ZeroDivisionError):
+
+        with LikelihoodProfiler(jl.data_list) as profiler:
+
+            _ = jl.data_list['NaI6'].get_log_like()
+
+            _ = 1 / 0
+
+    _check_restored(jl.data_list['NaI6'])
+
+    assert profiler.summary.loc[('NaI6', 'total'), 'n_calls'] == 1
+
+
+def test_profile_bayesian_analysis(data_list_bn090217206_nai6):
+
+    powerlaw = Powerlaw()
+
+    powerlaw.index.prior = Uniform_prior(lower_bound=-5.0, upper_bound=5.0)
+    powerlaw.K.prior = Log_uniform_prior(lower_bound=1.0, upper_bound=10)
+
+    model = get_grb_model(powerlaw)
+
+    bayes = BayesianAnalysis(model, data_list_bn090217206_nai6)
+
+    _ = bayes.sample(n_walkers=10, burn_in=5, n_samples=10, quiet=True, seed=1234, profile=True)
+
+    summary = bayes.results.profiling_summary
+
+    _check_summary(summary, 'NaI6')
+
+    _check_restored(data_list_bn090217206_nai6['NaI6'])
+
@@ -1,8 +1,13 @@
 import pytest
+import os
 import numpy as np
 
 from threeML import LocalMinimization, GlobalMinimization
 from threeML import parallel_computation
+from threeML.minimizer.minimization import ProfileLikelihood
+from threeML.utils.differentiation import get_hessian
+from threeML.minimizer.grid_minimizer import IncompatibleCheckpoint
+from threeML.config.config import threeML_config
 
 
 try:
@@ -119,3 +124,193 @@ def test_scipy(joint_likelihood_bn090217206_nai):
     joint_likelihood_bn090217206_nai.likelihood_model.bn090217206.spectrum.main.Powerlaw.K = 1.25
 
     do_analysis(joint_likelihood_bn090217206_nai, minim)
+
+
+def test_multistart(joint_likelihood_bn090217206_nai):
+
+    minuit = LocalMinimization("minuit")
+
+    for sampling, processes in (("latin", 1), ("halton", 2)):
+
+        multistart = GlobalMinimization("multistart")
+
+        multistart.setup(second_minimization=minuit, n_starts=6, sampling=sampling, processes=processes, seed=1234,
+                         tolerance=1e-2)
+
+        do_analysis(joint_likelihood_bn090217206_nai, multistart)
+
+    # Some of the starting points are very far away (down to K=1e-30) so not all fits converge to the global
+    # minimum, but all the fits which reached it must have been merged
+
+    jl = joint_likelihood_bn090217206_nai
+
+    minimizer = multistart.get_instance(jl.minus_log_like_profile, jl.likelihood_model.free_parameters)
+
+    minimizer.minimize(compute_covar=False)
+
+    minima = minimizer.minima
+
+    assert minima['n_starts'].sum() == 6
+    assert np.all(np.diff(minima['-log(likelihood)']) >= 0)
+    assert abs(minima['bn090217206.spectrum.main.Powerlaw.K'][0] - 2.531028) < 1e-2
+
+
+def test_grid_checkpoint_and_refinement(joint_likelihood_bn090217206_nai):
+
+    checkpoint_file = "__grid_checkpoint.txt"
+
+    if os.path.exists(checkpoint_file):
+
+        os.remove(checkpoint_file)
+
+    K = joint_likelihood_bn090217206_nai.likelihood_model.bn090217206.spectrum.main.Powerlaw.K
+
+    visited = []
+
+    grid = GlobalMinimization("GRID")
+    minuit = LocalMinimization("minuit")
+
+    grid.setup(grid={K: np.linspace(0.1, 10, 5)},
+               second_minimization=minuit,
+               callbacks=[lambda point, minimum: visited.append(point)],
+               checkpoint=checkpoint_file,
+               refine=2)
+
+    do_analysis(joint_likelihood_bn090217206_nai, grid)
+
+    with open(checkpoint_file) as f:
+
+        n_lines = len(f.readlines())
+
+    # The header, 5 points in the grid, plus at most 2 new points around each of the 2 best ones
+
+    assert 6 < n_lines <= 10
+    assert len(visited) == n_lines - 1
+
+    # Running again resumes from the checkpoint, without fitting any point again
+
+    del visited[:]
+
+    do_analysis(joint_likelihood_bn090217206_nai, grid)
+
+    with open(checkpoint_file) as f:
+
+        assert len(f.readlines()) == n_lines
+
+    assert len(visited) == n_lines - 1
+
+    # A checkpoint produced with a different grid, or with a different model, cannot be used
+
+    index = joint_likelihood_bn090217206_nai.likelihood_model.bn090217206.spectrum.main.Powerlaw.index
+
+    grid.setup(grid={K: np.linspace(0.1, 10, 5), index: np.linspace(-2.0, -1.5, 2)},
+               second_minimization=minuit,
+               checkpoint=checkpoint_file)
+
+    with pytest.raises(IncompatibleCheckpoint):
+
+        do_analysis(joint_likelihood_bn090217206_nai, grid)
+
+    grid.setup(grid={K: np.linspace(0.1, 10, 5)},
+               second_minimization=minuit,
+               checkpoint=checkpoint_file)
+
+    piv = joint_likelihood_bn090217206_nai.likelihood_model.bn090217206.spectrum.main.Powerlaw.piv
+
+    piv.value = 200.0
+
+    with pytest.raises(IncompatibleCheckpoint):
+
+        do_analysis(joint_likelihood_bn090217206_nai, grid)
+
+    os.remove(checkpoint_file)
+
+
+def test_profile_likelihood_warm_start(joint_likelihood_bn090217206_nai):
+
+    jl = joint_likelihood_bn090217206_nai
+
+    jl.set_minimizer("minuit")
+
+    jl.fit(quiet=True)
+
+    index_path = jl.likelihood_model.bn090217206.spectrum.main.Powerlaw.index.path
+
+    steps = np.linspace(-1.25, -1.12, 8)
+
+    pl = ProfileLikelihood(jl.minimizer, [index_path])
+
+    results = pl.step(steps)
+
+    assert pl.n_function_calls.shape == steps.shape
+    assert np.all(pl.n_function_calls > 0)
+
+    # The profile does not depend on the order in which the points are solved
+
+    jl.restore_best_fit()
+
+    pl = ProfileLikelihood(jl.minimizer, [index_path])
+
+    for step, result in zip(steps[::-1], results[::-1]):
+
+        assert np.isclose(pl([step]), result, rtol=1e-5)
+
+
+def test_hessian_methods():
+
+    # -log(likelihood) of a correlated 3d gaussian
+
+    covariance = np.array([[1.0, 0.3, 0.1], [0.3, 2.0, -0.4], [0.1, -0.4, 0.5]])
+    inverse = np.linalg.inv(covariance)
+
+    center = np.array([2.0, -5.0, 30.0])
+
+    def function(*x):
+
+        d = np.array(x) - center
+
+        return 0.5 * d.dot(inverse).dot(d)
+
+    minima = np.zeros(3) * np.nan
+    maxima = np.zeros(3) * np.nan
+
+    for method in ('adaptive', 'central'):
+
+        hessian = get_hessian(function, center, minima, maxima, method=method)
+
+        assert np.allclose(hessian, inverse, rtol=1e-4)
+
+
+def test_covariance_methods(joint_likelihood_bn090217206_nai):
+
+    jl = joint_likelihood_bn090217206_nai
+
+    jl.set_minimizer("minuit")
+
+    jl.fit(quiet=True)
+
+    reference = jl.covariance_matrix
+
+    old_method = threeML_config['mle']['covariance method']
+
+    try:
+
+        # scipy does not provide its own estimate, so with 'minimizer' it falls back to central differences
+
+        for minimizer, method in (("scipy", "central"), ("scipy", "minimizer"), ("minuit", "minimizer")):
+
+            threeML_config['mle']['covariance method'] = method
+
+            # Start away from the best fit, so that the minimizer has to build its own estimate
+
+            jl.likelihood_model.bn090217206.spectrum.main.Powerlaw.K = 1.25
+
+            jl.set_minimizer(minimizer)
+
+            jl.fit(quiet=True)
+
+            assert np.allclose(np.sqrt(np.diag(jl.covariance_matrix)), np.sqrt(np.diag(reference)), rtol=0.05)
+
+    finally:
+
+        threeML_config['mle']['covariance method'] = old_method
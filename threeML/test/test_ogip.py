@@ -4,8 +4,9 @@ from threeML import *
 from threeML.io.file_utils import within_directory
 from threeML.plugins.OGIPLike import OGIPLike
 from threeML.plugins.SwiftXRTLike import SwiftXRTLike
+from threeML.utils.OGIP.pha import PHAWrite, read_phaII_columns
 from threeML.utils.OGIP.response import OGIPResponse
-from threeML.utils.spectrum.pha_spectrum import PHASpectrum
+from threeML.utils.spectrum.pha_spectrum import PHASpectrum, PHASpectrumSet
 from threeML.utils.statistics.likelihood_functions import *
 
 __this_dir__ = os.path.join(os.path.abspath(os.path.dirname(__file__)))
@@ -519,6 +520,72 @@ def test_pha_write_no_bkg():
         assert pha_info['pha'].n_channels == len(pha_info['pha'].rates)
 
 
+def test_pha_write_from_spectra():
+    with within_directory(__example_dir):
+
+        ogip = OGIPLike('test_ogip', observation='test.pha{1}')
+
+        pha_info = ogip.get_pha_files()
+
+        # Write three copies of the same spectrum directly, without building plugins
+
+        pha_writer = PHAWrite.from_spectra([pha_info['pha']] * 3, [pha_info['bak']] * 3)
+
+        pha_writer.write('test_write_spectra', overwrite=True)
+
+        with fits.open('test_write_spectra.pha') as f:
+
+            assert f['SPECTRUM'].data['RATE'].shape == (3, pha_info['pha'].n_channels)
+
+        for i in range(1, 4):
+
+            written_ogip = OGIPLike('write_ogip', observation='test_write_spectra.pha{%d}' % i)
+
+            written_info = written_ogip.get_pha_files()
+
+            assert np.allclose(written_info['pha'].rates, pha_info['pha'].rates)
+            assert np.allclose(written_info['pha'].exposure, pha_info['pha'].exposure)
+
+        # All the spectra can be read back at once as well
+
+        columns = read_phaII_columns('test_write_spectra.pha')
+
+        assert columns['counts'].shape == (3, pha_info['pha'].n_channels)
+
+        for i in range(3):
+
+            assert np.allclose(columns['counts'][i], pha_info['pha'].counts, rtol=1e-5)
+            assert np.allclose(columns['exposure'][i], pha_info['pha'].exposure)
+            assert np.all(columns['quality'][i] == pha_info['pha'].quality.to_ogip())
+
+        assert columns['is_poisson'] == pha_info['pha'].is_poisson
+
+        os.remove('test_write_spectra.pha')
+
+
+def test_read_phaII_columns():
+    with within_directory(__example_dir):
+
+        spectrum_set = PHASpectrumSet('glg_cspec_n3_bn080916009_v01.pha', rsp_file='glg_cspec_n3_bn080916009_v07.rsp')
+
+        columns = read_phaII_columns('glg_cspec_n3_bn080916009_v01.pha')
+
+        assert columns['counts'].shape == (len(spectrum_set), spectrum_set.n_channels)
+
+        assert np.allclose(columns['counts'], spectrum_set.counts_per_bin)
+        assert np.allclose(columns['exposure'], spectrum_set.exposure_per_bin)
+        assert np.allclose(columns['sys_errors'], spectrum_set.sys_errors_per_bin)
+        assert np.all(columns['quality'] == np.array([quality.to_ogip() for quality in spectrum_set.quality_per_bin]))
+
+        # (the time intervals of the set are relative to the trigger time)
+
+        assert np.allclose(columns['tstart'] - spectrum_set.reference_time, spectrum_set.time_intervals.start_times)
+        assert np.allclose(columns['tstop'] - spectrum_set.reference_time, spectrum_set.time_intervals.stop_times)
+
+        assert columns['is_poisson']
+        assert columns['count_errors'] is None
+
+
 def test_likelihood_functions():
     obs_cnts = np.array([10])
     obs_bkg = np.array([5])
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 import speclite.filters as spec_filters
 from astromodels import *
@@ -83,6 +84,33 @@ def test_constructor():
 
 
 
+def test_ab_magnitudes():
+
+    model, datalist = get_model_and_datalist()
+
+    grond = datalist.values()[0]
+
+    grond.set_model(model)
+
+    filter_set = grond._filter_set
+
+    for index in (-2.0, -1.5):
+
+        model.grb.spectrum.main.Powerlaw.index = index
+
+        # Reference: the convolution computed by speclite for each filter
+
+        reference = []
+
+        for filter in filter_set.speclite_filters:
+
+            synthetic_flux = filter.convolve_with_function(filter_set._wrapped_model).to('1/(cm2 s)')
+
+            reference.append(-2.5 * np.log10((synthetic_flux / filter.ab_zeropoint.to('1/(cm2 s)')).value))
+
+        assert np.allclose(filter_set.ab_magnitudes(), reference, rtol=1e-10)
+
+
 def test_fit():
 
     model, datalist= get_model_and_datalist()
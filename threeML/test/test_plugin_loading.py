@@ -3,6 +3,8 @@ __author__ = 'drjfunk'
 from threeML.plugins.OGIPLike import OGIPLike
 from threeML.plugins.SwiftXRTLike import SwiftXRTLike
 import os
+import subprocess
+import sys
 from conftest import get_test_datasets_directory
 from threeML.io.file_utils import within_directory
 
@@ -12,6 +14,10 @@ from threeML.io.file_utils import within_directory
 #
 datasets_dir = get_test_datasets_directory()
 
+# Maximum time (in seconds) allowed for "import threeML". Most of it is spent importing astromodels
+
+_IMPORT_TIME_BUDGET = 10.0
+
 
 def test_loading_ogip():
 
@@ -29,3 +35,30 @@ def test_loading_xrt():
                            background=os.path.join(xrt_dir, "xrt_bkg.pha"),
                            response=os.path.join(xrt_dir, "xrt.rmf"),
                            arf_file=os.path.join(xrt_dir, "xrt.arf"))
+
+
+def test_lazy_import():
+
+    # Run in a new interpreter, so that nothing has been imported yet
+
+    heavy_modules = ['threeML.plugins.OGIPLike', 'threeML.classicMLE.joint_likelihood', 'threeML.minimizer.minimization',
+                     'matplotlib.pyplot', 'astroquery', 'ipyparallel']
+
+    code = "import sys, time; t = time.time(); import threeML; print(time.time() - t); " \
+           "print(','.join(m for m in %s if m in sys.modules))" % heavy_modules
+
+    output = subprocess.check_output([sys.executable, '-c', code]).splitlines()
+
+    import_time, loaded_modules = float(output[-2]), output[-1].strip()
+
+    assert import_time < _IMPORT_TIME_BUDGET, "import threeML took %.1f s" % import_time
+
+    assert loaded_modules == '', "import threeML imported %s" % loaded_modules
+
+    # The plugins are imported on first access
+
+    import threeML
+
+    assert threeML.OGIPLike is OGIPLike
+    assert 'OGIPLike' in dir(threeML)
+    assert threeML.is_plugin_available('OGIPLike')
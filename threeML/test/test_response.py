@@ -2,6 +2,7 @@ import numpy as np
 import os
 import pytest
 import warnings
+import astropy.io.fits as pyfits
 
 from threeML.io.package_data import get_path_of_data_file
 from threeML.utils.OGIP.response import InstrumentResponseSet, InstrumentResponse, OGIPResponse
@@ -177,6 +178,22 @@ def test_OGIP_response_arf_rsp_accessors():
     assert rsp.rsp_filename == rsp_file
 
 
+def test_OGIP_response_sparse_matrix():
+
+    # The sparse decompression must give the same matrix as the dense one
+
+    rsp_file = get_path_of_data_file("ogip_test_xmm_pn.rmf")
+
+    rsp = OGIPResponse(rsp_file)
+
+    with pyfits.open(rsp_file) as f:
+
+        sparse_matrix = rsp._read_matrix(f['MATRIX'].data, f['MATRIX'].header, sparse=True)
+
+    assert sparse_matrix.shape == rsp.matrix.shape
+    assert np.allclose(sparse_matrix.toarray(), rsp.matrix)
+
+
 def test_response_write_to_fits1():
 
     matrix, mc_energies, ebounds = get_matrix_elements()
@@ -281,6 +298,11 @@ def test_response_set_constructor():
 
     assert len(rsp_set) == 3
 
+    # Reading the file once must give the same matrices as reading each extension separately
+    for i in range(len(rsp_set)):
+
+        assert np.allclose(rsp_set[i].matrix, OGIPResponse(rsp2_file + '{%i}' % (i + 1)).matrix)
+
     # Now test that we cannot initialize a response set with matrices which have non-contiguous coverage intervals
     matrix, mc_energies, ebounds = get_matrix_elements()
 
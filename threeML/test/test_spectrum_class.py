@@ -134,6 +134,45 @@ def test_spectrum_addition_poisson():
     #spectrum_addition(obs_spectrum_1,obs_spectrum_2,obs_spectrum_incompatible,lambda x,y:x.add_inverse_variance_weighted(y))
 
 
+def test_spectrum_sum():
+    ebounds = ChannelSet.from_list_of_edges(np.array([0,1,2,3,4,5]))
+
+    spectra = [BinnedSpectrum(counts=np.arange(len(ebounds)) + i, count_errors=np.ones(len(ebounds)) * (i + 1),
+                              exposure=i + 1, ebounds=ebounds, is_poisson=False, tstart=i, tstop=i + 1)
+               for i in range(5)]
+
+    total = BinnedSpectrum.sum(spectra)
+
+    reference = spectra[0]
+
+    for spectrum in spectra[1:]:
+
+        reference = reference + spectrum
+
+    assert np.allclose(total.counts, reference.counts)
+    assert np.allclose(total.count_errors, reference.count_errors)
+    assert total.exposure == reference.exposure == 15
+
+    assert total.tstart == 0 and total.tstop == 5
+
+    # The systematic errors are summed in quadrature
+
+    spectra = [BinnedSpectrum(counts=np.arange(len(ebounds)) + i, count_errors=np.ones(len(ebounds)) * (i + 1),
+                              sys_errors=np.ones(len(ebounds)) * 0.1 * (i + 1), exposure=i + 1, ebounds=ebounds,
+                              is_poisson=False, tstart=i, tstop=i + 1)
+               for i in range(5)]
+
+    total = BinnedSpectrum.sum(spectra)
+
+    assert np.allclose(total.sys_errors, 0.1 * np.sqrt(np.sum(np.square(np.arange(1, 6)))))
+
+    assert np.allclose((spectra[0] + spectra[1]).sys_errors, 0.1 * np.sqrt(5))
+
+    # the spectra are not modified
+
+    assert np.allclose(spectra[0].sys_errors, 0.1)
+
+
 def test_spectrum_clone():
     ebounds = ChannelSet.from_list_of_edges(np.array([0,1,2,3,4,5]))
 
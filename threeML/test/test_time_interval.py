@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from threeML.utils.time_interval import TimeInterval, TimeIntervalSet
@@ -488,3 +489,66 @@ def test_time_edges():
 
 
 
+
+
+def test_time_interval_set_vectorized_operations():
+
+    ts = TimeIntervalSet.from_list_of_edges(np.linspace(0, 10, 11))
+
+    # The intervals are created on demand, with the right type
+
+    assert isinstance(ts[3], TimeInterval)
+
+    assert all(isinstance(interval, TimeInterval) for interval in ts)
+
+    assert ts[2:4] == [TimeInterval(2.0, 3.0), TimeInterval(3.0, 4.0)]
+
+    assert np.all(ts.containing_bin([0.5, 3.2, 9.9]) == [0, 3, 9])
+
+    assert ts.containing_bin(5.5) == 5
+
+    # Overlaps and intersections with one interval
+
+    interval = TimeInterval(2.5, 4.5)
+
+    mask = ts.overlaps_with(interval)
+
+    assert np.all(mask == [interval_in_set.overlaps_with(interval) for interval_in_set in ts])
+
+    intersections = ts.intersect(interval)
+
+    assert isinstance(intersections, TimeIntervalSet)
+
+    assert intersections == TimeIntervalSet.from_starts_and_stops([2.5, 3.0, 4.0], [3.0, 4.0, 4.5])
+
+    # Merge of a long chain of overlapping intervals, in random order
+
+    starts = np.arange(100, dtype=float)
+
+    random_state = np.random.RandomState(1234)
+
+    idx = random_state.permutation(100)
+
+    ts = TimeIntervalSet.from_starts_and_stops(starts[idx], starts[idx] + 1.5)
+
+    merged = ts.merge_intersecting_intervals()
+
+    assert len(merged) == 1
+
+    assert merged[0] == TimeInterval(0.0, 100.5)
+
+    with pytest.raises(RuntimeError):
+
+        _ = TimeIntervalSet.from_starts_and_stops([0.0, 2.0], [1.0, 1.0])
+
+    # Shifts and pop do not modify the original set
+
+    ts = TimeIntervalSet.from_list_of_edges([0.0, 1.0, 2.0])
+
+    ts2 = ts + 10.0
+
+    _ = ts2.pop(0)
+
+    assert len(ts) == 2 and len(ts2) == 1
+
+    assert ts[0] == TimeInterval(0.0, 1.0)
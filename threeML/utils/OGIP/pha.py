@@ -60,6 +60,44 @@ class PHAWrite(object):
 
         self._spec_iterator = 1
 
+        # Spectra which are added directly (without a plugin), see from_spectra
+        self._spectra = []
+
+    @classmethod
+    def from_spectra(cls, observed_spectra, background_spectra=None):
+        """
+        Build a PHA writer directly from a list of binned spectra with dispersion, skipping the construction of
+        the OGIPLike plugins. This is much faster when writing thousands of spectra, for example those obtained
+        from the bins of a time series. All the spectra are written as rows of the same PHA Type II file.
+
+        :param observed_spectra: list of BinnedSpectrumWithDispersion (or PHASpectrum) instances
+        :param background_spectra: (optional) list of background spectra of the same length (elements can be None)
+        :return: a PHAWrite instance
+        """
+
+        if background_spectra is None:
+
+            background_spectra = [None] * len(observed_spectra)
+
+        assert len(observed_spectra) == len(background_spectra), "You have to provide one background for each " \
+                                                                   "observed spectrum"
+
+        pha_writer = cls()
+
+        for observed, background in zip(observed_spectra, background_spectra):
+
+            pha_info = {'pha': observed, 'rsp': observed.response}
+
+            if background is not None:
+
+                pha_info['bak'] = background
+
+            pha_writer._spectra.append(pha_info)
+
+        pha_writer._n_spectra = len(pha_writer._spectra)
+
+        return pha_writer
+
     def write(self, outfile_name, overwrite=True, force_rsp_write=False):
         """
         Write a PHA Type II and BAK file for the given OGIP plugin. Automatically determines
@@ -90,6 +128,17 @@ class PHAWrite(object):
 
             self._append_ogip(ogip, force_rsp_write)
 
+        for pha_info in self._spectra:
+
+            observed = pha_info['pha']
+
+            self._append_spectra(pha_info,
+                                 observed.quality.to_ogip(),
+                                 getattr(observed, 'grouping', np.ones(observed.n_channels)),
+                                 observed.tstart,
+                                 observed.tstop,
+                                 force_rsp_write)
+
 
         self._write_phaII(overwrite)
 
@@ -105,8 +154,22 @@ class PHAWrite(object):
         # grab the ogip pha info
         pha_info = ogip.get_pha_files()
 
+        self._append_spectra(pha_info, ogip.quality.to_ogip(), ogip.grouping, ogip.tstart, ogip.tstop,
+                             force_rsp_write)
 
-
+    def _append_spectra(self, pha_info, quality, grouping, tstart, tstop, force_rsp_write):
+        """
+        Add the data of an observed spectrum (and its background, if any) into the data list
+
+        :param pha_info: a dictionary with the observed spectrum ('pha'), the optional background ('bak') and the
+        response ('rsp')
+        :param quality: the OGIP quality of the observed spectrum
+        :param grouping: the OGIP grouping of the observed spectrum
+        :param tstart: start time of the spectrum (or None)
+        :param tstop: stop time of the spectrum (or None)
+        :param force_rsp_write: force the writing of an rsp
+        :return: None
+        """
 
         first_channel = pha_info['rsp'].first_channel
 
@@ -115,9 +178,11 @@ class PHAWrite(object):
 
             if key == 'pha' and 'bak' in pha_info:
 
-                if pha_info[key].background_file is not None:
+                background_file = getattr(pha_info[key], 'background_file', None)
+
+                if background_file is not None:
 
-                    self._backfile[key].append(pha_info[key].background_file)
+                    self._backfile[key].append(background_file)
 
                 else:
 
@@ -131,9 +196,11 @@ class PHAWrite(object):
 
                 self._backfile[key] = None
 
-            if pha_info[key].ancillary_file is not None:
+            ancillary_file = getattr(pha_info[key], 'ancillary_file', None)
+
+            if ancillary_file is not None:
 
-                self._ancrfile[key].append(pha_info[key].ancillary_file)
+                self._ancrfile[key].append(ancillary_file)
 
             else:
 
@@ -162,7 +229,7 @@ class PHAWrite(object):
                         self._out_rsp.append(pha_info['rsp'])
 
 
-            self._rate[key].append(pha_info[key].rates.tolist())
+            self._rate[key].append(pha_info[key].rates)
 
             self._backscal[key].append(pha_info[key].scale_factor)
 
@@ -170,7 +237,7 @@ class PHAWrite(object):
 
                 self._is_poisson[key] = pha_info[key].is_poisson
 
-                self._stat_err[key].append(pha_info[key].rate_errors.tolist())
+                self._stat_err[key].append(pha_info[key].rate_errors)
 
             else:
 
@@ -181,28 +248,28 @@ class PHAWrite(object):
             # simply adds systematic in quadrature to statistical
             # error.
 
-            if pha_info[key].sys_errors.tolist() is not None:  # It returns an array which does not work!
+            if pha_info[key].sys_errors is not None:
 
-                self._sys_err[key].append(pha_info[key].sys_errors.tolist())
+                self._sys_err[key].append(pha_info[key].sys_errors)
 
             else:
 
-                self._sys_err[key].append(np.zeros_like(pha_info[key].rates, dtype=np.float32).tolist())
+                self._sys_err[key].append(np.zeros_like(pha_info[key].rates, dtype=np.float32))
 
             self._exposure[key].append(pha_info[key].exposure)
-            self._quality[key].append(ogip.quality.to_ogip().tolist())
-            self._grouping[key].append(ogip.grouping.tolist())
+            self._quality[key].append(quality)
+            self._grouping[key].append(grouping)
             self._channel[key].append(np.arange(pha_info[key].n_channels, dtype=np.int32) + first_channel)
             self._instrument[key] = pha_info[key].instrument
             self._mission[key] = pha_info[key].mission
 
-            if ogip.tstart is not None:
+            if tstart is not None:
 
-                self._tstart[key].append(ogip.tstart)
+                self._tstart[key].append(tstart)
 
-                if ogip.tstop is not None:
+                if tstop is not None:
 
-                    self._tstop[key].append(ogip.tstop)
+                    self._tstop[key].append(tstop)
 
                 else:
 
@@ -308,6 +375,185 @@ class PHAWrite(object):
 
             rsp2.writeto("%s.rsp" % self._outfile_basename, clobber=True)
 
+def _get_column_or_keyword(data, header, name, n_spectra, n_channels=None):
+    """
+    Return the values of a quantity which can be either a column or a keyword of a PHA II file (see OGIP memo
+    CAL/GEN/92-007), broadcast to one value per spectrum (or per spectrum and channel if n_channels is given)
+
+    :return: an array, or None if the quantity is not in the file
+    """
+
+    if name in data.columns.names:
+
+        values = np.array(data.field(name))
+
+    elif name in header:
+
+        values = np.array(header[name])
+
+    else:
+
+        return None
+
+    shape = (n_spectra,) if n_channels is None else (n_spectra, n_channels)
+
+    return np.array(np.broadcast_to(values, shape))
+
+
+def _get_time(data, header, names, candidates, n_spectra):
+
+    for name in candidates:
+
+        if name in names:
+
+            return _get_column_or_keyword(data, header, name, n_spectra).astype(float)
+
+    return None
+
+
+def read_phaII_columns(pha_file):
+    """
+    Read all the spectra of a PHA Type II file at once, as arrays with one row per spectrum, without building a
+    spectrum (nor a response) for each one of them. This is the counterpart of PHAWrite.from_spectra for reading
+    thousands of spectra.
+
+    :param pha_file: the name of a PHA Type II file
+    :return: a dictionary with the 'counts', the 'count_errors' (None if the spectra are Poisson), the 'sys_errors',
+    the OGIP 'quality' and 'grouping' (all (n_spectra, n_channels) arrays), the 'exposure', 'tstart', 'tstop' and
+    'backscale' (arrays with one element per spectrum, tstart and tstop are None if not in the file), the 'channel'
+    numbers, and 'is_poisson'
+    """
+
+    with fits.open(pha_file) as f:
+
+        try:
+
+            spectrum = f["SPECTRUM"]
+
+        except KeyError:
+
+            raise RuntimeError("The input file %s is not in PHA format" % pha_file)
+
+        data = spectrum.data
+        header = spectrum.header
+
+        if "COUNTS" in data.columns.names:
+
+            data_column_name = "COUNTS"
+
+        elif "RATE" in data.columns.names:
+
+            data_column_name = "RATE"
+
+        else:
+
+            raise RuntimeError("This file does not contain a RATE nor a COUNTS column. "
+                               "This is not a valid PHA file")
+
+        values = np.array(data.field(data_column_name), dtype=float)
+
+        if values.ndim != 2:
+
+            raise RuntimeError("This appears to be a PHA I and not PHA II file")
+
+        n_spectra, n_channels = values.shape
+
+        exposure = _get_column_or_keyword(data, header, "EXPOSURE", n_spectra).astype(float)
+
+        # Everything is returned in counts
+
+        conversion = np.ones(n_spectra) if data_column_name == "COUNTS" else exposure
+
+        counts = values * conversion[:, np.newaxis]
+
+        # As when reading single spectra, POISSERR is assumed to be False if missing and there is a STAT_ERR column
+
+        is_poisson = bool(header.get("POISSERR", "STAT_ERR" not in data.columns.names))
+
+        if is_poisson:
+
+            count_errors = None
+
+        else:
+
+            count_errors = np.array(data.field("STAT_ERR"), dtype=float) * conversion[:, np.newaxis]
+
+        sys_errors = _get_column_or_keyword(data, header, "SYS_ERR", n_spectra, n_channels)
+
+        if sys_errors is None:
+
+            sys_errors = np.zeros((n_spectra, n_channels))
+
+        if "QUALITY" in data.columns.names and data.field("QUALITY").ndim == 1:
+
+            # GBM CSPEC files have one QUALITY value per spectrum instead of one per channel
+
+            quality = np.where(data.field("QUALITY") != 0, 5, 0)[:, np.newaxis] * np.ones((1, n_channels), dtype=int)
+
+        else:
+
+            quality = _get_column_or_keyword(data, header, "QUALITY", n_spectra, n_channels)
+
+            if quality is None:
+
+                quality = np.zeros((n_spectra, n_channels), dtype=int)
+
+        grouping = _get_column_or_keyword(data, header, "GROUPING", n_spectra, n_channels)
+
+        if grouping is None:
+
+            grouping = np.ones((n_spectra, n_channels), dtype=int)
+
+        backscale = _get_column_or_keyword(data, header, "BACKSCAL", n_spectra)
+
+        if backscale is None:
+
+            backscale = np.ones(n_spectra)
+
+        channel = _get_column_or_keyword(data, header, "CHANNEL", n_spectra, n_channels)
+
+        if channel is None:
+
+            channel = np.ones((n_spectra, 1), dtype=int) * np.arange(1, n_channels + 1)
+
+        # Start and stop times. The columns (including TIME and ENDTIME, used instead of TSTART and TSTOP by files
+        # which do not follow the OGIP conventions, like GBM CSPEC) take precedence over the keywords
+
+        tstart = None
+
+        tstop = None
+
+        for names in (data.columns.names, header):
+
+            if tstart is None:
+
+                tstart = _get_time(data, header, names, ("TSTART", "TIME"), n_spectra)
+
+            if tstop is None:
+
+                tstop = _get_time(data, header, names, ("TSTOP", "ENDTIME"), n_spectra)
+
+                if tstop is None and tstart is not None:
+
+                    telapse = _get_time(data, header, names, ("TELAPSE",), n_spectra)
+
+                    if telapse is not None:
+
+                        tstop = tstart + telapse
+
+    return {'counts': counts,
+            'count_errors': count_errors,
+            'sys_errors': sys_errors,
+            'quality': quality,
+            'grouping': grouping,
+            'exposure': exposure,
+            'tstart': tstart,
+            'tstop': tstop,
+            'backscale': backscale,
+            'channel': channel,
+            'is_poisson': is_poisson}
+
+
 def _atleast_2d_with_dtype(value,dtype=None):
 
 
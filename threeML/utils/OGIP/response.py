@@ -1,5 +1,6 @@
 import astropy.io.fits as pyfits
 import numpy as np
+import scipy.sparse
 import warnings
 import matplotlib.cm as cm
 from matplotlib.colors import SymLogNorm
@@ -335,43 +336,66 @@ class OGIPResponse(InstrumentResponse):
 
             rsp_number = 1
 
-        self._rsp_file = rsp_file
-
         # Read the response
         with pyfits.open(rsp_file) as f:
 
-            try:
+            self._read_response(f, rsp_file, rsp_number, arf_file)
+
+    @classmethod
+    def _from_open_file(cls, f, rsp_file, rsp_number, arf_file=None):
+        """
+        Build a response from a FITS file which has been already opened. This is used to avoid re-opening
+        the same file many times when reading all the matrices contained in a .rsp2 file
+
+        :param f: the opened FITS file (HDUList)
+        :param rsp_file: name of the file (used only for bookkeeping)
+        :param rsp_number: number of the MATRIX (or SPECRESP MATRIX) extension to read (starting at 1)
+        :param arf_file: an optional ARF file
+        :return: an OGIPResponse instance
+        """
+
+        instance = cls.__new__(cls)
+
+        instance._read_response(f, rsp_file, rsp_number, arf_file)
 
-                # This is usually when the response file contains only the energy dispersion
+        return instance
 
-                data = f['MATRIX', rsp_number].data
-                header = f['MATRIX', rsp_number].header
+    def _read_response(self, f, rsp_file, rsp_number, arf_file):
 
-                if arf_file is None:
-                    warnings.warn("The response is in an extension called MATRIX, which usually means you also "
-                                  "need an ancillary file (ARF) which you didn't provide. You should refer to the "
-                                  "documentation  of the instrument and make sure you don't need an ARF.")
+        self._rsp_file = rsp_file
+
+        try:
+
+            # This is usually when the response file contains only the energy dispersion
 
-            except Exception as e:
-                warnings.warn("The default choice for MATRIX extension failed:"+repr(e)+\
-                              "available: "+" ".join([repr(e.header.get('EXTNAME')) for e in f]))
+            data = f['MATRIX', rsp_number].data
+            header = f['MATRIX', rsp_number].header
 
-                # Other detectors might use the SPECRESP MATRIX name instead, usually when the response has been
-                # already convoluted with the effective area
+            if arf_file is None:
+                warnings.warn("The response is in an extension called MATRIX, which usually means you also "
+                              "need an ancillary file (ARF) which you didn't provide. You should refer to the "
+                              "documentation  of the instrument and make sure you don't need an ARF.")
 
-                # Note that here we are not catching any exception, because
-                # we have to fail if we cannot read the matrix
+        except Exception as e:
+            warnings.warn("The default choice for MATRIX extension failed:"+repr(e)+\
+                          "available: "+" ".join([repr(e.header.get('EXTNAME')) for e in f]))
 
-                data = f['SPECRESP MATRIX', rsp_number].data
-                header = f['SPECRESP MATRIX', rsp_number].header
+            # Other detectors might use the SPECRESP MATRIX name instead, usually when the response has been
+            # already convoluted with the effective area
 
-            # These 3 operations must be executed when the file is still open
+            # Note that here we are not catching any exception, because
+            # we have to fail if we cannot read the matrix
 
-            matrix = self._read_matrix(data, header)
+            data = f['SPECRESP MATRIX', rsp_number].data
+            header = f['SPECRESP MATRIX', rsp_number].header
 
-            ebounds = self._read_ebounds(f['EBOUNDS'])
+        # These 3 operations must be executed when the file is still open
 
-            mc_channels = self._read_mc_channels(data)
+        matrix = self._read_matrix(data, header)
+
+        ebounds = self._read_ebounds(f['EBOUNDS'])
+
+        mc_channels = self._read_mc_channels(data)
 
         # Now, if there is information on the coverage interval, let's use it
 
@@ -456,7 +480,18 @@ class OGIPResponse(InstrumentResponse):
         """
         return int(self._first_channel)
 
-    def _read_matrix(self, data, header, column_name='MATRIX'):
+    def _read_matrix(self, data, header, column_name='MATRIX', sparse=False):
+        """
+        Decompresses the matrix contained in a MATRIX (or SPECRESP MATRIX) extension. The decompression is
+        vectorized, i.e., the F_CHAN and N_CHAN columns are used to build the indexes of all the elements of the
+        matrix, which are then scattered in the output in one operation.
+
+        :param data: data from the matrix extension
+        :param header: header of the matrix extension
+        :param column_name: name of the column containing the matrix (default: MATRIX)
+        :param sparse: if True, return a scipy.sparse.csr_matrix instead of a dense array (default: False)
+        :return: a n_channels x n_mc_energies matrix
+        """
 
         n_channels = header.get("DETCHANS")
 
@@ -478,48 +513,72 @@ class OGIPResponse(InstrumentResponse):
         # Store the first channel as a property
         self._first_channel = tlmin_fchan
 
-        rsp = np.zeros([data.shape[0], n_channels], float)
+        n_energies = data.shape[0]
 
-        n_grp = data.field("N_GRP")  # type: np.ndarray
+        n_grp = np.array(data.field("N_GRP"), int).reshape(n_energies)
 
         # The numbering of channels could start at 0, or at some other number (usually 1). Of course the indexing
         # of arrays starts at 0. So let's offset the F_CHAN column to account for that
 
-        f_chan = data.field("F_CHAN") - tlmin_fchan  # type: np.ndarray
-        n_chan = data.field("N_CHAN")  # type: np.ndarray
+        f_chan = self._flatten_groups(data.field("F_CHAN"), n_grp).astype(int) - tlmin_fchan
+        n_chan = self._flatten_groups(data.field("N_CHAN"), n_grp).astype(int)
 
-        # In certain matrices where compression has not been used, n_grp, f_chan and n_chan are not array columns,
-        # but simple scalars. Expand then their dimensions so that we don't need to customize the code below.
-        # However, if the columns are variable-length arrays, then they do have ndmin = 1 but have dtype 'object'.
-        # In that case we don't want to add a dimension, as they are essentially a list of arrays.
+        # Now build the (channel, energy) indexes of all the elements of the compressed matrix in one go, instead
+        # of looping over rows and groups
 
-        if n_grp.ndim == 1 and data.field("N_CHAN").dtype != np.object:
-            n_grp = np.expand_dims(n_grp, 1)
+        n_elements_per_row = np.bincount(np.repeat(np.arange(n_energies), n_grp),
+                                         weights=n_chan, minlength=n_energies).astype(int)
 
-        if f_chan.ndim == 1 and data.field("N_CHAN").dtype != np.object:
-            f_chan = np.expand_dims(f_chan, 1)
+        # Position of the first element of each group in the flat array of matrix elements
+        group_starts = np.cumsum(n_chan) - n_chan
 
-        if n_chan.ndim == 1 and data.field("N_CHAN").dtype != np.object:
-            n_chan = np.expand_dims(n_chan, 1)
+        rows = np.repeat(np.arange(n_energies), n_elements_per_row)
+        channels = np.arange(n_chan.sum()) + np.repeat(f_chan - group_starts, n_chan)
 
-        matrix = data.field(column_name)
+        values = self._flatten_groups(data.field(column_name), n_elements_per_row).astype(float)
 
-        for i, row in enumerate(data):
+        if sparse:
 
-            m_start = 0
+            return scipy.sparse.csr_matrix((values, (channels, rows)), shape=(n_channels, n_energies))
 
-            for j in range(n_grp[i]):
+        rsp = np.zeros([n_channels, n_energies], float)
 
-                # This np.squeeze call is needed because some files (for example from Fermi/GBM) contains a vector
-                # column for n_chan, even though all elements are of size 1
-                this_n_chan = int(np.squeeze(n_chan[i][j]))
-                this_f_chan = int(np.squeeze(f_chan[i][j]))
+        rsp[channels, rows] = values
 
-                rsp[i, this_f_chan: this_f_chan + this_n_chan] = matrix[i][m_start:m_start + this_n_chan]
+        return rsp
 
-                m_start += this_n_chan
+    @staticmethod
+    def _flatten_groups(column, n_used):
+        """
+        Returns a flat array containing, for each row of the provided column, only its first n_used[i] elements.
+        This works for scalar columns, fixed-length array columns and variable-length array columns.
+
+        :param column: a column from a MATRIX extension
+        :param n_used: number of elements to use for each row
+        :return: a 1d array
+        """
+
+        if column.dtype == np.object:
+
+            # Variable-length array column: each row is an array of different length, so we need to concatenate
+            # them. This is still much faster than accessing each element
+
+            if len(column) == 0:
+
+                return np.array([], dtype=float)
 
-        return rsp.T
+            return np.concatenate([np.ravel(row)[:n] for row, n in zip(column, n_used)])
+
+        else:
+
+            # Scalar or fixed-length array column. Some files (for example from Fermi/GBM) contain a vector
+            # column for n_chan even though all elements are of size 1, so we reshape to be sure we have a 2d array
+
+            column = np.asarray(column).reshape(len(n_used), -1)
+
+            mask = np.arange(column.shape[1]) < np.asarray(n_used)[:, np.newaxis]
+
+            return column[mask]
 
     @property
     def rsp_filename(self):
@@ -616,15 +675,16 @@ class InstrumentResponseSet(object):
 
         # Create the corresponding list of coverage intervals
 
-        self._coverage_intervals = TimeIntervalSet(map(lambda x: x.coverage_interval,
-                                                       self._matrix_list))
+        coverage_intervals = map(lambda x: x.coverage_interval, self._matrix_list)
 
         # Make sure that all matrices have coverage interval set
 
-        if None in self._coverage_intervals:
+        if None in coverage_intervals:
 
             raise NoCoverageIntervals("You need to specify the coverage interval for all matrices in the matrix_list")
 
+        self._coverage_intervals = TimeIntervalSet(coverage_intervals)
+
         # Remove from the list matrices that cover intervals of zero duration (yes, the GBM publishes those too,
         # one example is in data/ogip_test_gbm_b0.rsp2)
         to_be_removed = []
@@ -655,7 +715,7 @@ class InstrumentResponseSet(object):
         # It is possible that there is only one coverage interval (these are published by GBM e.g. GRB090819607)
         # so we need to be sure that the array is a least 1D
 
-        self._coverage_intervals = TimeIntervalSet(np.atleast_1d(itemgetter(*idx)(self._coverage_intervals)))
+        self._coverage_intervals = self._coverage_intervals.sort()
         self._matrix_list = np.atleast_1d(itemgetter(*idx)(self._matrix_list))
         # Now make sure that the coverage intervals are contiguous (i.e., there are no gaps)
         if not self._coverage_intervals.is_contiguous():
@@ -701,7 +761,7 @@ class InstrumentResponseSet(object):
         # Will fill up the list of matrices
         list_of_matrices = []
 
-        # Read the response
+        # Read the response. We open the file only once and read all the matrices from it
         with pyfits.open(rsp_file) as f:
 
             n_responses = f['PRIMARY'].header['DRM_NUM']
@@ -709,7 +769,7 @@ class InstrumentResponseSet(object):
             # we will read all the matrices and save them
             for rsp_number in range(1, n_responses + 1):
 
-                this_response = OGIPResponse(rsp2_file + '{%i}' % rsp_number)
+                this_response = OGIPResponse._from_open_file(f, rsp_file, rsp_number)
 
                 list_of_matrices.append(this_response)
 
@@ -820,7 +880,7 @@ class InstrumentResponseSet(object):
         # Now mark all responses which overlap with the interval of interest
         # NOTE: this is a mask of the same length as _matrix_list and _coverage_intervals
 
-        matrices_mask = map(lambda c_i: c_i.overlaps_with(interval_of_interest), self._coverage_intervals)
+        matrices_mask = self._coverage_intervals.overlaps_with(interval_of_interest)
 
         # Check that we have at least one matrix
 
@@ -9,7 +9,6 @@ from threeML.exceptions.custom_exceptions import custom_warnings
 from threeML.io.file_utils import file_existing_and_readable
 from threeML.io.progress_bar import progress_bar
 from threeML.plugins.DispersionSpectrumLike import DispersionSpectrumLike
-from threeML.plugins.OGIPLike import OGIPLike
 from threeML.plugins.SpectrumLike import SpectrumLike, NegativeBackground
 from threeML.utils.OGIP.pha import PHAWrite
 from threeML.utils.OGIP.response import InstrumentResponse, InstrumentResponseSet, OGIPResponse
@@ -285,21 +284,85 @@ class TimeSeriesBuilder(object):
         :return: None
         """
 
-        # we simply create a bunch of dispersion plugins and convert them to OGIP
+        # we collect the spectra of all the bins and write them directly as the rows of a PHAII file, without
+        # building a plugin for each bin
 
-
-
-        ogip_list = [OGIPLike.from_general_dispersion_spectrum(sl) for sl in self.to_spectrumlike(from_bins=True,
-                                                                                                  start=start,
-                                                                                                  stop=stop,
-                                                                                                  extract_measured_background=extract_measured_background)]
+        observed_spectra, background_spectra = self._get_spectra_from_bins(start=start,
+                                                                           stop=stop,
+                                                                           extract_measured_background=extract_measured_background)
 
         # write out the PHAII file
 
-        pha_writer = PHAWrite(*ogip_list)
+        pha_writer = PHAWrite.from_spectra(observed_spectra, background_spectra)
 
         pha_writer.write(file_name, overwrite=overwrite, force_rsp_write=force_rsp_write)
 
+    def _get_spectra_from_bins(self, start=None, stop=None, extract_measured_background=False):
+        """
+        Extract the observed and background spectra for each one of the time bins, without creating plugins.
+        Bins with a negative background are skipped (as in to_spectrumlike).
+
+        :param start: optional start time of the bins
+        :param stop: optional stop time of the bins
+        :param extract_measured_background: Use the selected background rather than a polynomial fit to the background
+        :return: a list of observed spectra and a list of background spectra (which can contain None)
+        """
+
+        assert self._time_series.bins is not None, 'This time series does not have any bins!'
+
+        # save the original interval if there is one
+        old_interval = copy.copy(self._active_interval)
+
+        these_bins = self._time_series.bins  # type: TimeIntervalSet
+
+        if start is not None:
+            assert stop is not None, 'must specify a start AND a stop time'
+
+        if stop is not None:
+            assert start is not None, 'must specify a start AND a stop time'
+
+            these_bins = these_bins.containing_interval(start, stop, inner=False)
+
+        observed_spectra = []
+        background_spectra = []
+
+        with progress_bar(len(these_bins), title='Extracting spectra') as p:
+
+            for interval in these_bins:
+
+                self.set_active_time_interval(interval.to_string())
+
+                if extract_measured_background:
+
+                    this_background_spectrum = self._measured_background_spectrum
+
+                else:
+
+                    this_background_spectrum = self._background_spectrum
+
+                if this_background_spectrum is not None and not np.all(this_background_spectrum.counts >= 0):
+
+                    custom_warnings.warn('Something is wrong with interval %s. skipping.' % interval)
+
+                else:
+
+                    observed_spectra.append(self._observed_spectrum)
+                    background_spectra.append(this_background_spectrum)
+
+                p.increase()
+
+        # restore the old interval
+
+        if old_interval is not None:
+
+            self.set_active_time_interval(*old_interval)
+
+        else:
+
+            self._active_interval = None
+
+        return observed_spectra, background_spectra
+
     def get_background_parameters(self):
         """
         Returns a pandas DataFrame containing the background polynomial
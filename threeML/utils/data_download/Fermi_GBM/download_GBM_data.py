@@ -1,6 +1,6 @@
 from threeML.io.file_utils import sanitize_filename, if_directory_not_existing_then_make, file_existing_and_readable
 from threeML.config.config import threeML_config
-from threeML.io.download_from_http import ApacheDirectory, RemoteDirectoryNotFound
+from threeML.io.download_from_http import ApacheDirectory, RemoteDirectoryNotFound, DownloadManager
 from threeML.io.dict_with_pretty_print import DictWithPrettyPrint
 
 from threeML.exceptions.custom_exceptions import TriggerDoesNotExist
@@ -157,33 +157,37 @@ def download_GBM_trigger_data(trigger_name, detectors=None, destination_director
 
             remote_files_info[detname][file_type] = this_file
 
-    # Now download the files
+    # Now download the files. They are all downloaded together, so that the downloads can happen concurrently
 
     download_info = DictWithPrettyPrint([(det, DictWithPrettyPrint()) for det in detectors])
 
+    manager = DownloadManager()
+
     for detector in remote_files_info.keys():
 
         remote_detector_info = remote_files_info[detector]
         local_detector_info = download_info[detector]
 
         # Get CSPEC file
-        local_detector_info['cspec'] = downloader.download(remote_detector_info['cspec'], destination_directory,
-                                                           progress=True)
+        local_detector_info['cspec'] = manager.add(downloader.get_file_url(remote_detector_info['cspec']),
+                                                   destination_directory)
 
         # Get the RSP2 file if it exists, otherwise get the RSP file
         if 'rsp2' in remote_detector_info:
 
-            local_detector_info['rsp'] = downloader.download(remote_detector_info['rsp2'], destination_directory,
-                                                              progress=True)
+            local_detector_info['rsp'] = manager.add(downloader.get_file_url(remote_detector_info['rsp2']),
+                                                     destination_directory)
 
         else:
 
-            local_detector_info['rsp'] = downloader.download(remote_detector_info['rsp'], destination_directory,
-                                                             progress=True)
+            local_detector_info['rsp'] = manager.add(downloader.get_file_url(remote_detector_info['rsp']),
+                                                     destination_directory)
 
         # Get TTE file (compressing it if requested)
-        local_detector_info['tte'] = downloader.download(remote_detector_info['tte'], destination_directory,
-                                                         progress=True, compress=compress_tte)
+        local_detector_info['tte'] = manager.add(downloader.get_file_url(remote_detector_info['tte']),
+                                                 destination_directory, compress=compress_tte)
+
+    manager.download(progress=True, title="Downloading data for trigger %s" % sanitized_trigger_name_)
 
     return download_info
 
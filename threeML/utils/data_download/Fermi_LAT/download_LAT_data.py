@@ -11,7 +11,7 @@ import astropy.io.fits as pyfits
 from threeML.io.file_utils import sanitize_filename
 from threeML.config.config import threeML_config
 from threeML.utils.unique_deterministic_tag import get_unique_deterministic_tag
-from threeML.io.download_from_http import ApacheDirectory
+from threeML.io.download_from_http import ApacheDirectory, DownloadManager
 
 
 # Set default timeout for operations
@@ -358,7 +358,12 @@ def download_LAT_data(ra, dec, radius, tstart, tstop, time_type, data_type='Phot
 
         downloader = ApacheDirectory(remotePath)
 
-        downloaded_files = [downloader.download(filename, destination_directory) for filename in filenames]
+        manager = DownloadManager()
+
+        downloaded_files = [manager.add(downloader.get_file_url(filename), destination_directory)
+                            for filename in filenames]
+
+        manager.download()
 
     else:
 
@@ -2,6 +2,8 @@ import numdifftools as nd
 import numpy as np
 from astromodels import SettingOutOfBounds
 
+from threeML.parallel.parallel_client import ParallelClient, is_parallel_computation_active
+
 
 class ParameterOnBoundary(RuntimeError):
     pass
@@ -122,13 +124,130 @@ def get_jacobian(function, point, minima, maxima):
     return jacobian_vector[0]
 
 
-def get_hessian(function, point, minima, maxima):
+def _get_central_stencil(n_dim):
+    """
+    Returns the offsets (in units of the step along each axis) of all the points needed to compute the Hessian with
+    fixed-step central differences: the center, the two neighbours along each axis and the four corners in each plane
+    (1 + 2 * n_dim**2 points in total)
+
+    :param n_dim: number of dimensions
+    :return: a (n_points, n_dim) array of offsets
+    """
+
+    offsets = [np.zeros(n_dim)]
+
+    for i in range(n_dim):
+
+        for sign in (1, -1):
+
+            this_offset = np.zeros(n_dim)
+            this_offset[i] = sign
+
+            offsets.append(this_offset)
+
+    for i in range(n_dim):
+
+        for j in range(i + 1, n_dim):
+
+            for sign_i, sign_j in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+
+                this_offset = np.zeros(n_dim)
+                this_offset[i] = sign_i
+                this_offset[j] = sign_j
+
+                offsets.append(this_offset)
+
+    return np.array(offsets)
+
+
+def evaluate_points(function, points):
+    """
+    Evaluate the function on all the provided points at once, using the parallel engines if parallel computation is
+    active.
+
+    :param function: the function to evaluate, which takes the coordinates as separate arguments
+    :param points: a (n_points, n_dim) array
+    :return: an array with n_points values
+    """
+
+    def worker(point):
+
+        try:
+
+            return function(*point)
+
+        except SettingOutOfBounds:
+
+            raise CannotComputeHessian("Cannot compute Hessian, parameters out of bounds at %s" % point)
+
+    if is_parallel_computation_active():
+
+        client = ParallelClient()
+
+        values = client.execute_with_progress_bar(worker, list(points))
+
+    else:
+
+        values = map(worker, points)
+
+    return np.array(values, dtype=float)
+
+
+def _get_central_hessian(function, scaled_deltas, scaled_point, orders_of_magnitude, n_dim):
+
+    # Generate the whole stencil up front so that all the points can be evaluated in one batch
+
+    offsets = _get_central_stencil(n_dim)
+
+    points = (scaled_point + offsets * scaled_deltas) * orders_of_magnitude
+
+    values = evaluate_points(function, points)
+
+    center = values[0]
+
+    plus = values[1:2 * n_dim + 1:2]
+    minus = values[2:2 * n_dim + 1:2]
+
+    hessian_matrix = np.diag((plus - 2 * center + minus) / scaled_deltas**2)
+
+    corners = values[2 * n_dim + 1:].reshape(-1, 4)
+
+    for k, (i, j) in enumerate(zip(*np.triu_indices(n_dim, 1))):
+
+        pp, pm, mp, mm = corners[k]
+
+        hessian_matrix[i, j] = hessian_matrix[j, i] = (pp - pm - mp + mm) / (4 * scaled_deltas[i] * scaled_deltas[j])
+
+    return hessian_matrix
+
+
+def get_hessian(function, point, minima, maxima, method='adaptive'):
+    """
+    Compute the Hessian matrix of the function at the given point.
+
+    :param function: the function, which takes the coordinates as separate arguments
+    :param point: the point where to compute the Hessian
+    :param minima: the minimum allowed value for each coordinate (or nan)
+    :param maxima: the maximum allowed value for each coordinate (or nan)
+    :param method: either 'adaptive' (numdifftools with Richardson extrapolation, accurate but it evaluates the
+    function one point at a time), or 'central' (fixed-step central differences, evaluated as one batch of
+    1 + 2 * n_dim**2 points, in parallel if parallel computation is active)
+    :return: the Hessian matrix
+    """
+
+    assert method in ('adaptive', 'central'), "Method must be either 'adaptive' or 'central'"
 
     wrapper, scaled_deltas, scaled_point, orders_of_magnitude, n_dim = _get_wrapper(function, point, minima, maxima)
 
     # Compute the Hessian matrix at best_fit_values
 
-    hessian_matrix_ = nd.Hessian(wrapper, scaled_deltas)(scaled_point)
+    if method == 'adaptive':
+
+        hessian_matrix_ = nd.Hessian(wrapper, scaled_deltas)(scaled_point)
+
+    else:
+
+        hessian_matrix_ = _get_central_hessian(function, scaled_deltas, scaled_point, orders_of_magnitude, n_dim)
 
     # Transform it to numpy matrix
 
@@ -0,0 +1,341 @@
+import collections
+import functools
+
+import astropy.units as u
+import numpy as np
+from astromodels import use_astromodels_memoization
+
+from threeML.utils.fitted_objects.fitted_point_sources import FittedPointSourceSpectralHandler, IntegralFluxConversion
+from threeML.utils.fitted_objects.fitted_source_handler import VariatesContainer
+from threeML.parallel.fork_pool import ForkPool
+
+
+def _transform_flux(conversion, flux_unit, value):
+
+    return conversion * flux_unit * value
+
+
+class _FluxGroup(object):
+
+    def __init__(self, function, parameter_names):
+        """
+        A group of fluxes to compute with the same spectral function (and parameter names), i.e., with the same flux
+        function: the samples of the parameters of all the members are stacked, so that all the integrals can be
+        computed in one vectorized pass on the same energy grid
+
+        :param function: the spectral function of the first member (used to build the flux function)
+        :param parameter_names: the names of the parameters, as accepted by the evaluate method of the function
+        """
+
+        self.function = function
+        self.parameter_names = parameter_names
+
+        # The flux function and the conversion factor are set when the integrals are prepared
+
+        self.flux_function = None
+        self.transform = None
+
+        self.e1 = None
+        self.e2 = None
+
+        self.members = []
+
+        # For each parameter, the list of the samples (or of the fixed values) of the members
+
+        self._parameters = collections.OrderedDict([(name, []) for name in parameter_names])
+
+    def add(self, index, parameters, n_samples):
+
+        self.members.append((index, n_samples))
+
+        for name in self.parameter_names:
+
+            value = parameters[name]
+
+            if isinstance(value, np.ndarray):
+
+                self._parameters[name].append(value)
+
+            else:
+
+                # Fixed parameters can have different values in different analyses, so they are stacked as well
+
+                self._parameters[name].append(np.zeros(n_samples) + value)
+
+    def _get_stacked_parameters(self):
+
+        return dict((name, np.concatenate(values)) for name, values in self._parameters.items())
+
+    def integrate(self):
+        """
+        Compute the integrals for all the members at once
+
+        :return: an array with the samples of all the members, one after the other
+        """
+
+        parameters = self._get_stacked_parameters()
+
+        with use_astromodels_memoization(False):
+
+            with np.errstate(all='ignore'):
+
+                integrals = np.asarray(self.flux_function(self.e1, self.e2, **parameters), dtype=float)
+
+            # Make sure that the function really supports arrays as parameters, by comparing with the integrals for
+            # the first and the last sample computed separately
+
+            n_samples = integrals.shape[0]
+
+            for sample_index in (0, n_samples - 1):
+
+                this_sample = dict((name, float(value[sample_index])) for name, value in parameters.items())
+
+                if not np.allclose(integrals[sample_index], self.flux_function(self.e1, self.e2, **this_sample),
+                                   equal_nan=True):
+
+                    # Integrate one sample at the time
+
+                    return self._integrate_one_by_one(parameters)
+
+        return integrals
+
+    def _integrate_one_by_one(self, parameters):
+
+        n_samples = parameters.values()[0].shape[0]
+
+        integrals = np.zeros(n_samples)
+
+        for sample_index in xrange(n_samples):
+
+            this_sample = dict((name, float(value[sample_index])) for name, value in parameters.items())
+
+            integrals[sample_index] = self.flux_function(self.e1, self.e2, **this_sample)
+
+        return integrals
+
+
+class BatchedPointSourceFlux(object):
+
+    def __init__(self, energy_range, energy_unit, flux_unit, confidence_level=0.68, equal_tailed=True, processes=1):
+        """
+        Compute the integral fluxes (with their uncertainties) of many sources, components and analyses at once.
+
+        The fluxes with the same spectral function are grouped together, and computed in one vectorized pass over
+        the samples of the parameters of all the analyses in the group, with the unit conversion computed once per
+        group. The groups can also be computed in parallel in a pool of processes. Fluxes which cannot be computed in
+        this way (the total flux of composite functions) are computed with FittedPointSourceSpectralHandler.
+
+        > batch = BatchedPointSourceFlux([1.0, 1000.0], 'keV', 'erg/(cm2 s)')
+        > batch.add(analysis_result, 'source_name')
+        > fluxes = batch.compute()
+
+        :param energy_range: the bounds of the integral, as an array (or as an astropy quantity)
+        :param energy_unit: string astropy unit of the energy range
+        :param flux_unit: string astropy unit for the integral flux
+        :param confidence_level: the confidence level of the errors
+        :param equal_tailed: whether to use equal-tailed error intervals or not
+        :param processes: number of processes to use to compute the groups (default: 1, i.e., compute them here)
+        """
+
+        self._energy_range = energy_range
+        self._energy_unit = energy_unit
+        self._flux_unit = flux_unit
+        self._confidence_level = confidence_level
+        self._equal_tailed = equal_tailed
+
+        self._processes = int(processes)
+
+        assert self._processes > 0, "The number of processes must be > 0"
+
+        self._groups = collections.OrderedDict()
+
+        # One element per added flux: either the _FluxGroup containing it, or the FittedPointSourceSpectralHandler
+        # used to compute it
+
+        self._fluxes = []
+
+    def add(self, analysis_result, source, component=None):
+        """
+        Add the flux of a source (or of one of its components) in a given analysis
+
+        :param analysis_result: a 3ML analysis result
+        :param source: the name of the source
+        :param component: the name of the component (as in FittedPointSourceSpectralHandler), or None for the
+        total flux of the source
+        :return: the index of the flux in the list returned by compute()
+        """
+
+        function, parameters = self._get_function_and_parameters(analysis_result, source, component)
+
+        arguments = None
+
+        if function is not None:
+
+            arguments = self._get_arguments(analysis_result, parameters)
+
+        if arguments is None:
+
+            self._fluxes.append(FittedPointSourceSpectralHandler(analysis_result, source, self._energy_range,
+                                                                 self._energy_unit, self._flux_unit,
+                                                                 self._confidence_level, self._equal_tailed,
+                                                                 component=component, is_differential_flux=False))
+
+        else:
+
+            parameter_names = tuple(parameters.keys())
+
+            # The name distinguishes functions of the same class with different data (like template models)
+
+            key = (type(function), function.name, parameter_names)
+
+            if key not in self._groups:
+
+                self._groups[key] = _FluxGroup(function, parameter_names)
+
+            self._groups[key].add(len(self._fluxes), *arguments)
+
+            self._fluxes.append(self._groups[key])
+
+        return len(self._fluxes) - 1
+
+    @staticmethod
+    def _get_function_and_parameters(analysis_result, source, component):
+        """
+        :return: the spectral function and a dictionary of its parameters, with the names used by its evaluate
+        method, or (None, None) if the flux cannot be computed in batch
+        """
+
+        spectral_component = analysis_result.optimized_model.sources[source].spectrum.main
+
+        shape = spectral_component.shape
+
+        try:
+
+            composite_model = spectral_component.composite
+
+        except AttributeError:
+
+            composite_model = None
+
+        if component is None:
+
+            if composite_model is not None:
+
+                # The total flux of a composite function cannot be computed with arrays of parameters
+
+                return None, None
+
+            return shape, collections.OrderedDict((par.name, par) for par in shape.parameters.values())
+
+        function = FittedPointSourceSpectralHandler._solve_for_component_flux(composite_model)[component]['function']
+
+        return function, collections.OrderedDict((par.static_name, par) for par in function.parameters.values())
+
+    @staticmethod
+    def _get_arguments(analysis_result, parameters):
+        """
+        Get the samples of the free parameters and the values of the fixed ones, selecting the same samples as
+        FittedPointSourceSpectralHandler does
+
+        :return: a tuple (dictionary of arguments, number of samples), or None if there are no free parameters
+        """
+
+        arguments = {}
+
+        selected_samples = None
+
+        n_samples = None
+
+        for name, par in parameters.items():
+
+            if par.free:
+
+                this_variate = np.array(analysis_result.get_variates(par.path), dtype=float)
+
+                # Do not use more than 1000 values. We select the same samples for all parameters, so that their
+                # correlation is preserved
+
+                if len(this_variate) > 1000:
+
+                    if selected_samples is None:
+
+                        selected_samples = np.random.choice(len(this_variate), size=1000)
+
+                    this_variate = this_variate[selected_samples]
+
+                arguments[name] = this_variate
+
+                n_samples = len(this_variate)
+
+            else:
+
+                arguments[name] = par.value
+
+        if n_samples is None:
+
+            return None
+
+        return arguments, n_samples
+
+    def _prepare_groups(self):
+
+        energy_unit = u.Unit(self._energy_unit)
+
+        if isinstance(self._energy_range, u.Quantity):
+
+            energy_range = self._energy_range.to('keV', equivalencies=u.spectral())
+
+        else:
+
+            energy_range = (np.asarray(self._energy_range) * energy_unit).to('keV', equivalencies=u.spectral())
+
+        flux_unit = u.Unit(self._flux_unit)
+
+        for group in self._groups.values():
+
+            converter = IntegralFluxConversion(flux_unit, energy_range.unit, group.function.evaluate, group.function)
+
+            group.flux_function = converter.model
+
+            group.transform = functools.partial(_transform_flux, converter.conversion_factor, flux_unit)
+
+            group.e1 = energy_range.value.min()
+            group.e2 = energy_range.value.max()
+
+    def _integrate_groups(self):
+
+        groups = self._groups.values()
+
+        # The groups are not sent to the processes, which inherit them
+
+        with ForkPool(lambda group_index: groups[group_index].integrate(), min(self._processes, len(groups))) as pool:
+
+            return pool.map(range(len(groups)))
+
+    def compute(self):
+        """
+        Compute all the fluxes
+
+        :return: a list with one element per added flux (in the same order), with the samples of the flux and their
+        statistics (median, average, upper_error, lower_error), either as a VariatesContainer or as a
+        FittedPointSourceSpectralHandler. They can be summed together.
+        """
+
+        self._prepare_groups()
+
+        results = list(self._fluxes)
+
+        for group, integrals in zip(self._groups.values(), self._integrate_groups()):
+
+            start = 0
+
+            for index, n_samples in group.members:
+
+                # The output has the same shape as for FittedPointSourceSpectralHandler, i.e., (1, 1)
+
+                results[index] = VariatesContainer([integrals[start: start + n_samples]], (1, 1),
+                                                   self._confidence_level, group.transform, self._equal_tailed)
+
+                start += n_samples
+
+        return results
@@ -6,6 +6,7 @@ import scipy.integrate as integrate
 import collections
 
 
+from threeML.config.config import threeML_config
 from threeML.utils.fitted_objects.fitted_source_handler import GenericFittedSourceHandler
 
 
@@ -148,6 +149,189 @@ class DifferentialFluxConversion(FluxConversion):
                                                          flux_model)
 
 
+def _evaluate_integrand(integrand, x, param_specification, n_rows):
+    """
+    evaluate the integrand on the grid x for all the rows (i.e., the samples) of the parameters at once if the
+    function supports arrays as parameters, or row by row otherwise
+
+    :param integrand: the function to integrate, integrand(x, param_specification)
+    :param x: 1-D array of energies
+    :param param_specification: dictionary of parameters, each either a scalar or an array with n_rows elements
+    :param n_rows: number of rows
+    :return: array with shape (n_rows, len(x))
+    """
+
+    if n_rows > 1:
+
+        broadcasted = dict((name, value[:, np.newaxis] if value.ndim == 1 else value)
+                           for name, value in param_specification.iteritems())
+
+        try:
+
+            with np.errstate(all='ignore'):
+
+                result = np.asarray(integrand(x[np.newaxis, :], broadcasted), dtype=float)
+
+        except Exception:
+
+            result = None
+
+        if result is not None and result.shape == (n_rows, x.shape[0]):
+
+            return result
+
+    # evaluate one row at the time (over the whole grid)
+
+    result = np.zeros((n_rows, x.shape[0]))
+
+    for i in xrange(n_rows):
+
+        with np.errstate(all='ignore'):
+
+            result[i] = integrand(x, _get_row(param_specification, i))
+
+    return result
+
+
+def _get_row(param_specification, i):
+
+    return dict((name, float(value[i]) if value.ndim == 1 else float(value))
+                for name, value in param_specification.iteritems())
+
+
+def _simpson(y, h):
+    """
+    composite Simpson rule along the last axis for equally spaced samples (odd number of points)
+    """
+
+    return h / 3.0 * (y[..., 0] + y[..., -1] + 4.0 * y[..., 1:-1:2].sum(axis=-1) + 2.0 * y[..., 2:-1:2].sum(axis=-1))
+
+
+def integrate_flux(integrand, e1, e2, param_specification, relative_accuracy=1e-5, max_refinements=8):
+    """
+    Integrate the spectral model between e1 and e2 for many samples of the parameters at once.
+
+    The integral is computed with the Simpson rule on a grid equally spaced in log(energy), which is then refined
+    (doubling the number of points) only for the samples which have not reached the requested relative accuracy
+    yet. Samples that do not converge after max_refinements refinements are integrated with scipy.integrate.quad.
+
+    :param integrand: the function to integrate, called as integrand(x, param_specification)
+    :param e1: lower bound of the integral
+    :param e2: upper bound of the integral
+    :param param_specification: dictionary of parameters. Each value can be a scalar or an array of samples
+    :param relative_accuracy: relative accuracy target for the integral
+    :param max_refinements: maximum number of refinements of the grid
+    :return: the integral (a float if all the parameters are scalar, otherwise an array with one element per sample)
+    """
+
+    param_specification = dict((name, np.asarray(value, dtype=float))
+                               for name, value in param_specification.iteritems())
+
+    sample_shape = np.broadcast(*param_specification.values()).shape if len(param_specification) > 0 else ()
+
+    assert len(sample_shape) <= 1, "Parameters must be scalars or 1-D arrays of samples"
+
+    n_rows = sample_shape[0] if len(sample_shape) == 1 else 1
+
+    e1 = float(e1)
+    e2 = float(e2)
+
+    if e1 == e2:
+
+        integrals = np.zeros(n_rows)
+
+    elif e1 <= 0 or e2 <= 0 or e2 < e1:
+
+        # the log grid cannot be used, fall back to quad for everything
+
+        integrals = _quad_integrals(integrand, e1, e2, param_specification, np.arange(n_rows))
+
+    else:
+
+        # In log space the integral of f(x) dx becomes the integral of f(x) x dlog(x)
+
+        log_e1 = np.log(e1)
+        log_e2 = np.log(e2)
+
+        n_intervals = 64
+
+        log_x = np.linspace(log_e1, log_e2, n_intervals + 1)
+
+        x = np.exp(log_x)
+
+        y = _evaluate_integrand(integrand, x, param_specification, n_rows) * x
+
+        integrals = _simpson(y, (log_e2 - log_e1) / n_intervals)
+
+        # rows which still need refinement, and their current samples of the integrand
+
+        to_refine = np.arange(n_rows)
+
+        for _ in range(max_refinements):
+
+            # Add the mid points of the current grid
+
+            n_intervals *= 2
+
+            h = (log_e2 - log_e1) / n_intervals
+
+            new_log_x = log_e1 + h * np.arange(1, n_intervals, 2)
+
+            new_x = np.exp(new_log_x)
+
+            sub_specification = dict((name, value[to_refine] if value.ndim == 1 else value)
+                                     for name, value in param_specification.iteritems())
+
+            new_y = _evaluate_integrand(integrand, new_x, sub_specification, to_refine.shape[0]) * new_x
+
+            refined_y = np.zeros((to_refine.shape[0], n_intervals + 1))
+
+            refined_y[:, ::2] = y
+            refined_y[:, 1::2] = new_y
+
+            refined_integrals = _simpson(refined_y, h)
+
+            with np.errstate(all='ignore'):
+
+                converged = np.abs(refined_integrals - integrals[to_refine]) <= \
+                            relative_accuracy * np.abs(refined_integrals)
+
+            integrals[to_refine] = refined_integrals
+
+            to_refine = to_refine[~converged]
+
+            y = refined_y[~converged]
+
+            if to_refine.shape[0] == 0:
+
+                break
+
+        if to_refine.shape[0] > 0:
+
+            integrals[to_refine] = _quad_integrals(integrand, e1, e2, param_specification, to_refine)
+
+    if len(sample_shape) == 0:
+
+        return float(integrals[0])
+
+    else:
+
+        return integrals
+
+
+def _quad_integrals(integrand, e1, e2, param_specification, rows):
+
+    results = np.zeros(rows.shape[0])
+
+    for j, i in enumerate(rows):
+
+        this_specification = _get_row(param_specification, i)
+
+        results[j] = integrate.quad(lambda e: integrand(np.array([e]), this_specification)[0], e1, e2)[0]
+
+    return results
+
+
 class IntegralFluxConversion(FluxConversion):
 
     def __init__(self, flux_unit, energy_unit, flux_model,test_model):
@@ -179,9 +363,13 @@ class IntegralFluxConversion(FluxConversion):
          def nufnu_integrand(x, param_specification):
              return x * x * flux_model(x, **param_specification)
 
-         self._model_builder = {"photon_flux": lambda e1, e2, **param_specification: integrate.quad(photon_integrand, e1, e2,args=(param_specification))[0],
-                               "energy_flux": lambda e1, e2, **param_specification: integrate.quad(energy_integrand, e1, e2,args=(param_specification))[0],
-                               "nufnu_flux": lambda e1, e2, **param_specification: integrate.quad(nufnu_integrand, e1, e2,args=(param_specification))[0]}
+         # the integrals are computed for all samples of the parameters at once (if they are provided as arrays)
+
+         relative_accuracy = threeML_config['flux calculation']['integration relative accuracy']
+
+         self._model_builder = {"photon_flux": lambda e1, e2, **param_specification: integrate_flux(photon_integrand, e1, e2, param_specification, relative_accuracy),
+                               "energy_flux": lambda e1, e2, **param_specification: integrate_flux(energy_integrand, e1, e2, param_specification, relative_accuracy),
+                               "nufnu_flux": lambda e1, e2, **param_specification: integrate_flux(nufnu_integrand, e1, e2, param_specification, relative_accuracy)}
 
 
          super(IntegralFluxConversion, self).__init__(flux_unit,
@@ -245,6 +433,13 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
             test_model = self._point_source.spectrum.main.shape
             parameter_names = [par.name for par in self._point_source.spectrum.main.shape.parameters.values()]
 
+        if component is not None or self._components is None:
+
+            # for simple (non-composite) functions we use directly the evaluate method, which does not need to set the
+            # values of the parameters and can be used with arrays of parameters to propagate all samples at once
+
+            model = test_model.evaluate
+
 
         energy_unit = u.Unit(energy_unit)
 
@@ -5,6 +5,7 @@ import functools
 import numpy as np
 
 from threeML.io.progress_bar import progress_bar
+from threeML.random_variates import RandomVariates
 from astromodels import use_astromodels_memoization
 
 
@@ -101,6 +102,11 @@ class GenericFittedSourceHandler(object):
 
         arguments = {}
 
+        # Do not use more than 1000 values (would make computation too slow for nothing). We select the same samples
+        # for all parameters, so that their correlation is preserved
+
+        selected_samples = None
+
         # because we might be using composite functions,
         # we have to keep track of parameter names in a non-elegant way
         for par,name in zip(self._parameters.values(), self._parameter_names):
@@ -109,10 +115,13 @@ class GenericFittedSourceHandler(object):
 
                 this_variate = self._analysis_results.get_variates(par.path)
 
-                # Do not use more than 1000 values (would make computation too slow for nothing)
-
                 if len(this_variate) > 1000:
-                    this_variate = np.random.choice(this_variate, size=1000)
+
+                    if selected_samples is None:
+
+                        selected_samples = np.random.choice(len(this_variate), size=1000)
+
+                    this_variate = this_variate[selected_samples]
 
                 arguments[name] = this_variate
 
@@ -122,10 +131,188 @@ class GenericFittedSourceHandler(object):
 
                 arguments[name] = par.value
 
+        self._arguments = arguments
+
         # create the propagtor
 
         self._propagated_function = self._analysis_results.propagate(self._function, **arguments)
 
+    def _evaluate_sample(self, sample_index, *variables):
+        """
+        evaluate the function for one sample of the parameters
+
+        :param sample_index: the index of the sample
+        :param variables: the independent variable(s)
+        :return: the function evaluated at the independent variable(s)
+        """
+
+        arguments = {}
+
+        for name, value in self._arguments.iteritems():
+
+            if isinstance(value, np.ndarray):
+
+                arguments[name] = value[sample_index]
+
+            else:
+
+                arguments[name] = value
+
+        return self._function(*variables, **arguments)
+
+    def _evaluate_on_grid(self, x):
+        """
+        evaluate the function for all samples of the parameters over the whole 1-D grid of the independent variable,
+        which is much faster than propagating the errors point by point.
+
+        First we try to evaluate all samples at once, by broadcasting the parameters against the independent variable
+        (this works if the function is written with numpy operations supporting arrays as parameters). If that fails,
+        we evaluate the function over the whole grid one sample at the time.
+
+        :param x: the 1-D array of values of the independent variable
+        :return: an array with shape (len(x), n_samples), or None if the function cannot be evaluated over the grid
+        """
+
+        free_names = self._get_free_names()
+
+        if len(free_names) == 0:
+
+            return None
+
+        x = np.asarray(x)
+
+        n_samples = len(self._arguments[free_names[0]])
+
+        broadcasted_arguments = {}
+
+        for name, value in self._arguments.iteritems():
+
+            if name in free_names:
+
+                broadcasted_arguments[name] = np.asarray(value)[:, np.newaxis]
+
+            else:
+
+                broadcasted_arguments[name] = value
+
+        with use_astromodels_memoization(False):
+
+            try:
+
+                with np.errstate(all='ignore'):
+
+                    result = np.asarray(self._function(x[np.newaxis, :], **broadcasted_arguments), dtype=float)
+
+            except Exception:
+
+                result = None
+
+            # Make sure the function really supported arrays as parameters, by comparing with the evaluation of
+            # the first and the last sample
+
+            if result is not None and result.shape == (n_samples, x.shape[0]):
+
+                try:
+
+                    for sample_index in (0, n_samples - 1):
+
+                        if not np.allclose(result[sample_index], self._evaluate_sample(sample_index, x),
+                                           equal_nan=True):
+
+                            result = None
+
+                            break
+
+                except Exception:
+
+                    result = None
+
+                if result is not None:
+
+                    return result.T
+
+            # Fall back to evaluate one sample at the time (still over the whole grid)
+
+            result = np.zeros((n_samples, x.shape[0]))
+
+            with progress_bar(n_samples, title="Propagating errors") as p:
+
+                for sample_index in xrange(n_samples):
+
+                    try:
+
+                        this_result = np.asarray(self._evaluate_sample(sample_index, x), dtype=float)
+
+                    except Exception:
+
+                        return None
+
+                    if this_result.shape != x.shape:
+
+                        return None
+
+                    result[sample_index] = this_result
+
+                    p.increase()
+
+        return result.T
+
+    def _get_free_names(self):
+
+        return [name for name, value in self._arguments.iteritems() if isinstance(value, np.ndarray)]
+
+    def _evaluate_point_by_point(self):
+        """
+        evaluate the function at each point of the independent variables for all samples at once, which works if the
+        function supports arrays as parameters (like the integral fluxes).
+
+        :return: a list of arrays of samples (one per point), or None if the function does not support arrays
+        """
+
+        free_names = self._get_free_names()
+
+        if len(free_names) == 0:
+
+            return None
+
+        n_samples = len(self._arguments[free_names[0]])
+
+        arguments = dict((name, np.asarray(value) if name in free_names else value)
+                         for name, value in self._arguments.iteritems())
+
+        variates = []
+
+        with use_astromodels_memoization(False):
+
+            for variables in itertools.product(*self._independent_variable_range):
+
+                try:
+
+                    with np.errstate(all='ignore'):
+
+                        result = np.asarray(self._function(*variables, **arguments), dtype=float)
+
+                    if result.shape != (n_samples,):
+
+                        return None
+
+                    # Make sure that the function really supports arrays as parameters
+
+                    for sample_index in (0, n_samples - 1):
+
+                        if not np.allclose(result[sample_index], self._evaluate_sample(sample_index, *variables),
+                                           equal_nan=True):
+
+                            return None
+
+                except Exception:
+
+                    return None
+
+                variates.append(result)
+
+        return variates
+
     def _evaluate(self):
         """
 
@@ -137,19 +324,34 @@ class GenericFittedSourceHandler(object):
         # if there are independent variables
         if self._independent_variable_range:
 
-            variates = []
+            variates = None
+
+            # if there is only one independent variable, try first to evaluate all samples on the
+            # whole grid
 
-            # scroll through the independent variables
-            n_iterations = np.product(self._out_shape)
+            if len(self._independent_variable_range) == 1:
 
-            with progress_bar(n_iterations, title="Propagating errors") as p:
+                variates = self._evaluate_on_grid(self._independent_variable_range[0])
 
-                with use_astromodels_memoization(False):
+            if variates is None:
 
-                    for variables in itertools.product(*self._independent_variable_range):
-                        variates.append(self._propagated_function(*variables))
+                variates = self._evaluate_point_by_point()
 
-                        p.increase()
+            if variates is None:
+
+                variates = []
+
+                # scroll through the independent variables
+                n_iterations = np.product(self._out_shape)
+
+                with progress_bar(n_iterations, title="Propagating errors") as p:
+
+                    with use_astromodels_memoization(False):
+
+                        for variables in itertools.product(*self._independent_variable_range):
+                            variates.append(self._propagated_function(*variables))
+
+                            p.increase()
 
 
         # otherwise just evaluate
@@ -249,18 +451,16 @@ class VariatesContainer(object):
 
 
 
-        :param values: a flat List of RandomVariates
+        :param values: a flat List of RandomVariates, or an array of samples with shape (n_values, n_samples)
         :param out_shape: the array shape for the output variables
         :param cl: the confidence level to calculate error intervals on
         :param transform: a method to transform the outputs
         :param equal_tailed: whether to use equal-tailed error intervals or not
         """
 
+        self._values = None # type: list
 
-
-        self._values = values # type: list
-
-        self._out_shape = out_shape #type: tuple
+        self._out_shape = tuple(out_shape) #type: tuple
 
         self._cl = cl #type: float
 
@@ -268,61 +468,92 @@ class VariatesContainer(object):
 
         self._transform = transform #type: callable
 
-        # calculate mean and median and transform them into the provided
-        # output shape
+        # gather all the samples in one array with the output shape plus one axis for the samples,
+        # so that all the quantities can be computed at once along the last axis
 
-        self._average = np.array([val.average for val in self._values])
+        samples = np.asarray(values, dtype=float)
 
-        self._average = self._average.reshape(self._out_shape)
+        n_samples = samples.shape[-1]
 
-        self._median = np.array([val.median for val in self._values])
+        self._samples_shape = self._out_shape + (n_samples,)
 
-        self._median = self._median.reshape(self._out_shape)
+        self._samples = samples.reshape(self._samples_shape)
 
-        # construct the error intervals
+        # calculate mean and median
 
-        upper_error = []
-        lower_error = []
+        self._average = self._samples.mean(axis=-1)
 
-        # if equal tailed errors requested
-        if equal_tailed:
+        self._median = np.median(self._samples, axis=-1)
 
-            for val in self._values:
+        # construct the error intervals
+
+        if equal_tailed:
 
-                error = val.equal_tail_interval(self._cl)
-                upper_error.append(error[1])
-                lower_error.append(error[0])
+            self._lower_error, self._upper_error = self._equal_tail_interval(self._samples, self._cl)
 
         else:
 
             # else use the hdp
 
-            for val in self._values:
+            self._lower_error, self._upper_error = self._highest_posterior_density_interval(self._samples, self._cl)
+
+    @staticmethod
+    def _equal_tail_interval(samples, cl):
+        """
+        equal tail interval computed along the last axis of the samples (see RandomVariates.equal_tail_interval)
+
+        :param samples: array of samples
+        :param cl: confidence level
+        :return: (low_bound, hi_bound) arrays
+        """
+
+        assert 0 < cl < 1, "Confidence level must be 0 < cl < 1"
+
+        half_cl = cl / 2.0 * 100.0
+
+        low_bound, hi_bound = np.percentile(samples, [50.0 - half_cl, 50.0 + half_cl], axis=-1)
+
+        return low_bound, hi_bound
+
+    @staticmethod
+    def _highest_posterior_density_interval(samples, cl):
+        """
+        highest posterior density interval computed along the last axis of the samples
+        (see RandomVariates.highest_posterior_density_interval)
+
+        :param samples: array of samples
+        :param cl: credibility level
+        :return: (low_bound, hi_bound) arrays
+        """
+
+        assert 0 < cl < 1, "The credibility level should be 0 < cl < 1"
 
-                error = val.highest_posterior_density_interval(self._cl)
-                upper_error.append(error[1])
-                lower_error.append(error[0])
+        n = samples.shape[-1]
 
-        # reshape the errors into the output shape
+        ordered = np.sort(samples, axis=-1).reshape(-1, n)
 
-        self._upper_error = np.array(upper_error).reshape(self._out_shape)
-        self._lower_error = np.array(lower_error).reshape(self._out_shape)
+        index_of_rightmost_possibility = int(np.floor(cl * n))
 
+        index_of_leftmost_possibility = n - index_of_rightmost_possibility
 
+        # Now compute the width of all intervals that might be the one we are looking for
 
-        samples = []
+        interval_width = ordered[:, index_of_rightmost_possibility:] - ordered[:, :index_of_leftmost_possibility]
 
-        for val in self._values:
+        # This might happen if there are too few values
+        if interval_width.shape[1] == 0:
+            raise RuntimeError('Too few elements for interval calculation')
 
-            samples.append(val.samples)
+        # Find the index of the shortest interval for each value and its extremes
 
-        n_samples = len(samples[0])
+        idx_of_minimum = np.argmin(interval_width, axis=1)
 
-        samples_shape = list(self._out_shape) + [n_samples]
+        rows = np.arange(ordered.shape[0])
 
-        self._samples_shape = tuple(samples_shape)
+        hpd_left_bound = ordered[rows, idx_of_minimum].reshape(samples.shape[:-1])
+        hpd_right_bound = ordered[rows, idx_of_minimum + index_of_rightmost_possibility].reshape(samples.shape[:-1])
 
-        self._samples = np.array(samples).reshape(samples_shape)
+        return hpd_left_bound, hpd_right_bound
 
     @property
     def values(self):
@@ -330,6 +561,14 @@ class VariatesContainer(object):
         :return: the list of of RandomVariates
         """
 
+        # build them only if needed. As for the propagated RandomVariates, the value of each one is its median
+
+        if self._values is None:
+
+            self._values = [RandomVariates(samples, value=median)
+                            for samples, median in zip(self._samples.reshape(-1, self._samples.shape[-1]),
+                                                       np.ravel(self._median))]
+
         return self._values
 
     @property
@@ -392,14 +631,11 @@ class VariatesContainer(object):
 
         assert other._out_shape == self._out_shape, 'cannot sum together arrays with different shapes!'
 
-        # this will get the value container for the other values
+        # the samples of the two containers are summed one by one
 
-        other_values = other.values
+        summed_samples = self._samples + other._samples
 
-
-        summed_values = [v+vo for v,vo in zip(self._values, other_values)]
-
-        return VariatesContainer(summed_values, self._out_shape, self._cl, self._transform, self._equal_tailed)
+        return VariatesContainer(summed_samples, self._out_shape, self._cl, self._transform, self._equal_tailed)
 
     def __radd__(self, other):
 
@@ -409,16 +645,4 @@ class VariatesContainer(object):
 
         else:
 
-            other_values = other.values
-
-            summed_values = [v + vo for v, vo in zip(self._values, other_values)]
-
-            return VariatesContainer(summed_values, self._out_shape, self._cl, self._transform, self._equal_tailed)
-
-
-
-
-
-
-
-
+            return self.__add__(other)
@@ -0,0 +1,282 @@
+import collections
+import functools
+import weakref
+
+import astropy.units as u
+import numpy as np
+
+from threeML.config.config import threeML_config
+from threeML.parallel.fork_pool import ForkPool
+from threeML.utils.fitted_objects.batched_point_source_flux import _transform_flux
+from threeML.utils.fitted_objects.fitted_point_sources import FittedPointSourceSpectralHandler
+from threeML.utils.fitted_objects.fitted_source_handler import VariatesContainer
+
+
+def _compute_spectrum(analysis_result, source, component, energies, flux_unit, confidence_level, equal_tailed,
+                      is_differential_flux):
+    """
+    Propagate the errors on a spectrum with FittedPointSourceSpectralHandler
+
+    :return: a tuple (samples, conversion factor, is_dimensionless), which (contrary to the handler) can be sent back
+    from another process
+    """
+
+    handler = FittedPointSourceSpectralHandler(analysis_result, source, energies, 'keV', flux_unit, confidence_level,
+                                               equal_tailed, component=component,
+                                               is_differential_flux=is_differential_flux)
+
+    return handler.values._samples, handler._conversion, handler.is_dimensionless
+
+
+def _get_energies_in_keV(energy_range, energy_unit):
+
+    if isinstance(energy_range, u.Quantity):
+
+        energy_range = energy_range.to('keV', equivalencies=u.spectral())
+
+    else:
+
+        energy_range = (np.asarray(energy_range) * u.Unit(energy_unit)).to('keV', equivalencies=u.spectral())
+
+    return np.atleast_1d(energy_range.value)
+
+
+class FittedSpectrum(VariatesContainer):
+
+    def __init__(self, samples, confidence_level, equal_tailed, conversion, flux_unit, is_dimensionless):
+        """
+        The propagated samples of a fitted spectrum (or integral flux) with their statistics, detached from the
+        analysis they have been computed from. It has the same interface as FittedPointSourceSpectralHandler for what
+        concerns the results (median, average, upper_error, lower_error, samples, is_dimensionless), and can be summed
+        with other FittedSpectrum instances.
+
+        :param samples: array of samples, with the shape of the output plus one axis for the samples
+        :param confidence_level: the confidence level of the errors
+        :param equal_tailed: whether to use equal-tailed error intervals or not
+        :param conversion: the conversion factor to the flux unit
+        :param flux_unit: astropy flux unit
+        :param is_dimensionless: whether the spectrum is dimensionless
+        """
+
+        samples = np.asarray(samples, dtype=float)
+
+        super(FittedSpectrum, self).__init__(samples, samples.shape[:-1], confidence_level,
+                                             functools.partial(_transform_flux, conversion, u.Unit(flux_unit)),
+                                             equal_tailed)
+
+        self._is_dimensionless = bool(is_dimensionless)
+
+    @property
+    def is_dimensionless(self):
+
+        return self._is_dimensionless
+
+
+class FittedSpectrumCache(object):
+
+    def __init__(self, max_entries=None):
+        """
+        Cache of the fitted spectra (i.e., of the propagation of the errors on the spectra of the sources and of their
+        components), so that plotting again the same spectra (for example with a different style) does not need to
+        propagate the errors again.
+
+        The spectra are cached by analysis result (and are removed when the analysis result is garbage collected), and
+        within each analysis by source, component, energy grid, flux unit, confidence level and type of interval. Only
+        the last max_entries spectra for each analysis are kept.
+
+        :param max_entries: the maximum number of spectra kept for each analysis (default: from the configuration)
+        """
+
+        if max_entries is None:
+
+            max_entries = threeML_config['model plot']['point source plot']['cache size']
+
+        self._max_entries = int(max_entries)
+
+        assert self._max_entries > 0, "The size of the cache must be > 0"
+
+        # analysis result -> OrderedDict(key -> FittedSpectrum)
+
+        self._cache = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _get_key(source, component, energies, flux_unit, confidence_level, equal_tailed, is_differential_flux):
+
+        return (source, component, tuple(energies.tolist()), u.Unit(flux_unit).to_string(), float(confidence_level),
+                bool(equal_tailed), bool(is_differential_flux))
+
+    def _store(self, analysis_result, key, spectrum):
+
+        entries = self._cache.setdefault(analysis_result, collections.OrderedDict())
+
+        entries[key] = spectrum
+
+        while len(entries) > self._max_entries:
+
+            entries.popitem(last=False)
+
+    def _lookup(self, analysis_result, key):
+
+        entries = self._cache.get(analysis_result)
+
+        if entries is None or key not in entries:
+
+            return None
+
+        return entries[key]
+
+    def compute(self, requests, energy_range, energy_unit, flux_unit, confidence_level=0.68, equal_tailed=True,
+                is_differential_flux=True, processes=1):
+        """
+        Compute the spectra which are not in the cache yet, optionally in a pool of processes (one spectrum per
+        task), and store them in the cache
+
+        :param requests: list of (analysis result, source name, component name or None for the total)
+        :param energy_range: the energies (array or astropy quantity)
+        :param energy_unit: string astropy unit of the energies (if they are not a quantity)
+        :param flux_unit: string astropy flux unit
+        :param confidence_level: the confidence level of the errors
+        :param equal_tailed: whether to use equal-tailed error intervals or not
+        :param is_differential_flux: whether to compute the differential flux (True) or the integral flux over the
+        energy range (False)
+        :param processes: number of processes to use (default: 1, i.e., compute them here)
+        :return: list of FittedSpectrum instances, one per request
+        """
+
+        processes = int(processes)
+
+        assert processes > 0, "The number of processes must be > 0"
+
+        energies = _get_energies_in_keV(energy_range, energy_unit)
+
+        keys = [self._get_key(source, component, energies, flux_unit, confidence_level, equal_tailed,
+                              is_differential_flux) for _, source, component in requests]
+
+        spectra = [self._lookup(analysis_result, key) for (analysis_result, _, _), key in zip(requests, keys)]
+
+        # The same spectrum might be requested more than once
+
+        missing = collections.OrderedDict()
+
+        for i, ((analysis_result, source, component), key) in enumerate(zip(requests, keys)):
+
+            if spectra[i] is None:
+
+                missing.setdefault((id(analysis_result), key), []).append(i)
+
+        to_compute = [tuple(requests[indices[0]]) + (energies, flux_unit, confidence_level, equal_tailed,
+                                                     is_differential_flux) for indices in missing.values()]
+
+        # The analysis results are not sent to the processes, which inherit them
+
+        with ForkPool(lambda i: _compute_spectrum(*to_compute[i]), min(processes, len(to_compute))) as pool:
+
+            results = pool.map(range(len(to_compute)))
+
+        for indices, (samples, conversion, is_dimensionless) in zip(missing.values(), results):
+
+            spectrum = FittedSpectrum(samples, confidence_level, equal_tailed, conversion, flux_unit,
+                                      is_dimensionless)
+
+            analysis_result = requests[indices[0]][0]
+
+            self._store(analysis_result, keys[indices[0]], spectrum)
+
+            for i in indices:
+
+                spectra[i] = spectrum
+
+        return spectra
+
+    def get(self, analysis_result, source, energy_range, energy_unit, flux_unit, confidence_level=0.68,
+            equal_tailed=True, component=None, is_differential_flux=True):
+        """
+        Get a fitted spectrum from the cache, computing it if needed. The parameters are the same as for
+        FittedPointSourceSpectralHandler.
+
+        :return: a FittedSpectrum instance
+        """
+
+        return self.compute([(analysis_result, source, component)], energy_range, energy_unit, flux_unit,
+                            confidence_level, equal_tailed, is_differential_flux)[0]
+
+    def export_bands(self, *analysis_results):
+        """
+        Export the cached spectra as arrays, so that they can be saved without having to plot them
+
+        :param analysis_results: the analysis results to export (default: all the ones in the cache)
+        :return: a list of dictionaries (one per cached spectrum) with the source, the component (None for the total
+        spectrum), the energies (in keV), the flux unit, the confidence level, whether the flux is differential, and
+        the median, average, lower bound and upper bound of the flux (as arrays in the flux unit)
+        """
+
+        if not analysis_results:
+
+            analysis_results = self._cache.keys()
+
+        bands = []
+
+        for analysis_result in analysis_results:
+
+            entries = self._cache.get(analysis_result, {})
+
+            for key, spectrum in entries.items():
+
+                source, component, energies, flux_unit, confidence_level, _, is_differential_flux = key
+
+                band = collections.OrderedDict()
+
+                band['analysis type'] = analysis_result.analysis_type
+                band['source'] = source
+                band['component'] = component
+                band['energies'] = np.array(energies)
+                band['flux unit'] = flux_unit
+                band['confidence level'] = confidence_level
+                band['differential'] = is_differential_flux
+                band['median'] = np.asarray(spectrum.median.value)
+                band['average'] = np.asarray(spectrum.average.value)
+                band['lower bound'] = np.asarray(spectrum.lower_error.value)
+                band['upper bound'] = np.asarray(spectrum.upper_error.value)
+
+                bands.append(band)
+
+        return bands
+
+    def clear(self):
+
+        self._cache.clear()
+
+    def __len__(self):
+
+        return sum(len(entries) for entries in self._cache.values())
+
+
+# The cache used by the plotting functions
+
+fitted_spectrum_cache = FittedSpectrumCache()
+
+
+def export_spectral_bands(*analysis_results):
+    """
+    Export the spectra computed by plot_spectra (and cached) as arrays, so that they can be written to disk without
+    matplotlib. For example:
+
+    > plot_spectra(jl.results, use_components=True)
+    > for band in export_spectral_bands(jl.results):
+    >     np.savez("%s_%s.npz" % (band['source'], band['component']), **band)
+
+    :param analysis_results: the analysis results to export (default: all the ones in the cache)
+    :return: a list of dictionaries, see FittedSpectrumCache.export_bands
+    """
+
+    return fitted_spectrum_cache.export_bands(*analysis_results)
+
+
+def clear_spectral_cache():
+    """
+    Remove all the spectra cached by plot_spectra
+
+    :return: none
+    """
+
+    fitted_spectrum_cache.clear()
@@ -74,64 +74,79 @@ class Histogram(IntervalSet):
         :return:
         """
 
-        which_bins = np.digitize(entires, self.edges) - 1
+        # same convention as np.digitize: each bin includes its lower edge but not the upper one.
+        # Entries outside the bins are ignored
 
+        which_bins = np.searchsorted(self.edges, entires, side='right') - 1
 
+        inside = (which_bins >= 0) & (which_bins < len(self))
 
-        for bin in which_bins:
+        self._contents = self._contents + np.bincount(which_bins[inside], minlength=len(self))
 
-            try:
+    def __add__(self, other):
+
+        return self.sum([self, other])
 
-                self._contents[bin] += 1
+    @classmethod
+    def sum(cls, list_of_histograms):
+        """
+        co-add histograms with the same binning in one pass. The contents are summed, while the errors and the
+        systematic errors are summed in quadrature
 
-            except(IndexError):
-                # ignore if we are outside the bins
-                pass
+        :param list_of_histograms: a list of histograms with the same bins, all Poisson or all non-Poisson
+        :return: a new histogram (of the same type as the first one)
+        """
 
+        list_of_histograms = list(list_of_histograms)
 
+        assert len(list_of_histograms) > 0, "Need at least one histogram to sum"
 
+        first = list_of_histograms[0]
 
-    def __add__(self, other):
+        for other in list_of_histograms[1:]:
 
-        assert self == other, "The bins are not equal"
+            assert first == other, "The bins are not equal"
 
-        if self._is_poisson:
+        if first.is_poisson:
 
-            assert other.is_poisson, 'Trying to add a Poisson and non-poisson histogram together'
+            assert all(other.is_poisson for other in list_of_histograms), \
+                'Trying to add a Poisson and non-poisson histogram together'
 
             new_errors = None
 
         else:
 
-            assert not other.is_poisson, 'Trying to add a Poisson and non-poisson histogram together'
+            assert not any(other.is_poisson for other in list_of_histograms), \
+                'Trying to add a Poisson and non-poisson histogram together'
 
-            if self._errors is not None:
+            if first.errors is not None:
 
-                assert other.errors is not None, "This histogram has errors, but the other does not"
+                assert all(other.errors is not None for other in list_of_histograms), \
+                    "This histogram has errors, but the other does not"
 
-                new_errors = np.array([ sqrt_sum_of_squares([e1,e2]) for e1,e2 in zip(self._errors,other.errors)])
+                new_errors = np.sqrt(np.sum(np.square([other.errors for other in list_of_histograms]), axis=0))
 
             else:
 
                 new_errors = None
 
-        if self._sys_errors is not None and other.sys_errors is not None:
+        # histograms without systematic errors do not contribute to them
 
-            new_sys_errors = np.array([ sqrt_sum_of_squares([e1,e2]) for e1,e2 in zip(self._sys_errors,other.sys_errors)])
+        sys_errors = [other.sys_errors for other in list_of_histograms if other.sys_errors is not None]
 
-        elif self._sys_errors is not None:
+        if len(sys_errors) > 1:
 
-            new_sys_errors = self._sys_errors
+            new_sys_errors = np.sqrt(np.sum(np.square(sys_errors), axis=0))
 
-        elif other.sys_errors is not None:
+        elif len(sys_errors) == 1:
 
-            new_sys_errors = other.sys_errors
+            new_sys_errors = sys_errors[0]
 
         else:
 
             new_sys_errors = None
 
-        new_contents = self.contents + other.contents
+        new_contents = np.sum([other.contents for other in list_of_histograms], axis=0)
 
 
         # because Hist gets inherited very deeply, when we add we will not know exactly
@@ -140,7 +155,7 @@ class Histogram(IntervalSet):
         # TODO: better new hist constructor
 
 
-        new_hist = copy.deepcopy(self)
+        new_hist = copy.deepcopy(first)
 
         new_hist._contents = new_contents
         new_hist._errors = new_errors
@@ -171,7 +186,7 @@ class Histogram(IntervalSet):
     @property
     def total(self):
 
-        return sum(self._contents)
+        return np.sum(self._contents)
 
     @property
     def is_poisson(self):
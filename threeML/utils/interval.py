@@ -1,6 +1,5 @@
 import re
 import copy
-from operator import itemgetter, attrgetter
 import numpy as np
 
 
@@ -153,7 +152,9 @@ class Interval(object):
 
 class IntervalSet(object):
     """
-    A set of intervals
+    A set of intervals. The starts and the stops of the intervals are stored in two numpy arrays, so that all the
+    operations on the set are vectorized. The Interval instances (of type INTERVAL_TYPE) are created only when the
+    set is iterated or indexed.
 
     """
 
@@ -161,7 +162,42 @@ class IntervalSet(object):
 
     def __init__(self, list_of_intervals=()):
 
-        self._intervals = list(list_of_intervals)
+        if isinstance(list_of_intervals, IntervalSet):
+
+            # No need to go through the intervals. The arrays are never modified in place, so they can be shared
+
+            self._set_arrays(list_of_intervals._starts, list_of_intervals._stops)
+
+        else:
+
+            list_of_intervals = list(list_of_intervals)
+
+            self._set_arrays([interval.start for interval in list_of_intervals],
+                             [interval.stop for interval in list_of_intervals])
+
+    def _set_arrays(self, starts, stops):
+
+        # NOTE: these arrays must never be modified in place, as they might be shared with other sets
+
+        self._starts = np.asarray(starts, dtype=float).reshape(-1)
+        self._stops = np.asarray(stops, dtype=float).reshape(-1)
+
+    @classmethod
+    def _from_arrays(cls, starts, stops):
+        """
+        Create a new set of this type from the arrays of starts and stops, without creating the intervals. The arrays
+        are not checked, so use this only with arrays coming from a valid set
+
+        :param starts: array of starts
+        :param stops: array of stops
+        :return: interval set
+        """
+
+        interval_set = IntervalSet()
+
+        interval_set._set_arrays(starts, stops)
+
+        return cls.new(interval_set)
 
     @classmethod
     def new(cls, *args, **kwargs):
@@ -228,12 +264,19 @@ class IntervalSet(object):
         assert len(starts) == len(stops), 'starts length: %d and stops length: %d must have same length' % (
         len(starts), len(stops))
 
-        list_of_intervals = []
+        starts = np.array(starts, dtype=float)
+        stops = np.array(stops, dtype=float)
 
-        for imin, imax in zip(starts, stops):
-            list_of_intervals.append(cls.new_interval(imin, imax))
+        inverted = np.where(stops < starts)[0]
 
-        return cls(list_of_intervals)
+        if len(inverted) > 0:
+
+            # Same error as Interval
+
+            raise RuntimeError("Invalid time interval! TSTART must be before TSTOP and TSTOP-TSTART >0. "
+                               "Got tstart = %s and tstop = %s" % (starts[inverted[0]], stops[inverted[0]]))
+
+        return cls._from_arrays(starts, stops)
 
     @classmethod
     def from_list_of_edges(cls, edges):
@@ -248,14 +291,9 @@ class IntervalSet(object):
         """
         # sort the time edges
 
-        edges.sort()
+        edges = np.sort(np.array(edges, dtype=float))
 
-        list_of_intervals = []
-
-        for imin, imax in zip(edges[:-1], edges[1:]):
-            list_of_intervals.append(cls.new_interval(imin, imax))
-
-        return cls(list_of_intervals)
+        return cls._from_arrays(edges[:-1], edges[1:])
 
     def merge_intersecting_intervals(self, in_place=False):
         """
@@ -266,103 +304,113 @@ class IntervalSet(object):
         :return:
         """
 
-        # get a copy of the sorted intervals
+        if len(self) == 0:
 
-        sorted_intervals = self.sort()
+            new_starts, new_stops = self._starts, self._stops
 
-        new_intervals = []
+        else:
 
-        while (len(sorted_intervals) > 1):
+            idx = self.argsort()
 
-            # pop the first interval off the stack
+            starts = self._starts[idx]
+            stops = self._stops[idx]
 
-            this_interval = sorted_intervals.pop(0)
+            # Since the intervals are sorted by start, an interval begins a new group of intersecting intervals if
+            # it starts after the end of all the previous ones (touching intervals are not merged)
 
-            # see if that interval overlaps with the the next one
+            max_previous_stops = np.maximum.accumulate(stops)[:-1]
 
-            if this_interval.overlaps_with(sorted_intervals[0]):
+            new_group = np.concatenate(([True], starts[1:] >= max_previous_stops))
 
-                # if so, pop the next one
+            group_idx = np.where(new_group)[0]
 
-                next_interval = sorted_intervals.pop(0)
+            new_starts = starts[group_idx]
+            new_stops = np.maximum.reduceat(stops, group_idx)
 
-                # and merge the two, appending them to the new intervals
+        if in_place:
 
-                new_intervals.append(this_interval.merge(next_interval))
+            self._set_arrays(new_starts, new_stops)
 
-            else:
+        else:
 
-                # otherwise just append this interval
+            return self._from_arrays(new_starts, new_stops)
 
-                new_intervals.append(this_interval)
+    def overlaps_with(self, interval):
+        """
+        Returns a mask of the intervals of the set which overlap with the provided one (see Interval.overlaps_with)
 
-                # now if there is only one interval left
-                # it should not overlap with any other interval
-                # and the loop will stop
-                # otherwise, we continue
+        :param interval: an Interval instance
+        :return: boolean array
+        """
 
-        # if there was only one interval
-        # or a leftover from the merge
-        # we append it
-        if sorted_intervals:
+        starts = self._starts
+        stops = self._stops
 
-            assert len(
-                sorted_intervals) == 1, "there should only be one interval left over, this is a bug"  # pragma: no cover
+        return ((interval.start == starts) | (interval.stop == stops) |
+                ((interval.start > starts) & (interval.start < stops)) |
+                ((interval.stop > starts) & (interval.stop < stops)) |
+                ((interval.start < starts) & (interval.stop > stops)))
 
-            # we want to make sure that the last new interval did not
-            # overlap with the final interval
-            if new_intervals:
+    def intersect(self, interval):
+        """
+        Returns a new set with the intersections between the intervals of this set and the provided one. The
+        intervals not overlapping with the provided one are dropped.
 
-                if new_intervals[-1].overlaps_with(sorted_intervals[0]):
+        :param interval: an Interval instance
+        :return: new interval set
+        """
 
-                    new_intervals[-1] = new_intervals[-1].merge(sorted_intervals[0])
+        mask = self.overlaps_with(interval)
 
-                else:
+        return self._from_arrays(np.maximum(self._starts[mask], interval.start),
+                                 np.minimum(self._stops[mask], interval.stop))
 
-                    new_intervals.append(sorted_intervals[0])
+    def extend(self, list_of_intervals):
 
+        other = list_of_intervals if isinstance(list_of_intervals, IntervalSet) else IntervalSet(list_of_intervals)
 
-            else:
+        self._set_arrays(np.concatenate((self._starts, other._starts)), np.concatenate((self._stops, other._stops)))
 
-                new_intervals.append(sorted_intervals[0])
+    def __len__(self):
 
-        if in_place:
+        return self._starts.shape[0]
 
-            self.__init__(new_intervals)
+    def __iter__(self):
 
-        else:
+        for start, stop in zip(self._starts, self._stops):
+            yield self.new_interval(start, stop)
 
-            return self.new(new_intervals)
+    def __getitem__(self, item):
 
-    def extend(self, list_of_intervals):
+        if isinstance(item, (int, np.integer)):
 
-        self._intervals.extend(list_of_intervals)
+            return self.new_interval(self._starts[item], self._stops[item])
 
-    def __len__(self):
+        # Slices and arrays of indexes (or masks) return a list of intervals
 
-        return len(self._intervals)
+        idx = np.arange(len(self))[item]
 
-    def __iter__(self):
+        return [self.new_interval(self._starts[i], self._stops[i]) for i in idx]
 
-        for interval in self._intervals:
-            yield interval
+    def __eq__(self, other):
 
-    def __getitem__(self, item):
+        if len(self) != len(other):
 
-        return self._intervals[item]
+            return False
 
-    def __eq__(self, other):
+        idx_this = self.argsort()
+        idx_other = other.argsort()
 
-        for interval_this, interval_other in zip(self.argsort(), other.argsort()):
+        return (np.array_equal(self._starts[idx_this], other._starts[idx_other]) and
+                np.array_equal(self._stops[idx_this], other._stops[idx_other]))
 
-            if not self[interval_this] == other[interval_other]:
-                return False
+    def pop(self, index):
 
-        return True
+        interval = self[index]
 
-    def pop(self, index):
+        self._set_arrays(np.delete(self._starts, index), np.delete(self._stops, index))
 
-        return self._intervals.pop(index)
+        return interval
 
     def sort(self):
         """
@@ -377,7 +425,9 @@ class IntervalSet(object):
 
         else:
 
-            return self.new(np.atleast_1d(itemgetter(*self.argsort())(self._intervals)))
+            idx = self.argsort()
+
+            return self._from_arrays(self._starts[idx], self._stops[idx])
 
     def argsort(self):
         """
@@ -386,10 +436,9 @@ class IntervalSet(object):
         :return:
         """
 
-        # Gather all tstarts
-        tstarts = map(lambda x: x.start, self._intervals)
+        # NOTE: use a stable sort, so that intervals with the same start keep their order
 
-        return map(lambda x: x[0], sorted(enumerate(tstarts), key=itemgetter(1)))
+        return np.argsort(self._starts, kind='mergesort').tolist()
 
     def is_contiguous(self, relative_tolerance=1e-5):
         """
@@ -399,10 +448,7 @@ class IntervalSet(object):
         :return: True or False
         """
 
-        starts = map(attrgetter("start"), self._intervals)
-        stops = map(attrgetter("stop"), self._intervals)
-
-        return np.allclose(starts[1:], stops[:-1], rtol=relative_tolerance)
+        return np.allclose(self._starts[1:], self._stops[:-1], rtol=relative_tolerance)
 
     @property
     def is_sorted(self):
@@ -411,18 +457,18 @@ class IntervalSet(object):
         :return: True or False
         """
 
-        return np.all(self.argsort() == np.arange(len(self)))
+        return bool(np.all(self._starts[1:] >= self._starts[:-1]))
 
     def containing_bin(self, value):
         """
         finds the index of the interval containing
-        :param value:
-        :return:
+        :param value: a value or an array of values
+        :return: the index (or array of indexes) of the intervals
         """
 
         # Get the index of the first ebounds upper bound larger than energy
         # (but never go below zero or above the last channel)
-        idx = min(max(0, np.searchsorted(self.edges, value) - 1), len(self))
+        idx = np.clip(np.searchsorted(self.edges, value) - 1, 0, len(self))
 
         return idx
 
@@ -439,12 +485,11 @@ class IntervalSet(object):
         :return:
         """
 
-        # loop only once because every call unpacks the array
         # we need to round for the comparison because we may have read from
         # strings which are rounded to six decimals
 
-        starts = np.round(self.starts,decimals=6)
-        stops = np.round(self.stops,decimals=6)
+        starts = np.round(self._starts,decimals=6)
+        stops = np.round(self._stops,decimals=6)
 
         start = np.round(start,decimals=6)
         stop = np.round(stop, decimals=6)
@@ -469,40 +514,37 @@ class IntervalSet(object):
 
         else:
 
-            return self.new(np.asarray(self._intervals)[condition])
-
-
-
+            return self._from_arrays(self._starts[condition], self._stops[condition])
 
     @property
     def starts(self):
         """
         Return the starts fo the set
 
-        :return: list of start times
+        :return: array of start times
         """
 
-        return [interval.start for interval in self._intervals]
+        return self._starts
 
     @property
     def stops(self):
         """
         Return the stops of the set
 
-        :return:
+        :return: array of stop times
         """
 
-        return [interval.stop for interval in self._intervals]
+        return self._stops
 
     @property
     def mid_points(self):
 
-        return np.array([interval.mid_point for interval in self._intervals])
+        return (self._starts + self._stops) / 2.0
 
     @property
     def widths(self):
 
-        return np.array([interval._get_width() for interval in self._intervals])
+        return self._stops - self._starts
 
     @property
     def absolute_start(self):
@@ -511,7 +553,7 @@ class IntervalSet(object):
         :return:
         """
 
-        return min(self.starts)
+        return self._starts.min()
 
     @property
     def absolute_stop(self):
@@ -520,7 +562,7 @@ class IntervalSet(object):
         :return:
         """
 
-        return max(self.stops)
+        return self._stops.max()
 
     @property
     def edges(self):
@@ -531,8 +573,7 @@ class IntervalSet(object):
 
         if self.is_contiguous() and self.is_sorted:
 
-            edges = [interval.start for interval in itemgetter(*self.argsort())(self._intervals)]
-            edges.append([interval.stop for interval in itemgetter(*self.argsort())(self._intervals)][-1])
+            edges = np.append(self._starts, self._stops[-1])
 
         else:
 
@@ -548,7 +589,7 @@ class IntervalSet(object):
         :return:
         """
 
-        return ','.join([interval.to_string() for interval in self._intervals])
+        return ','.join([interval.to_string() for interval in self])
 
     @property
     def bin_stack(self):
@@ -560,4 +601,4 @@ class IntervalSet(object):
         :return:
         """
 
-        return np.vstack((self.starts, self.stops)).T
+        return np.vstack((self._starts, self._stops)).T
@@ -0,0 +1,108 @@
+import importlib
+import sys
+import traceback
+import types
+
+
+class LazyModule(types.ModuleType):
+
+    def __init__(self, module, lazy_attributes, on_import_error=None):
+        """
+        A module which imports some of its attributes only when they are accessed for the first time. This is used to
+        replace a package in sys.modules at the end of its __init__, so that "import package" does not import all
+        its (possibly heavy) subpackages.
+
+        "from package import *" still works as expected, but it imports all the lazy attributes (leaving out those
+        which cannot be imported).
+
+        :param module: the module to replace. All its attributes are copied in the new module
+        :param lazy_attributes: a dictionary attribute name -> name of the module where the attribute is defined
+        :param on_import_error: a function called with the attribute name and the traceback if the module of a lazy
+        attribute cannot be imported (optional)
+        """
+
+        super(LazyModule, self).__init__(module.__name__, module.__doc__)
+
+        self.__dict__.update(module.__dict__)
+
+        # In python 2 the globals of a module are cleared when the module is garbage collected, which would
+        # break the functions defined in the original module. Keep it alive
+
+        self.__dict__['_LazyModule__original_module'] = module
+
+        self.__dict__['_LazyModule__lazy_attributes'] = dict(lazy_attributes)
+
+        self.__dict__['_LazyModule__on_import_error'] = on_import_error
+
+    def __getattr__(self, name):
+
+        # This is called only if the attribute has not been found with the normal lookup
+
+        try:
+
+            module_name = self.__lazy_attributes[name]
+
+        except KeyError:
+
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+
+        try:
+
+            module = importlib.import_module(module_name)
+
+            value = getattr(module, name)
+
+        except:
+
+            if self.__on_import_error is not None:
+
+                self.__on_import_error(name, traceback.format_exc())
+
+            raise ImportError("Could not import %s from %s:\n%s" % (name, module_name, sys.exc_info()[1]))
+
+        # Cache the attribute, so the next time it will be found with the normal lookup. Add it to the original
+        # module as well, so it is available to the functions defined there
+
+        setattr(self, name, value)
+
+        setattr(self.__original_module, name, value)
+
+        return value
+
+    def __dir__(self):
+
+        return sorted(set(self.__dict__.keys()) | set(self.__lazy_attributes.keys()))
+
+    @property
+    def lazy_attributes(self):
+        """
+        :return: the names of the attributes which are (or were) imported lazily
+        """
+
+        return sorted(self.__lazy_attributes.keys())
+
+    @property
+    def __all__(self):
+
+        # This is used by "from package import *": import all the lazy attributes, leaving out those which cannot
+        # be imported
+
+        names = [name for name in self.__dict__.keys() if not name.startswith("_")]
+
+        for name in self.lazy_attributes:
+
+            if name in names:
+
+                continue
+
+            try:
+
+                _ = getattr(self, name)
+
+            except ImportError:
+
+                continue
+
+            names.append(name)
+
+        return names
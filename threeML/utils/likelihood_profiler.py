@@ -0,0 +1,205 @@
+import collections
+from timeit import default_timer
+
+import numpy as np
+import pandas as pd
+
+
+def _get_timed_function(function, record):
+    """
+    Wrap a function so that each call increments the number of calls and the total time stored in record
+
+    :param function: the function (or bound method) to wrap
+    :param record: a list [number of calls, total time], updated in place
+    :return: the wrapped function
+    """
+
+    def timed_function(*args, **kwargs):
+
+        start = default_timer()
+
+        try:
+
+            return function(*args, **kwargs)
+
+        finally:
+
+            record[0] += 1
+            record[1] += default_timer() - start
+
+    return timed_function
+
+
+class LikelihoodProfiler(object):
+
+    def __init__(self, data_list, likelihood_method='get_log_like'):
+        """
+        Collect the wall time and the number of calls spent in each plugin, and in each stage of the computation of
+        the likelihood within the plugin, while the profiler is active. Use it as a context manager:
+
+        > with LikelihoodProfiler(jl.data_list, 'inner_fit') as profiler:
+        >     jl.fit()
+        >
+        > profiler.summary
+
+        When the profiler is active, the likelihood method of each plugin (and the methods corresponding to the stages
+        declared by the plugin, see PluginPrototype._get_profiled_stages) are replaced with timed versions on the
+        instance. They are restored when the profiler exits, so there is no overhead when the profiler is not in use.
+
+        NOTE: only the computations happening in this process are measured (i.e., not those happening on parallel
+        engines or in sub-processes)
+
+        :param data_list: the datasets to profile (a DataList instance or any dictionary name -> plugin)
+        :param likelihood_method: the method of the plugins which is called by the analysis to compute the
+        likelihood ('get_log_like' for a Bayesian analysis, 'inner_fit' for a maximum likelihood analysis)
+        """
+
+        self._plugins = collections.OrderedDict(zip(data_list.keys(), data_list.values()))
+
+        self._likelihood_method = str(likelihood_method)
+
+        # (plugin name, stage) -> [number of calls, total time]. The first stage of each plugin is the likelihood
+        # method, the others are the stages declared by the plugin
+
+        self._records = collections.OrderedDict()
+
+        # List of (owner, attribute, original value in the instance dictionary (or None), timed function)
+
+        self._installed = []
+
+        self._wall_time = 0.0
+
+        self._start = None
+
+    def __enter__(self):
+
+        self._records = collections.OrderedDict()
+
+        for name, plugin in self._plugins.items():
+
+            stages = [('statistic', plugin, self._likelihood_method)] + list(plugin._get_profiled_stages())
+
+            for stage, owner, attribute in stages:
+
+                self._install(name, stage, owner, attribute)
+
+        self._start = default_timer()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self._wall_time = default_timer() - self._start
+
+        self._restore()
+
+        return False
+
+    def _install(self, name, stage, owner, attribute):
+
+        record = [0, 0.0]
+
+        self._records[(name, stage)] = record
+
+        timed_function = _get_timed_function(getattr(owner, attribute), record)
+
+        self._installed.append((owner, attribute, owner.__dict__.get(attribute), timed_function))
+
+        setattr(owner, attribute, timed_function)
+
+    def _restore(self):
+
+        # Restore in reverse order, in case the same attribute has been wrapped more than once
+
+        while len(self._installed) > 0:
+
+            owner, attribute, original, timed_function = self._installed.pop()
+
+            if owner.__dict__.get(attribute) is not timed_function:
+
+                # The attribute has been replaced while profiling (for example because the model has been set again),
+                # leave the new value alone
+
+                continue
+
+            if original is None:
+
+                # This was a method of the class, just remove the wrapper from the instance
+
+                delattr(owner, attribute)
+
+            else:
+
+                setattr(owner, attribute, original)
+
+    @property
+    def wall_time(self):
+        """
+        :return: the total time spent within the profiler (in seconds)
+        """
+
+        return self._wall_time
+
+    @property
+    def summary(self):
+        """
+        Summary of the profiling, indexed by (plugin name, stage). For each plugin, the 'total' row contains the time
+        spent in the plugin overall, the others the time spent in each stage excluding the time spent in the stages
+        nested within it. The ('total', 'other') row contains the time not spent within the plugins (i.e., within the
+        minimizer or the sampler, updating the parameters and so on).
+
+        :return: a pandas DataFrame with the number of calls, the time (in s), the time per call (in ms) and the
+        fraction of the total wall time
+        """
+
+        index = []
+        n_calls = []
+        times = []
+
+        plugins_time = 0.0
+
+        for name in self._plugins.keys():
+
+            stages = [(stage, record) for (plugin_name, stage), record in self._records.items()
+                      if plugin_name == name]
+
+            # Each stage is called within the previous one (see PluginPrototype._get_profiled_stages), so the
+            # exclusive time of a stage is its time minus the time spent in the next one
+
+            total_calls, total_time = stages[0][1]
+
+            for i, (stage, (this_calls, this_time)) in enumerate(stages):
+
+                if i < len(stages) - 1:
+
+                    this_time -= stages[i + 1][1][1]
+
+                index.append((name, stage))
+                n_calls.append(this_calls)
+                times.append(this_time)
+
+            index.append((name, 'total'))
+            n_calls.append(total_calls)
+            times.append(total_time)
+
+            plugins_time += total_time
+
+        index.append(('total', 'other'))
+        n_calls.append(0)
+        times.append(self._wall_time - plugins_time)
+
+        index.append(('total', 'wall time'))
+        n_calls.append(0)
+        times.append(self._wall_time)
+
+        times = np.array(times)
+        n_calls = np.array(n_calls)
+
+        data = collections.OrderedDict()
+
+        data['n_calls'] = n_calls
+        data['time (s)'] = times
+        data['time per call (ms)'] = np.where(n_calls > 0, times / np.maximum(n_calls, 1) * 1000.0, np.nan)
+        data['fraction'] = times / self._wall_time if self._wall_time > 0 else np.nan
+
+        return pd.DataFrame(data, index=pd.MultiIndex.from_tuples(index, names=['plugin', 'stage']))
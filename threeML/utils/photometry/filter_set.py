@@ -63,6 +63,10 @@ class FilterSet(object):
         # haven't set a likelihood model yet
         self._model_set = False
 
+        # the quadrature used to compute the magnitudes is computed when the model is set
+
+        self._quadrature_weights = None
+
         # calculate the FWHM
 
         self._calculate_fwhm()
@@ -133,36 +137,79 @@ class FilterSet(object):
 
         self._wrapped_model = wrapped_model
 
+        self._differential_flux = differential_flux
+
+        if self._quadrature_weights is None:
+
+            self._compute_quadrature()
+
         self._model_set = True
 
-    def ab_magnitudes(self):
+    def _compute_quadrature(self):
         """
-        return the effective stimulus of the model and filter for the given
-        magnitude system
-        :return: np.ndarray of ab magnitudes
+        precompute the union of the wavelength grids of the filters (and the corresponding energies) and a
+        (n_bands x n_wavelengths) matrix which, multiplied by the wrapped model evaluated on that grid, gives the
+        ratio between the synthetic flux and the AB zero point of each filter. This is the same photon-weighted
+        trapezoidal integral that speclite computes on the grid of each filter, with all the unit conversions
+        already included
+        :return:
         """
 
-        assert self._model_set, 'no likelihood model has been set'
+        # speclite trims the leading and trailing zeros of the response, so the grids do not cover the same range
 
-        # speclite has issues with unit conversion
-        # so we will do the calculation manually here
+        self._wavelengths = np.unique(np.concatenate([filter._wavelength for filter in self._filters]))
 
-        ratio = []
+        hc = (constants.h * constants.c).to('erg * Angstrom')
 
-        for filter in self._filters:
+        self._energies = (hc / (self._wavelengths * astro_units.Angstrom)).to('keV').value
+
+        # this is the factor that wrapped_model applies to the differential flux (see set_model)
+
+        conversion_factor = (constants.c ** 2 * constants.h ** 2).to('keV2 * cm2').value
+
+        self._wavelength_factors = conversion_factor / self._wavelengths ** 3
 
-            # first get the flux and convert it to base units
-            synthetic_flux = filter.convolve_with_function(self._wrapped_model).to('1/(cm2 s)')
+        # units of wrapped_model times the photon weight (lambda / hc) times the wavelength step
 
-            # normalize it to the filter's AB magnitude
+        unit_factor = (astro_units.Unit('keV / (Angstrom3 s)') / hc.unit * astro_units.Angstrom ** 2).to('1/(cm2 s)')
 
+        self._quadrature_weights = np.zeros((self.n_bands, self._wavelengths.shape[0]))
 
+        for i, filter in enumerate(self._filters):
 
-            ratio.append((synthetic_flux/filter.ab_zeropoint.to('1/(cm2 s)')).value)
+            grid = filter._wavelength
+
+            steps = np.diff(grid)
+
+            trapz_weights = np.zeros_like(grid)
+
+            trapz_weights[:-1] += steps / 2.0
+            trapz_weights[1:] += steps / 2.0
+
+            zero_point = filter.ab_zeropoint.to('1/(cm2 s)').value
+
+            idx = np.searchsorted(self._wavelengths, grid)
+
+            self._quadrature_weights[i, idx] = (trapz_weights * filter.response * grid / hc.value * unit_factor /
+                                                zero_point)
+
+    def ab_magnitudes(self):
+        """
+        return the effective stimulus of the model and filter for the given
+        magnitude system
+        :return: np.ndarray of ab magnitudes
+        """
+
+        assert self._model_set, 'no likelihood model has been set'
 
+        # speclite has issues with unit conversion (and it is slow)
+        # so we do the convolution manually here with the precomputed quadrature:
+        # one evaluation of the model on the union of the wavelength grids
+        # and one matrix product give the ratio to the AB zero point for all filters
 
+        model_values = self._differential_flux(self._energies) * self._wavelength_factors
 
-        ratio = np.array(ratio)
+        ratio = self._quadrature_weights.dot(model_values)
 
         return -2.5 * np.log10(ratio)
 
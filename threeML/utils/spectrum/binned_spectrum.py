@@ -37,7 +37,7 @@ class ChannelSet(IntervalSet):
     @property
     def channels_widths(self):
 
-        return np.array([channel.channel_width for channel in self._intervals ])
+        return self.widths
 
 class Quality(object):
     def __init__(self, quality):
@@ -555,31 +555,64 @@ class BinnedSpectrum(Histogram):
                    is_poisson=is_poisson)
 
     def __add__(self,other):
-        assert self == other, "The bins are not equal"
 
-        new_sys_errors=self.sys_errors
-        if new_sys_errors is None:
-            new_sys_errors=other.sys_errors
-        elif other.sys_errors is not None:
-            new_sys_errors += other.sys_errors
+        return self.sum([self, other])
 
-        new_exposure = self.exposure + other.exposure
+    @classmethod
+    def sum(cls, list_of_spectra):
+        """
+        co-add spectra with the same binning in one pass. Counts and exposures are summed, count errors and systematic
+        errors are summed in quadrature. The other properties are taken from the first spectrum.
+
+        :param list_of_spectra: a list of spectra with the same binning
+        :return: a new spectrum
+        """
+
+        list_of_spectra = list(list_of_spectra)
+
+        assert len(list_of_spectra) > 0, "Need at least one spectrum to sum"
+
+        first = list_of_spectra[0]
+
+        for other in list_of_spectra[1:]:
+
+            assert first == other, "The bins are not equal"
+
+        new_exposure = np.sum([spectrum.exposure for spectrum in list_of_spectra])
+
+        count_errors = [spectrum.count_errors for spectrum in list_of_spectra]
+
+        if all(errors is None for errors in count_errors):
+
+            new_count_errors = None
 
-        if self.count_errors is None and other.count_errors is None:
-            new_count_errors = None 
         else:
-            assert self.count_errors is not None or other.count_errors is not None, 'only one of the two spectra have errors, can not add!'
-            new_count_errors = (self.count_errors**2 + other.count_errors**2) ** 0.5
 
-        new_counts = self.counts + other.counts
+            assert all(errors is not None for errors in count_errors), \
+                'only some of the spectra have errors, can not add!'
 
+            new_count_errors = np.sqrt(np.sum(np.square(count_errors), axis=0))
 
-        new_spectrum = self.clone(new_counts=new_counts,
-                                  new_count_errors=new_count_errors,
-                                  new_exposure=new_exposure)
+        # missing systematic errors are zero
 
-        new_spectrum._tstart = min(self.tstart,other.tstart)
-        new_spectrum._tstop = max(self.tstop,other.tstop)
+        sys_errors = [spectrum.sys_errors if spectrum.sys_errors is not None else np.zeros_like(spectrum.counts)
+                      for spectrum in list_of_spectra]
+
+        new_sys_errors = np.sqrt(np.sum(np.square(sys_errors), axis=0))
+
+        new_counts = np.sum([spectrum.counts for spectrum in list_of_spectra], axis=0)
+
+
+        new_spectrum = first.clone(new_counts=new_counts,
+                                   new_count_errors=new_count_errors,
+                                   new_exposure=new_exposure)
+
+        # (not all the subclasses can clone with new systematic errors)
+
+        new_spectrum._sys_errors = new_sys_errors
+
+        new_spectrum._tstart = min(spectrum.tstart for spectrum in list_of_spectra)
+        new_spectrum._tstop = max(spectrum.tstop for spectrum in list_of_spectra)
 
         return new_spectrum
 
@@ -598,8 +631,8 @@ class BinnedSpectrum(Histogram):
 
         new_exposure = self.exposure + other.exposure
 
-        new_rate_errors = np.array([ (e1**-2 + e2**-2)**-0.5 for e1,e2 in zip(self.rate_errors,other._errors) ] )
-        new_rates = np.array( [ (c1*e1**-2 + c2*e2**-2) for c1,e1,c2,e2 in zip(self.rates,self._errors,other.rates, other._errors) ] ) * new_rate_errors**2
+        new_rate_errors = (self.rate_errors ** -2 + other._errors ** -2) ** -0.5
+        new_rates = (self.rates * self._errors ** -2 + other.rates * other._errors ** -2) * new_rate_errors ** 2
         
         new_count_errors = new_rate_errors * new_exposure
         new_counts = new_rates * new_exposure
@@ -743,13 +776,15 @@ class BinnedSpectrumWithDispersion(BinnedSpectrum):
                                             mission=self._mission,
                                             instrument=self._instrument)
 
-    def __add__(self,other):
-        #TODO implement equality in InstrumentResponse class
-        assert self.response is other.response
+    @classmethod
+    def sum(cls, list_of_spectra):
 
-        new_spectrum = super(BinnedSpectrumWithDispersion,self).__add__(other)
+        list_of_spectra = list(list_of_spectra)
 
-        return new_spectrum
+        #TODO implement equality in InstrumentResponse class
+        assert all(spectrum.response is list_of_spectra[0].response for spectrum in list_of_spectra)
+
+        return super(BinnedSpectrumWithDispersion, cls).sum(list_of_spectra)
 
 
 
@@ -1,5 +1,6 @@
 # Provides some universal statistical utilities and stats comparison tools
 
+import collections
 from math import sqrt
 
 import numpy as np
@@ -91,6 +92,111 @@ def dic(bayes_analysis):
     return -2 * elpd_dic, pdic
 
 
+def integrated_autocorrelation_time(chain, c=5.0):
+    """
+    Estimate the integrated autocorrelation time of the chain of one parameter produced by an ensemble sampler. The
+    autocorrelation function is averaged over the walkers, and the window is chosen with the automatic procedure of
+    Sokal (the smallest window M such that M >= c * tau(M)), as recommended by Goodman & Weare.
+
+    :param chain: a (n_walkers, n_steps) array
+    :param c: constant for the automatic windowing (default: 5)
+    :return: the autocorrelation time (in steps), or inf if no walker has moved
+    """
+
+    chain = np.array(chain, ndmin=2, dtype=float)
+
+    n_steps = chain.shape[1]
+
+    # Compute the autocorrelation function of each walker with the FFT, padding with zeros to avoid the circular
+    # correlation
+
+    n_fft = 2 ** int(np.ceil(np.log2(2 * n_steps)))
+
+    centered = chain - np.mean(chain, axis=1)[:, np.newaxis]
+
+    transform = np.fft.rfft(centered, n=n_fft, axis=1)
+
+    autocorrelation = np.fft.irfft(transform * np.conjugate(transform), n=n_fft, axis=1)[:, :n_steps]
+
+    # Walkers which never moved have zero variance and do not contribute
+
+    variances = autocorrelation[:, 0]
+
+    moving = variances > 0
+
+    if not np.any(moving):
+
+        return np.inf
+
+    autocorrelation = np.mean(autocorrelation[moving] / variances[moving, np.newaxis], axis=0)
+
+    taus = 2.0 * np.cumsum(autocorrelation) - 1.0
+
+    acceptable = np.arange(n_steps) >= c * taus
+
+    window = np.argmax(acceptable) if np.any(acceptable) else n_steps - 1
+
+    return taus[window]
+
+
+def gelman_rubin(chain):
+    """
+    The Gelman-Rubin potential scale reduction factor, treating each walker as a separate chain. Values close to 1
+    indicate that the walkers are sampling the same distribution.
+
+    :param chain: a (n_walkers, n_steps) array with the samples of one parameter
+    :return: the potential scale reduction factor
+    """
+
+    chain = np.array(chain, ndmin=2, dtype=float)
+
+    n_steps = chain.shape[1]
+
+    within = np.mean(np.var(chain, axis=1, ddof=1))
+
+    between = n_steps * np.var(np.mean(chain, axis=1), ddof=1)
+
+    if within == 0:
+
+        return np.inf
+
+    pooled = (n_steps - 1.0) / n_steps * within + between / n_steps
+
+    return np.sqrt(pooled / within)
+
+
+def get_convergence_diagnostics(chains, parameter_names):
+    """
+    Compute autocorrelation time, effective sample size and Gelman-Rubin statistic for each parameter
+
+    :param chains: an iterable of (n_walkers, n_steps) arrays, one for each parameter
+    :param parameter_names: the names of the parameters
+    :return: a pandas DataFrame indexed by parameter name
+    """
+
+    taus = []
+    sample_sizes = []
+    r_hats = []
+
+    for chain in chains:
+
+        chain = np.array(chain, ndmin=2, dtype=float)
+
+        tau = integrated_autocorrelation_time(chain)
+
+        taus.append(tau)
+        sample_sizes.append(chain.size / tau)
+        r_hats.append(gelman_rubin(chain))
+
+    data = collections.OrderedDict()
+
+    data['autocorrelation time'] = taus
+    data['effective sample size'] = sample_sizes
+    data['gelman-rubin'] = r_hats
+
+    return pd.DataFrame(data, index=list(parameter_names))
+
+
 def sqrt_sum_of_squares(arg):
     """
     :param arg: and array of number to be squared and summed
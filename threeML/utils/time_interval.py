@@ -118,10 +118,7 @@ class TimeIntervalSet(IntervalSet):
         :return: new TimeIntervalSet instance
         """
 
-        new_set = self.new()
-        new_set.extend([time_interval + number for time_interval in self._intervals])
-
-        return new_set
+        return self._from_arrays(self._starts + number, self._stops + number)
 
     def __sub__(self, number):
         """
@@ -131,28 +128,16 @@ class TimeIntervalSet(IntervalSet):
         :return: new TimeIntervalSet instance
         """
 
-        new_set = self.new([time_interval - number for time_interval in self._intervals])
-
-        return new_set
+        return self._from_arrays(self._starts - number, self._stops - number)
 
     def _create_pandas(self):
 
         time_interval_dict = collections.OrderedDict()
 
-        time_interval_dict['Start'] = []
-        time_interval_dict['Stop'] = []
-        time_interval_dict['Duration'] = []
-        time_interval_dict['Midpoint'] = []
-
-
-
-        for i, interval in enumerate(self._intervals):
-
-
-            time_interval_dict['Start'].append(interval.start)
-            time_interval_dict['Stop'].append(interval.stop)
-            time_interval_dict['Duration'].append(interval.duration)
-            time_interval_dict['Midpoint'].append(interval.half_time)
+        time_interval_dict['Start'] = self.starts
+        time_interval_dict['Stop'] = self.stops
+        time_interval_dict['Duration'] = self.widths
+        time_interval_dict['Midpoint'] = self.mid_points
 
         df = pd.DataFrame(data=time_interval_dict)
 